@@ -14,57 +14,30 @@
 ## Implement logic to limit position size
 ## Implement logic to sell winners same day (hold losers at least 1 day)
 
-import os
 import pandas as pd
 import numpy as np
 from datetime import datetime, timezone, timedelta
 from dateutil import parser
 from time import sleep
 import logging
-import robin_stocks as rs
-
-def robinhood_login(robin_user=os.environ.get('robinhood_username'), robin_pass=os.environ.get('robinhood_password')):
-    """Login to Robinhood."""
-    rs.login(username=robin_user,
-             password=robin_pass,
-             expiresIn=86400,
-             by_sms=True)
-
-def get_next_market_open_hours(market='XNYS'):
-    """Get next market open hours. Default market is NYSE for US market hours."""
-    today_market_open_dict = rs.markets.get_market_today_hours(market=market)
-    current_time = parser.parse(datetime.now(timezone.utc).isoformat())
-    if today_market_open_dict['is_open'] and current_time < parser.parse(today_market_open_dict['closes_at']):
-        market_opens = parser.parse(today_market_open_dict['opens_at'])
-        market_closes = parser.parse(today_market_open_dict['closes_at'])
-    else:
-        next_market_open_dict = rs.markets.get_market_next_open_hours(market=market)
-        market_opens = parser.parse(next_market_open_dict['opens_at'])
-        market_closes = parser.parse(next_market_open_dict['closes_at'])
-    return market_opens, market_closes
-
-
-def seconds_until_market_open(market_opens):
-    """Get seconds until market opens."""
-    current_time = parser.parse(datetime.now(timezone.utc).isoformat())
-    return np.floor((market_opens - current_time).total_seconds())
+import robin_stocks.robinhood as rs
+from algotrading.utils import get_next_market_open_hours, robinhood_login, seconds_until_market_open
 
 def check_for_day_trades():
     """Get number of day trades used on the account"""
     # check we have at least one day trade available
-    account = rs.profiles.load_account_profile('account_number')
-    url = rs.urls.daytrades(account)
-
-    headers = rs.globals.SESSION.headers
-    rs.globals.SESSION.headers['X-Robinhood-API-Version'] = '1.315.0'
-
-    results = rs.helper.request_get(url)
+    account = rs.profiles.load_account_profile(info='account_number')
+    url = 'https://api.robinhood.com/accounts/{}/recent_day_trades/'.format(account)
+
+    # the day trades endpoint needs an API version, sent with this request only so it does
+    # not leak into other strategies sharing the session
+    response = rs.globals.SESSION.get(url, headers={'X-Robinhood-API-Version': '1.315.0'}, timeout=16)
+    response.raise_for_status()
+    results = response.json()
     stock_day_trades = results['equity_day_trades']
     options_day_trades = results['option_day_trades']
     day_trades = len(stock_day_trades) + len(options_day_trades)
 
-    rs.globals.SESSION.headers = headers
-
     return day_trades
 
 
@@ -95,99 +68,108 @@ proximity_to_new_high_52_weeks = 0.99 # right at 52 week high
 sell_today = True # toggle for day trading
 #######################
 
-while True:
-    # login to Robinhood
+def trade_momentum():
+    """Run one iteration of the momentum strategy.
+
+    Returns seconds to wait before the next iteration if positions cannot be closed today.
+    """
+    global sell_today
+    # check for day trades
+    day_trades = check_for_day_trades()
+    if day_trades < 0 or day_trades > 2:
+        logger.info("WARNING: Must have at least 1 day trades available to trade.")
+        sell_today = False
+    # get current portfolio and uninvested cash values
     try:
-        robinhood_login()
-        logger.info('Robinhood login successful.')
+        total_portfolio_value = float(rs.profiles.load_portfolio_profile(info='equity'))
     except:
-        logger.info('Robinhood login failed.')
-
-    # get next market open and close times
+        logger.info('Failed to get total portfolio value.')
     try:
-        market_opens, market_closes = get_next_market_open_hours()
-        logger.info('Market opens {} and closes {}.'.format(market_opens, market_closes))
+        uninvested_cash = float(rs.profiles.load_account_profile(info='buying_power'))
     except:
-        logger.info('Get market times failed.')
-    current_time = parser.parse(datetime.now(timezone.utc).isoformat())
-
-    # while market is open, execute trading strategy
-    while (current_time >= market_opens) & (current_time < market_closes):
-        # check for day trades
-        day_trades = check_for_day_trades()
-        if day_trades < 0 or day_trades > 2:
-            logger.info("WARNING: Must have at least 1 day trades available to trade.")
-            sell_today = False
-        # get current portfolio and uninvested cash values
-        try:
-            total_portfolio_value = float(rs.profiles.load_portfolio_profile(info='equity'))
-        except:
-            logger.info('Failed to get total portfolio value.')
-        try:
-            uninvested_cash = float(rs.profiles.load_account_profile(info='buying_power'))
-        except:
-            logger.info('Failed to get uninvested cash.')
-        # get latest price and 52 week high prices
+        logger.info('Failed to get uninvested cash.')
+    # get latest price and 52 week high prices
+    try:
+        latest_price = float(rs.stocks.get_latest_price(inputSymbols=ticker)[0])
+    except:
+        logger.info('Failed to get latest ticker price.')
+    try:
+        high_52_weeks = float(rs.stocks.get_fundamentals(inputSymbols=ticker,info='high_52_weeks')[0])
+    except:
+        logger.info('Failed to get 52 week high.')
+    # if <10% of portfolio is cash, do nothing
+    if uninvested_cash/total_portfolio_value < cash_allocation:
+        logger.info('Do not open new positions. Less than 10% of portfolio in cash.')
+        pass
+    else:
+        # if day high within 99% of 52 week high then place buy order
+        if (latest_price/high_52_weeks) >= proximity_to_new_high_52_weeks:
+            rs.orders.order_buy_fractional_by_price(symbol=ticker,
+                                                    amountInDollars=uninvested_cash,
+                                                    timeInForce='gfd',
+                                                    extendedHours=False)
+            logger.info('Submit buy order. Ticker: {} Amount: {}'.format(ticker, uninvested_cash))
+    if sell_today:
+        # build current portfolio holdings
+        holdings = rs.account.build_holdings()
+        for symbol in holdings.keys():
+            percentchange = float(holdings[symbol]['percent_change'])
+            # take profit
+            if percentchange >= take_profit:
+                quantity = float(holdings[symbol]['quantity'])
+                rs.orders.order_sell_fractional_by_quantity(symbol=symbol,
+                                                            quantity=quantity,
+                                                            timeInForce='gfd',
+                                                            extendedHours=False)
+                logger.info('Submit take profit sell order. Ticker: {} Percent Gain: {}'.format(
+                symbol, percentchange))
+            # stop loss
+            elif percentchange <= stop_loss:
+                quantity = float(holdings[symbol]['quantity'])
+                rs.orders.order_sell_fractional_by_quantity(symbol=symbol,
+                                                            quantity=quantity,
+                                                            timeInForce='gfd',
+                                                            extendedHours=False)
+                logger.info('Submit stop loss profit sell order. Ticker: {} Percent Loss: {}'.format(
+                symbol, percentchange))
+    else:
+        logger.info('Cannot close positions without day trades available.')
+        return 1200
+
+
+if __name__ == "__main__":
+    while True:
+        # login to Robinhood
         try:
-            latest_price = float(rs.stocks.get_latest_price(inputSymbols=ticker)[0])
+            robinhood_login()
+            logger.info('Robinhood login successful.')
         except:
-            logger.info('Failed to get latest ticker price.')
+            logger.info('Robinhood login failed.')
+
+        # get next market open and close times
         try:
-            high_52_weeks = float(rs.stocks.get_fundamentals(inputSymbols=ticker,info='high_52_weeks')[0])
+            market_opens, market_closes = get_next_market_open_hours()
+            logger.info('Market opens {} and closes {}.'.format(market_opens, market_closes))
         except:
-            logger.info('Failed to get 52 week high.')
-        # if <10% of portfolio is cash, do nothing
-        if uninvested_cash/total_portfolio_value < cash_allocation:
-            logger.info('Do not open new positions. Less than 10% of portfolio in cash.')
-            pass
-        else:
-            # if day high within 99% of 52 week high then place buy order
-            if (latest_price/high_52_weeks) >= proximity_to_new_high_52_weeks:
-                rs.orders.order_buy_fractional_by_price(symbol=ticker,
-                                                        amountInDollars=uninvested_cash,
-                                                        timeInForce='gfd',
-                                                        extendedHours=False)
-                logger.info('Submit buy order. Ticker: {} Amount: {}'.format(ticker, uninvested_cash))
-        if sell_today:
-            # build current portfolio holdings
-            holdings = rs.account.build_holdings()
-            for symbol in holdings.keys():
-                percentchange = float(holdings[symbol]['percent_change'])
-                # take profit
-                if percentchange >= take_profit:
-                    quantity = float(holdings[symbol]['quantity'])
-                    rs.orders.order_sell_fractional_by_quantity(symbol=symbol,
-                                                                quantity=quantity,
-                                                                timeInForce='gfd',
-                                                                extendedHours=False)
-                    logger.info('Submit take profit sell order. Ticker: {} Percent Gain: {}'.format(
-                    symbol, percentchange))
-                # stop loss
-                elif percentchange <= stop_loss:
-                    quantity = float(holdings[symbol]['quantity'])
-                    rs.orders.order_sell_fractional_by_quantity(symbol=symbol,
-                                                                quantity=quantity,
-                                                                timeInForce='gfd',
-                                                                extendedHours=False)
-                    logger.info('Submit stop loss profit sell order. Ticker: {} Percent Loss: {}'.format(
-                    symbol, percentchange))
-        else:
-            logger.info('Cannot close positions without day trades available.')
-            sleep(1200)
-        # delay to prevent overwhelming Robinhood API
-        logger.info('Sleep for 60 seconds.')
-        sleep(60)
-
-        ### get new current time
+            logger.info('Get market times failed.')
         current_time = parser.parse(datetime.now(timezone.utc).isoformat())
-        pass
 
-    # logout while market closed
-    rs.logout()
+        # while market is open, execute trading strategy
+        while (current_time >= market_opens) & (current_time < market_closes):
+            delay = trade_momentum()
+            if delay:
+                sleep(delay)
+            # delay to prevent overwhelming Robinhood API
+            logger.info('Sleep for 60 seconds.')
+            sleep(60)
+
+            ### get new current time
+            current_time = parser.parse(datetime.now(timezone.utc).isoformat())
+            pass
 
-    # seconds until next market open
-    wait_time = max(seconds_until_market_open(market_opens),0)
-    # require login at least once per day to avoid error
-    wait_time = wait_time/4
-    logger.info('Market closed. Waiting {} until next market open.'.format(timedelta(seconds=wait_time)))
-    sleep(wait_time)
+        # seconds until next market open
+        wait_time = max(seconds_until_market_open(market_opens),0)
+        # require login at least once per day to avoid error
+        wait_time = wait_time/4
+        logger.info('Market closed. Waiting {} until next market open.'.format(timedelta(seconds=wait_time)))
+        sleep(wait_time)
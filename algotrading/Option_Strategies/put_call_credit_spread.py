@@ -0,0 +1,59 @@
+from algotrading.credit_spreads import CreditSpreadScanner
+from algotrading.data_hub import get_data_hub
+from algotrading.utils import create_logger
+
+
+# set parameters of trading strategy
+option_types = ('put', 'call')
+weekday_num = 4
+day_lag = 7
+max_daily_open_positions = 1
+iv_rank_min = 0.5
+iv_percentile_min = 0.5
+total_option_volume_min = 50000
+target_delta = .30
+days_until_expiration_range = [30, 45]
+delta_tolerance = 0.025
+option_volume_min = 10
+option_open_interest_min = 100
+max_strike_width = 1
+min_percent_return = 0.3
+profit_target_percent = 0.5
+max_concurrent_requests = 8
+trade_logging_file_paths = {
+    'put': '../trade_histories/put_credit_spread.csv',
+    'call': '../trade_histories/call_credit_spread.csv',
+}
+
+logger = create_logger(filename='put_call_credit_spread.py', logname='put_call_credit_spread.log')
+
+scanner = CreditSpreadScanner(
+    option_types=option_types,
+    weekday_num=weekday_num,
+    day_lag=day_lag,
+    max_daily_open_positions=max_daily_open_positions,
+    iv_rank_min=iv_rank_min,
+    iv_percentile_min=iv_percentile_min,
+    total_option_volume_min=total_option_volume_min,
+    target_delta=target_delta,
+    days_until_expiration_range=days_until_expiration_range,
+    delta_tolerance=delta_tolerance,
+    option_volume_min=option_volume_min,
+    option_open_interest_min=option_open_interest_min,
+    max_strike_width=max_strike_width,
+    min_percent_return=min_percent_return,
+    profit_target_percent=profit_target_percent,
+    max_concurrent_requests=max_concurrent_requests,
+    hub=get_data_hub(),
+    trade_logging_file_paths=trade_logging_file_paths,
+    logger=logger,
+)
+
+
+def main():
+    scanner.run()
+
+
+if __name__ == "__main__":
+    while True:
+        main()
@@ -0,0 +1,50 @@
+import os
+import sys
+
+from algotrading.scheduler import Scheduler
+from algotrading.utils import create_logger, get_market_calendar, robinhood_login
+
+# the momentum strategy lives outside the algotrading package
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+from Momentum_Strategies import seed  # noqa: E402
+from call_credit_spread import scanner as call_credit_spread_scanner  # noqa: E402
+from put_credit_spread import scanner as put_credit_spread_scanner  # noqa: E402
+
+
+# set parameters of the schedule
+credit_spread_interval = 300
+momentum_interval = 60
+warm_up_minutes = 15
+
+logger = create_logger(filename='run_strategies.py', logname='run_strategies.log')
+
+# one session for all strategies, reusing the saved token and refreshed before it expires
+scheduler = Scheduler(calendar=get_market_calendar(), on_open=robinhood_login)
+# credit spread scanners share one data hub, so IV data and option positions are fetched once for both
+for _name, _scanner in [('put_credit_spread', put_credit_spread_scanner), ('call_credit_spread', call_credit_spread_scanner)]:
+    scheduler.add_job(
+        _name,
+        _scanner.step,
+        interval=credit_spread_interval,
+        on_open=_scanner.start_session,
+        on_close=_scanner.end_session,
+    )
+scheduler.add_job('momentum', seed.trade_momentum, interval=momentum_interval)
+
+
+def warm_up():
+    """Login and prime the shared caches before the open."""
+    robinhood_login()
+    for _scanner in [put_credit_spread_scanner, call_credit_spread_scanner]:
+        _scanner.warm_up()
+
+
+scheduler.add_warm_up_job('warm_up', warm_up, before_open=warm_up_minutes * 60)
+
+
+def main():
+    scheduler.run()
+
+
+if __name__ == "__main__":
+    main()
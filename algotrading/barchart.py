@@ -0,0 +1,95 @@
+import logging
+import threading
+import requests
+
+from collections import deque
+from requests.adapters import HTTPAdapter
+from time import monotonic, perf_counter, time
+from urllib.parse import unquote
+
+
+logger = logging.getLogger(__name__)
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:86.0) Gecko/20100101 Firefox/86.0"
+}
+
+
+class BarchartClient:
+    """Long-lived Barchart API client.
+
+    Keeps one pooled `requests.Session` so connections and TLS sessions are reused across calls,
+    and caches the XSRF token from the homepage cookies until it expires. The token is refreshed
+    early only when the API answers 401 or 419.
+
+    token_ttl : float
+        Seconds to keep the XSRF token when its cookie has no expiry.
+    max_latencies : int
+        Number of recent request latencies to keep.
+    """
+
+    def __init__(self, base_url='https://www.barchart.com', token_ttl=3600, timeout=30, pool_size=4, max_latencies=100):
+        self.base_url = base_url.rstrip('/')
+        self.token_ttl = token_ttl
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.latencies = deque(maxlen=max_latencies)
+        self.token_refreshes = 0
+        self._token = None
+        self._token_expires = 0
+        self._lock = threading.Lock()
+
+    def _timed_get(self, url, **kwargs):
+        start = perf_counter()
+        response = self.session.get(url, timeout=self.timeout, **kwargs)
+        latency = perf_counter() - start
+        self.latencies.append(latency)
+        logger.debug('GET {} {} in {:.3f} seconds.'.format(url, response.status_code, latency))
+        return response
+
+    def refresh_token(self):
+        """Load the homepage to get a new XSRF token cookie."""
+        with self._lock:
+            self._timed_get(self.base_url).raise_for_status()
+            cookie = next(_cookie for _cookie in self.session.cookies if _cookie.name == 'XSRF-TOKEN')
+            self._token = unquote(cookie.value)
+            ttl = self.token_ttl if cookie.expires is None else min(cookie.expires - time(), self.token_ttl)
+            self._token_expires = monotonic() + ttl
+            self.token_refreshes += 1
+
+    @property
+    def token(self):
+        """Cached XSRF token, refreshed if missing or expired."""
+        if self._token is None or monotonic() >= self._token_expires:
+            self.refresh_token()
+        return self._token
+
+    def get_json(self, path, params=None):
+        """GET an API path with the XSRF token header and return the decoded json."""
+        url = '{}/{}'.format(self.base_url, path.lstrip('/'))
+        response = self._timed_get(url, params=params, headers={'X-XSRF-TOKEN': self.token})
+        if response.status_code in (401, 419):
+            self.refresh_token()
+            response = self._timed_get(url, params=params, headers={'X-XSRF-TOKEN': self.token})
+        response.raise_for_status()
+        return response.json()
+
+    def latency_stats(self):
+        """Summary of recent request latencies in seconds."""
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {'count': 0}
+        return {
+            'count': len(latencies),
+            'last': self.latencies[-1],
+            'median': latencies[len(latencies) // 2],
+            'max': latencies[-1],
+            'token_refreshes': self.token_refreshes,
+        }
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,273 @@
+import logging
+import threading
+
+import numpy as np
+
+from collections import OrderedDict
+from datetime import date
+from time import monotonic
+
+from algotrading.option_chain import OptionChain
+from algotrading.utils import get_option_expiration_dates, get_option_market_data, get_tradable_options
+
+
+logger = logging.getLogger(__name__)
+
+
+class OptionChainCache:
+    """LRU cache of option chains keyed by (symbol, expiration date, option type).
+
+    Option instruments (strikes, ids, expiration) do not change intraday and are kept until
+    the date changes, except empty instrument lists, which are refetched after `empty_ttl`
+    seconds. A failed instrument fetch is not cached. Quotes and greeks are refreshed after `quote_ttl` seconds with batched
+    market data requests for the cached instruments, instead of one request per contract.
+
+    When `target_delta` is set, quote refreshes after the first one only re-pull the contracts
+    in the candidate band: contracts within `delta_tolerance` of `target_delta` plus
+    `band_neighbors` strikes on each side, and only those contracts are returned. If the
+    refreshed band no longer brackets the target delta, because the underlying moved, the
+    whole chain is refetched and the band is recomputed.
+
+    max_chains : int
+        Maximum number of option chains to keep. Least recently used chains are evicted first.
+    quote_ttl : float
+        Seconds before cached quotes and greeks are refetched.
+    target_delta : float
+        Absolute target delta of the candidate band. None to always refresh the whole chain.
+    empty_ttl : float
+        Seconds before an option chain without instruments is fetched again.
+    """
+
+    def __init__(
+        self,
+        max_chains=256,
+        quote_ttl=60,
+        batch_size=40,
+        target_delta=None,
+        delta_tolerance=0.025,
+        band_neighbors=1,
+        empty_ttl=300,
+        clock=monotonic,
+        today=date.today,
+    ):
+        self.max_chains = max_chains
+        self.quote_ttl = quote_ttl
+        self.batch_size = batch_size
+        self.target_delta = target_delta
+        self.delta_tolerance = delta_tolerance
+        self.band_neighbors = band_neighbors
+        self.empty_ttl = empty_ttl
+        self.clock = clock
+        self.today = today
+        self.instrument_hits = 0
+        self.instrument_misses = 0
+        self.quote_hits = 0
+        self.quote_misses = 0
+        self.band_refreshes = 0
+        self.band_fallbacks = 0
+        self.evictions = 0
+        self.failures = 0
+        self._chains = OrderedDict()
+        self._expiration_dates = {}
+        self._lock = threading.Lock()
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._chains.get(key)
+            if entry is not None:
+                self._chains.move_to_end(key)
+            return entry
+
+    def _store(self, key, entry):
+        with self._lock:
+            self._chains[key] = entry
+            self._chains.move_to_end(key)
+            while len(self._chains) > self.max_chains:
+                self._chains.popitem(last=False)
+                self.evictions += 1
+
+    def get_expiration_dates(self, symbol):
+        """Get listed option expiration dates of a symbol, fetching them once per day.
+
+        An empty result, e.g. from a failed request, is not cached, so the next call fetches again.
+        """
+        with self._lock:
+            cached = self._expiration_dates.get(symbol)
+        if cached is not None and cached[0] == self.today():
+            return cached[1]
+
+        expiration_dates = get_option_expiration_dates(symbol)
+        if expiration_dates:
+            with self._lock:
+                self._expiration_dates[symbol] = (self.today(), expiration_dates)
+        return expiration_dates
+
+    def get_instruments(self, symbol, expiration_date, option_type):
+        """Get the cache entry of an option chain, fetching its instrument data once per day.
+
+        If the fetch fails, the entry has no instruments and is not cached, so the next call fetches again.
+        """
+        key = (symbol, expiration_date, option_type)
+        entry = self._lookup(key)
+
+        if (entry is not None and entry['instruments_date'] == self.today() and
+                (entry['instruments'] or self.clock() - entry['instruments_time'] < self.empty_ttl)):
+            self._count('instrument_hits')
+            return entry
+
+        self._count('instrument_misses')
+        instruments = get_tradable_options(symbol, expiration_date, option_type)
+        failed = instruments is None
+        instruments = [
+            _instrument for _instrument in (instruments or [])
+            if _instrument and _instrument.get('expiration_date') == expiration_date
+        ]
+
+        entry = {
+            'instruments': instruments,
+            'instruments_date': self.today(),
+            'instruments_time': self.clock(),
+            'quotes': None,
+            'quotes_time': None,
+            'option_chain': None,
+            'band_ids': None,
+            'strike_bounds': None,
+        }
+        if failed:
+            self._count('failures')
+            logger.warning('Failed to fetch option instruments of {} expiring {}.'.format(symbol, expiration_date))
+        else:
+            self._store(key, entry)
+        return entry
+
+    def get_records(self, symbol, expiration_date, option_type):
+        """Get option chain records with instrument and market data merged."""
+        return self.get(symbol, expiration_date, option_type, as_records=True)
+
+    def get(self, symbol, expiration_date, option_type, as_records=False):
+        """Get an option chain, refreshing quotes and greeks if older than `quote_ttl`."""
+        entry = self.get_instruments(symbol, expiration_date, option_type)
+
+        now = self.clock()
+        if entry['quotes_time'] is not None and now - entry['quotes_time'] < self.quote_ttl:
+            self._count('quote_hits')
+        else:
+            self._count('quote_misses')
+            if not (entry['band_ids'] and self._refresh_band(entry)):
+                self._refresh_chain(entry)
+            entry['quotes_time'] = now
+
+        return entry['quotes'] if as_records else entry['option_chain']
+
+    def _merge_market_data(self, instruments):
+        """Merge fresh market data into option instrument records."""
+        market_data = get_option_market_data(
+            [_instrument['id'] for _instrument in instruments],
+            batch_size=self.batch_size,
+        )
+        market_data = {_data['instrument_id']: _data for _data in market_data}
+
+        records = []
+        for _instrument in instruments:
+            _record = dict(_instrument)
+            _record.update(market_data.get(_instrument['id'], {}))
+            records.append(_record)
+        return records
+
+    def _refresh_chain(self, entry):
+        """Refresh quotes for the whole option chain and recompute the candidate band."""
+        records = self._merge_market_data(entry['instruments'])
+        option_chain = OptionChain.from_records(records)
+
+        entry['quotes'] = records
+        entry['option_chain'] = option_chain
+
+        if self.target_delta is not None:
+            entry['band_ids'], _ = self._find_delta_band(option_chain)
+            types = np.asarray(option_chain['type'], dtype=object)
+            entry['strike_bounds'] = {
+                _option_type: (option_chain['strike_price'][types == _option_type].min(),
+                               option_chain['strike_price'][types == _option_type].max())
+                for _option_type in set(types)
+            }
+
+    def _refresh_band(self, entry):
+        """Refresh quotes for the candidate band only. Returns False if the band shifted."""
+        band_ids = set(entry['band_ids'])
+        records = self._merge_market_data(
+            [_instrument for _instrument in entry['instruments'] if _instrument['id'] in band_ids])
+        option_chain = OptionChain.from_records(records)
+
+        band_ids, shifted = self._find_delta_band(option_chain, strike_bounds=entry['strike_bounds'])
+        if shifted:
+            self._count('band_fallbacks')
+            return False
+
+        self._count('band_refreshes')
+        entry['quotes'] = records
+        entry['option_chain'] = option_chain
+        return True
+
+    def _find_delta_band(self, option_chain, strike_bounds=None):
+        """Find instrument ids in the candidate band of each option type.
+
+        strike_bounds : dict
+            Lowest and highest strike of the full chain keyed by option type. If given, the band
+            counts as shifted when it needs strikes beyond the edges of `option_chain`.
+
+        Returns the band instrument ids and whether the band shifted.
+        """
+        band_ids = []
+        shifted = False
+        types = np.asarray(option_chain['type'], dtype=object)
+        for _option_type in set(types):
+            index = np.flatnonzero(types == _option_type)
+            index = index[np.argsort(option_chain['strike_price'][index], kind='stable')]
+            strikes = option_chain['strike_price'][index]
+
+            in_band = np.flatnonzero(
+                np.abs(np.abs(option_chain['delta'][index]) - self.target_delta) <= self.delta_tolerance)
+            if in_band.shape[0] == 0:
+                shifted = True
+                continue
+
+            start = in_band[0] - self.band_neighbors
+            end = in_band[-1] + self.band_neighbors
+            if strike_bounds is not None:
+                low_strike, high_strike = strike_bounds[_option_type]
+                if (start < 0 and strikes[0] > low_strike) or (end >= index.shape[0] and strikes[-1] < high_strike):
+                    shifted = True
+
+            band_ids.extend(option_chain['id'][index[max(start, 0):end + 1]])
+
+        return band_ids, shifted
+
+    def invalidate(self, symbol=None, expiration_date=None, option_type=None):
+        """Drop cached chains matching the given key parts. With no arguments, drop everything."""
+        with self._lock:
+            if symbol is None:
+                self._expiration_dates.clear()
+            else:
+                self._expiration_dates.pop(symbol, None)
+            for _key in list(self._chains):
+                if all(_part is None or _part == _key_part
+                       for _part, _key_part in zip((symbol, expiration_date, option_type), _key)):
+                    del self._chains[_key]
+
+    def stats(self):
+        """Cache hit and miss counters."""
+        return {
+            'chains': len(self._chains),
+            'instrument_hits': self.instrument_hits,
+            'instrument_misses': self.instrument_misses,
+            'quote_hits': self.quote_hits,
+            'quote_misses': self.quote_misses,
+            'band_refreshes': self.band_refreshes,
+            'band_fallbacks': self.band_fallbacks,
+            'evictions': self.evictions,
+            'failures': self.failures,
+        }
@@ -0,0 +1,699 @@
+import heapq
+import itertools
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+import robin_stocks.robinhood as rs
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from dateutil import parser
+from time import sleep
+
+from algotrading.data_hub import DataHub
+from algotrading.instrument_cache import OptionInstrumentCache
+from algotrading.iv_history import OPTION_CHAIN, IVHistory
+from algotrading.option_chain import OptionChain
+from algotrading.orders import OrderManager, OrderMonitor, PriceWalk
+from algotrading.pricing import fill_option_chain_greeks, missing_greeks
+from algotrading.utils import (robinhood_login, find_weekday_dates, get_barchart_client, get_latest_prices,
+                               get_market_calendar, iter_expiration_option_chains, get_next_market_open_hours,
+                               seconds_until_market_open)
+
+
+LEG_COLUMNS = [
+    'strike_price',
+    'mark_price',
+    'ask_price',
+    'bid_price',
+    'spread',
+    'volume',
+    'open_interest',
+    'delta',
+    'gamma',
+    'rho',
+    'theta',
+    'vega',
+]
+
+CREDIT_SPREAD_COLUMNS = (
+    ['symbol', 'type', 'expiration_date'] +
+    ['short_{}'.format(_col) for _col in LEG_COLUMNS] +
+    ['long_{}'.format(_col) for _col in LEG_COLUMNS] +
+    [
+        'trade_strike_width',
+        'trade_limit_price',
+        'trade_spread',
+        'trade_spread_ratio',
+        'avg_trade_volume',
+        'trade_expected_dollar_return',
+        'trade_expected_percent_return',
+    ]
+)
+
+
+def find_credit_spread_candidates(
+    option_chains,
+    option_type,
+    target_delta,
+    delta_tolerance,
+    option_volume_min,
+    option_open_interest_min,
+    best_short_only=True,
+    strikes_away=(1,),
+    strike_widths=(),
+):
+    """Find credit spread candidates across all option chains at once.
+
+    option_chains : dict or list
+        OptionChains, e.g. as streamed by `iter_expiration_option_chains`.
+    option_type : str
+        'put' or 'call'.
+    best_short_only : bool
+        Keep only the highest volume short leg per symbol and expiration date.
+    strikes_away : tuple
+        Pair each short leg with the long leg this many strikes further out of the money.
+    strike_widths : tuple
+        Also pair each short leg with the nearest long leg at least this wide in strike price.
+
+    Short legs are contracts within `delta_tolerance` of `target_delta` that meet the volume
+    and open interest minimums. Long legs are looked up for all short legs at once with the
+    sorted strike index of the option chains. Returns one DataFrame with `CREDIT_SPREAD_COLUMNS`.
+    """
+    if isinstance(option_chains, dict):
+        option_chains = option_chains.values()
+
+    chain_data = OptionChain.concat(option_chains)
+    legs = {_col: chain_data[_col] for _col in LEG_COLUMNS if _col != 'spread'}
+    legs['spread'] = legs['ask_price'] - legs['bid_price']
+
+    # long leg is further down for puts and further up for calls
+    delta_sign, direction = (1, -1) if option_type == 'put' else (-1, 1)
+
+    short_rows = np.flatnonzero(
+        np.asarray(chain_data['type'] == option_type) &
+        (np.abs(legs['delta'] + delta_sign * target_delta) <= delta_tolerance) &
+        (legs['volume'] >= option_volume_min) &
+        (legs['open_interest'] >= option_open_interest_min)
+    )
+
+    short_index = []
+    long_index = []
+    for _strikes_away, _width in [(_n, None) for _n in strikes_away] + [(None, _w) for _w in strike_widths]:
+        long_rows, has_long_leg = chain_data.find_legs(short_rows, direction, strikes_away=_strikes_away, width=_width)
+        short_index.append(short_rows[has_long_leg])
+        long_index.append(long_rows[has_long_leg])
+    short_index = np.concatenate(short_index) if short_index else np.array([], dtype=np.int64)
+    long_index = np.concatenate(long_index) if long_index else np.array([], dtype=np.int64)
+
+    if best_short_only and short_index.shape[0] > 0:
+        group = chain_data.strike_index['group'][chain_data.strike_index['position'][short_index]]
+        by_volume = np.lexsort((-legs['volume'][short_index], group))
+        best_short = np.ones(by_volume.shape[0], dtype=bool)
+        best_short[1:] = group[by_volume][1:] != group[by_volume][:-1]
+        best_short_rows = short_index[by_volume][best_short]
+        keep = np.isin(short_index, best_short_rows)
+        short_index = short_index[keep]
+        long_index = long_index[keep]
+
+    trades = {
+        'symbol': np.asarray(chain_data['symbol'][short_index], dtype=object),
+        'type': '{} credit spread'.format(option_type),
+        'expiration_date': np.asarray(chain_data['expiration_date'][short_index], dtype=object),
+    }
+    for _col in LEG_COLUMNS:
+        trades['short_{}'.format(_col)] = legs[_col][short_index]
+    for _col in LEG_COLUMNS:
+        trades['long_{}'.format(_col)] = legs[_col][long_index]
+
+    trades['trade_strike_width'] = np.abs(trades['long_strike_price'] - trades['short_strike_price'])
+    trades['trade_limit_price'] = trades['short_mark_price'] - trades['long_mark_price']
+    trades['trade_spread'] = trades['short_ask_price'] - trades['long_bid_price']
+    trades['trade_spread_ratio'] = trades['trade_spread'] / trades['trade_strike_width']
+    trades['avg_trade_volume'] = (trades['short_volume'] + trades['long_volume']) / 2
+    trades['trade_expected_dollar_return'] = (1 + delta_sign * trades['short_delta']) * trades['trade_limit_price']
+    trades['trade_expected_percent_return'] = (
+        trades['trade_expected_dollar_return'] / (trades['trade_strike_width'] - trades['trade_limit_price'])
+    )
+
+    return pd.DataFrame(data=trades, columns=CREDIT_SPREAD_COLUMNS)
+
+
+class TopCandidates:
+    """Keep the best `k` credit spread candidates by `score` while candidates stream in.
+
+    Candidates are pushed as DataFrames with `CREDIT_SPREAD_COLUMNS`, e.g. one per option chain as
+    it arrives. Only candidates within `max_strike_width` and above `min_percent_return` are kept,
+    in a bounded min-heap, so memory does not grow with the number of candidates pushed.
+    """
+
+    def __init__(self, k=1, score='avg_trade_volume', max_strike_width=np.inf, min_percent_return=-np.inf):
+        self.k = k
+        self.score = score
+        self.max_strike_width = max_strike_width
+        self.min_percent_return = min_percent_return
+        self._heap = []
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def push(self, credit_spread_trades):
+        """Offer candidates, keeping them only if they rank in the top `k`."""
+        scores = credit_spread_trades[self.score].to_numpy(dtype=float)
+        eligible = np.flatnonzero(
+            (credit_spread_trades.trade_strike_width.to_numpy(dtype=float) <= self.max_strike_width) &
+            (credit_spread_trades.trade_expected_percent_return.to_numpy(dtype=float) > self.min_percent_return) &
+            ~np.isnan(scores)
+        )
+        if eligible.shape[0] > self.k:
+            eligible = eligible[np.argpartition(-scores[eligible], self.k - 1)[:self.k]]
+
+        with self._lock:
+            for i in eligible:
+                item = (scores[i], next(self._counter), credit_spread_trades.iloc[i])
+                if len(self._heap) < self.k:
+                    heapq.heappush(self._heap, item)
+                elif item[0] > self._heap[0][0]:
+                    heapq.heapreplace(self._heap, item)
+
+    def best(self):
+        """Best candidate as a Series, or None if no candidate was kept."""
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(self._heap, key=lambda _item: _item[0])[2]
+
+    def top(self):
+        """Kept candidates as a DataFrame sorted by ascending score."""
+        with self._lock:
+            items = sorted(self._heap, key=lambda _item: _item[0])
+        if not items:
+            return pd.DataFrame(data=[], columns=CREDIT_SPREAD_COLUMNS)
+        return pd.DataFrame([_item[2] for _item in items], columns=CREDIT_SPREAD_COLUMNS).reset_index(drop=True)
+
+
+class CreditSpreadScanner:
+    """Scan for and trade credit spreads on one or both option sides.
+
+    option_types : tuple
+        Option sides to trade, any of 'put' and 'call'. Implied volatility data, option
+        positions and option chains are fetched once per scan and shared by all sides.
+    quote_ttl : float
+        Seconds before cached option quotes and greeks are refetched. Option instruments are cached for the day.
+    band_refresh : bool
+        Refresh quotes only for contracts near `target_delta` between full option chain refreshes.
+    fill_missing_greeks : bool
+        Compute implied volatility and greeks locally for contracts where Robinhood has none.
+    top_k : int
+        Number of best candidates kept per option type while option chains stream in.
+    score : str
+        Candidate column to rank trades by, highest first.
+    strikes_away, strike_widths : tuple
+        Long leg spacings to evaluate for each short leg, see `find_credit_spread_candidates`.
+        Band refresh is turned off when `strike_widths` are given, since a width can span any
+        number of strikes.
+    prefetch_interval : float
+        Seconds between background refreshes of the implied volatility data and option positions
+        while `run` trades, so scans read the latest completed fetch instead of waiting on it.
+    max_iv_data_age, max_option_positions_age : float
+        Seconds before prefetched implied volatility data or option positions are too stale to use
+        and are fetched synchronously instead.
+    order_poll_interval : tuple
+        Minimum and maximum seconds between order status polls. All recently updated orders are
+        fetched in one request, quickly right after an order is sent, then less often, see
+        `OrderStatusService`.
+    max_price_concession : float
+        Fraction of the distance from the mid price to the natural price an unfilled opening order
+        may give up. The order is cancelled and replaced every `reprice_interval` seconds, in
+        `reprice_steps` steps, see `PriceWalk`. 0 keeps the mid price all day.
+    instrument_cache_path : str
+        Optional csv file caching option instrument metadata across runs, used to find the option
+        type of positions.
+    iv_history_path : str
+        Optional .npz file of a local IV history. It is updated from every IV snapshot and option
+        chain, and symbols with at least `min_iv_history` days of recent option chain IV history are
+        screened on it too, unless Barchart lists them with at most `total_option_volume_min`.
+    iv_history_symbols : tuple
+        Symbols outside Barchart's most active lists to build a local IV history for. Their option
+        chains are fetched every scan only to record their IV, until they pass the screen.
+    hub : DataHub
+        Data hub to share the implied volatility data, option positions, option chain cache and
+        order status polls with other strategies in the process, see `get_data_hub`. By default
+        the scanner gets its own hub, built from `prefetch_interval`, `max_iv_data_age`,
+        `max_option_positions_age`, `order_poll_interval` and `instrument_cache_path`.
+    trade_logging_file_paths : dict
+        Trade history csv file path keyed by option type.
+    """
+
+    def __init__(
+        self,
+        option_types=('put', 'call'),
+        weekday_num=4,
+        day_lag=7,
+        max_daily_open_positions=1,
+        iv_rank_min=0.5,
+        iv_percentile_min=0.5,
+        total_option_volume_min=50000,
+        target_delta=.30,
+        days_until_expiration_range=(30, 45),
+        delta_tolerance=0.025,
+        option_volume_min=10,
+        option_open_interest_min=100,
+        max_strike_width=1,
+        min_percent_return=0.3,
+        profit_target_percent=0.5,
+        max_concurrent_requests=8,
+        quote_ttl=60,
+        max_cached_chains=256,
+        band_refresh=True,
+        fill_missing_greeks=True,
+        risk_free_rate=0.0,
+        top_k=5,
+        score='avg_trade_volume',
+        strikes_away=(1,),
+        strike_widths=(),
+        order_poll_interval=(2, 60),
+        max_price_concession=0.5,
+        reprice_steps=5,
+        reprice_interval=120,
+        instrument_cache_path=None,
+        iv_history_path=None,
+        min_iv_history=252,
+        iv_history_symbols=(),
+        prefetch_interval=120,
+        max_iv_data_age=600,
+        max_option_positions_age=300,
+        hub=None,
+        trade_logging_file_paths=None,
+        logger=None,
+    ):
+        for _option_type in option_types:
+            if _option_type not in ('put', 'call'):
+                raise ValueError("option_types must be 'put' or 'call', got {}".format(_option_type))
+
+        self.option_types = tuple(option_types)
+        self.weekday_num = weekday_num
+        self.day_lag = day_lag
+        self.max_daily_open_positions = max_daily_open_positions
+        self.iv_rank_min = iv_rank_min
+        self.iv_percentile_min = iv_percentile_min
+        self.total_option_volume_min = total_option_volume_min
+        self.target_delta = target_delta
+        self.days_until_expiration_range = days_until_expiration_range
+        self.delta_tolerance = delta_tolerance
+        self.option_volume_min = option_volume_min
+        self.option_open_interest_min = option_open_interest_min
+        self.max_strike_width = max_strike_width
+        self.min_percent_return = min_percent_return
+        self.profit_target_percent = profit_target_percent
+        self.max_concurrent_requests = max_concurrent_requests
+        self.fill_missing_greeks = fill_missing_greeks
+        self.top_k = top_k
+        self.score = score
+        self.strikes_away = tuple(strikes_away)
+        self.strike_widths = tuple(strike_widths)
+        self.iv_history = IVHistory(path=iv_history_path) if iv_history_path else None
+        self.min_iv_history = min_iv_history
+        self.iv_history_symbols = tuple(iv_history_symbols)
+        self.risk_free_rate = risk_free_rate
+        self.hub = hub if hub is not None else DataHub(
+            prefetch_interval=prefetch_interval,
+            max_iv_data_age=max_iv_data_age,
+            max_option_positions_age=max_option_positions_age,
+            instrument_cache=OptionInstrumentCache(path=instrument_cache_path, max_workers=max_concurrent_requests),
+            order_poll_interval=order_poll_interval,
+        )
+        self.option_chain_cache = self.hub.option_chain_cache(
+            max_chains=max_cached_chains,
+            quote_ttl=quote_ttl,
+            target_delta=target_delta if band_refresh and not strike_widths else None,
+            delta_tolerance=delta_tolerance,
+            band_neighbors=max(self.strikes_away, default=1),
+        )
+        self.max_price_concession = max_price_concession
+        self.reprice_steps = reprice_steps
+        self.reprice_interval = reprice_interval
+        self.order_manager = OrderManager(
+            OrderMonitor(status_service=self.hub.order_status),
+            market_open=lambda: get_market_calendar().is_open(),
+        )
+        self.trade_logging_file_paths = trade_logging_file_paths or {
+            _option_type: '../trade_histories/{}_credit_spread.csv'.format(_option_type) for _option_type in self.option_types
+        }
+        self.logger = logger or logging.getLogger(__name__)
+
+    def get_ticker_lists(self, iv_data, recent_open_tickers):
+        """Get tickers with high IV and volume and without recent open positions, keyed by option type.
+
+        recent_open_tickers : dict
+            Tickers with recent open positions keyed by option type, see `PositionTracker.refresh`.
+        """
+        ticker_list = iv_data.loc[
+            (iv_data.optionsImpliedVolatilityRank1y > self.iv_rank_min) &
+            (iv_data.optionsImpliedVolatilityPercentile1y > self.iv_percentile_min) &
+            (iv_data.optionsTotalVolume > self.total_option_volume_min)
+        ]['symbol'].tolist()
+
+        # add symbols screened on their option chain IV history, outside Barchart's most active lists,
+        # unless Barchart lists them with too little option volume
+        if self.iv_history is not None:
+            low_volume = set(iv_data.loc[iv_data.optionsTotalVolume <= self.total_option_volume_min, 'symbol'])
+            ticker_list = list(dict.fromkeys(ticker_list + [
+                _ticker for _ticker in self.iv_history.screen(
+                    self.iv_rank_min, self.iv_percentile_min, min_observations=self.min_iv_history, source=OPTION_CHAIN)
+                if _ticker not in low_volume
+            ]))
+
+        ticker_lists = {}
+        for _option_type in self.option_types:
+            remove_tickers = recent_open_tickers[_option_type]
+            ticker_lists[_option_type] = [_ticker for _ticker in ticker_list if _ticker not in remove_tickers]
+
+        return ticker_lists
+
+    def scan(self):
+        """Find the best `top_k` credit spread trades, keyed by option type and sorted by ascending score."""
+        option_types = [
+            _option_type for _option_type in self.option_types
+            if self.order_manager.exposure(_option_type) < self.max_daily_open_positions
+        ]
+        if not option_types:
+            return {}
+
+        # every expiration date within the range
+        expiration_dates = find_weekday_dates(
+            days_until_expiration_range=self.days_until_expiration_range,
+            weekday_num=self.weekday_num,
+        )
+
+        # shared data fetch for all option types
+        iv_data = self.hub.get_iv_data()
+        self.logger.debug('Barchart latency {}, IV data age {:.0f} seconds.'.format(
+            get_barchart_client().latency_stats(), self.hub.age('iv_data')))
+        if self.iv_history is not None:
+            self.iv_history.update_from_snapshot(iv_data)
+        recent_open_tickers = self.hub.get_recent_open_tickers(self.day_lag)
+        # tickers with working orders count as open positions
+        recent_open_tickers = {
+            _option_type: recent_open_tickers[_option_type] | self.order_manager.pending_symbols(_option_type)
+            for _option_type in self.option_types
+        }
+        ticker_lists = self.get_ticker_lists(iv_data, recent_open_tickers)
+
+        top_candidates = {
+            _option_type: TopCandidates(
+                k=self.top_k,
+                score=self.score,
+                max_strike_width=self.max_strike_width,
+                min_percent_return=self.min_percent_return,
+            )
+            for _option_type in option_types
+        }
+        side_tickers = {_option_type: set(ticker_lists[_option_type]) for _option_type in option_types}
+        spot_prices = {}
+        ticker_list = [_ticker for _option_type in option_types for _ticker in ticker_lists[_option_type]]
+        iv_history_chains = {}
+        if self.iv_history is not None:
+            ticker_list += list(self.iv_history_symbols)
+
+        # evaluate each option chain as soon as it arrives
+        for (_ticker, _expiration_date), _option_chain in iter_expiration_option_chains(
+            ticker_list=ticker_list,
+            expiration_dates=expiration_dates,
+            option_type=option_types[0] if len(option_types) == 1 else None,
+            max_workers=self.max_concurrent_requests,
+            cache=self.option_chain_cache,
+        ):
+            if self.fill_missing_greeks:
+                # the first chain missing greeks fetches the spot prices of the whole scan
+                _option_chain = self.fill_greeks(_ticker, _option_chain, spot_prices, ticker_list)
+            if self.iv_history is not None:
+                iv_history_chains[(_ticker, _expiration_date)] = _option_chain
+
+            for _option_type in option_types:
+                if _ticker in side_tickers[_option_type]:
+                    top_candidates[_option_type].push(find_credit_spread_candidates(
+                        option_chains=[_option_chain],
+                        option_type=_option_type,
+                        target_delta=self.target_delta,
+                        delta_tolerance=self.delta_tolerance,
+                        option_volume_min=self.option_volume_min,
+                        option_open_interest_min=self.option_open_interest_min,
+                        strikes_away=self.strikes_away,
+                        strike_widths=self.strike_widths,
+                    ))
+
+        self.logger.debug('Option chain cache {}.'.format(self.option_chain_cache.stats()))
+        if self.iv_history is not None:
+            self.iv_history.update_from_option_chains(iv_history_chains)
+            self.iv_history.save()
+
+        return {_option_type: _top_candidates.top() for _option_type, _top_candidates in top_candidates.items()}
+
+    def fill_greeks(self, ticker, option_chain, spot_prices, ticker_list=()):
+        """Fill missing implied volatility and greeks of an option chain.
+
+        spot_prices : dict
+            Underlying prices keyed by ticker. If `ticker` is missing, the latest prices of it and
+            every ticker of `ticker_list` not fetched yet are added in one request, NaN without a price.
+        """
+        if not missing_greeks(option_chain).any():
+            return option_chain
+
+        if ticker not in spot_prices:
+            tickers = [_ticker for _ticker in dict.fromkeys([ticker, *ticker_list]) if _ticker not in spot_prices]
+            latest_prices = get_latest_prices(tickers)
+            spot_prices.update({_ticker: latest_prices.get(_ticker, np.nan) for _ticker in tickers})
+
+        return fill_option_chain_greeks(option_chain, spot_prices, rate=self.risk_free_rate)
+
+    def open_trade(self, option_type, credit_spread_trade, on_filled=None):
+        """Send the opening order of a credit spread without waiting for it to fill.
+
+        Once the order fills, the profit target closing order is sent, the trade is logged and
+        `on_filled` is called with the opening order and closing order receipt. Returns the
+        opening order receipt.
+        """
+        credit_spread_open_order_list = [
+            {'expirationDate': credit_spread_trade['expiration_date'],
+             'strike': credit_spread_trade['short_strike_price'],
+             'optionType': option_type,
+             'effect': 'open',
+             'action': 'sell', },
+            {'expirationDate': credit_spread_trade['expiration_date'],
+             'strike': credit_spread_trade['long_strike_price'],
+             'optionType': option_type,
+             'effect': 'open',
+             'action': 'buy', },
+        ]
+
+        def on_fill(open_order):
+            close_order_receipt = self.send_close_order(option_type, credit_spread_trade, credit=open_order.get('price'))
+            self.log_trade(option_type, credit_spread_trade, open_order, close_order_receipt)
+            # the new position must be seen by the next scan
+            self.hub.invalidate('option_positions')
+            if on_filled is not None:
+                on_filled(open_order, close_order_receipt)
+
+        # walk the limit price from the mid price toward the natural price until filled
+        walk = None
+        if self.max_price_concession > 0 and self.reprice_steps > 0:
+            walk = PriceWalk(
+                start_price=credit_spread_trade['trade_limit_price'],
+                natural_price=credit_spread_trade['short_bid_price'] - credit_spread_trade['long_ask_price'],
+                max_concession=self.max_price_concession,
+                steps=self.reprice_steps,
+                interval=self.reprice_interval,
+            )
+
+        # send order to Robinhood
+        return self.order_manager.submit(
+            option_type,
+            credit_spread_trade['symbol'],
+            lambda _price: rs.order_option_credit_spread(
+                price=round(_price, 2),
+                symbol=credit_spread_trade['symbol'],
+                quantity=1,
+                spread=credit_spread_open_order_list,
+                timeInForce='gfd',
+            ),
+            price=credit_spread_trade['trade_limit_price'].round(2),
+            walk=walk,
+            on_fill=on_fill,
+        )
+
+    def execute_trade(self, option_type, credit_spread_trade):
+        """Open a credit spread and wait until it fills or is cancelled.
+
+        Returns the opening and closing order receipts. The closing receipt is None if the
+        opening order was cancelled.
+        """
+        close_order_receipts = []
+        credit_spread_open_order_receipt = self.open_trade(
+            option_type,
+            credit_spread_trade,
+            on_filled=lambda _open_order, _close_order_receipt: close_order_receipts.append(_close_order_receipt),
+        )
+        if credit_spread_open_order_receipt and 'id' in credit_spread_open_order_receipt:
+            # wait through replacement orders of the price walk
+            self.order_manager.wait_trade(credit_spread_open_order_receipt['id'])
+
+        credit_spread_close_order_receipt = close_order_receipts[0] if close_order_receipts else None
+        return credit_spread_open_order_receipt, credit_spread_close_order_receipt
+
+    def send_close_order(self, option_type, credit_spread_trade, credit=None):
+        """Send the profit target closing order of a filled credit spread.
+
+        credit : float
+            Credit received when the spread was opened, defaults to the trade limit price.
+        """
+        credit = credit_spread_trade['trade_limit_price'] if credit is None else float(credit)
+        credit_spread_close_order_list = [
+            {'expirationDate': credit_spread_trade['expiration_date'],
+             'strike': credit_spread_trade['short_strike_price'],
+             'optionType': option_type,
+             'effect': 'close',
+             'action': 'buy', },
+            {'expirationDate': credit_spread_trade['expiration_date'],
+             'strike': credit_spread_trade['long_strike_price'],
+             'optionType': option_type,
+             'effect': 'close',
+             'action': 'sell', },
+        ]
+
+        return rs.order_option_debit_spread(
+            price=round(credit * self.profit_target_percent, 2),
+            symbol=credit_spread_trade['symbol'],
+            quantity=1,
+            spread=credit_spread_close_order_list,
+            timeInForce='gtc',
+        )
+
+    def log_trade(self, option_type, credit_spread_trade, open_order_receipt, close_order_receipt):
+        """Append a filled trade to the trade history csv of its option type."""
+        trade_logging_file_path = self.trade_logging_file_paths[option_type]
+        credit_spread_logging = pd.read_csv(trade_logging_file_path)
+        credit_spread_logging_new_trade = pd.DataFrame(credit_spread_trade).T
+
+        for _col in credit_spread_logging_new_trade.columns:
+            if _col not in ['index', 'symbol', 'type', 'expiration_date']:
+                credit_spread_logging_new_trade[_col] = credit_spread_logging_new_trade[_col].astype(float).round(6)
+
+        credit_spread_logging_new_trade['trade_open_id'] = open_order_receipt['id']
+        credit_spread_logging_new_trade['trade_close_id'] = close_order_receipt['id']
+
+        if 'index' in credit_spread_logging_new_trade.columns:
+            credit_spread_logging_new_trade.drop(columns=['index'], inplace=True)
+
+        credit_spread_logging = pd.concat([credit_spread_logging, credit_spread_logging_new_trade])
+        credit_spread_logging.drop_duplicates(inplace=True)
+        credit_spread_logging.to_csv(trade_logging_file_path, index=False)
+
+    def trading_done(self):
+        """Check if max daily open positions are filled for all option types."""
+        return all(
+            self.order_manager.filled(_option_type) >= self.max_daily_open_positions for _option_type in self.option_types
+        )
+
+    def warm_up(self):
+        """Prime the shared data and option chain cache before the open, so the first scan only refreshes quotes.
+
+        Subscribes to the data hub, so the implied volatility data and option positions fetched
+        now are kept fresh until the open, then fetches the listed expiration dates and option
+        instruments of every candidate ticker.
+        """
+        self.hub.subscribe(self)
+        iv_data = self.hub.get_iv_data()
+        ticker_lists = self.get_ticker_lists(iv_data, self.hub.get_recent_open_tickers(self.day_lag))
+        ticker_list = list(dict.fromkeys(
+            [_ticker for _option_type in self.option_types for _ticker in ticker_lists[_option_type]]))
+        expiration_dates = find_weekday_dates(
+            days_until_expiration_range=self.days_until_expiration_range,
+            weekday_num=self.weekday_num,
+        )
+        # same option chain keys as `scan`
+        option_type = self.option_types[0] if len(self.option_types) == 1 else None
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_requests) as executor:
+            listed_expiration_dates = executor.map(self.option_chain_cache.get_expiration_dates, ticker_list)
+            option_chain_keys = [
+                (_ticker, _expiration_date)
+                for _ticker, _listed in zip(ticker_list, listed_expiration_dates)
+                for _expiration_date in expiration_dates if _expiration_date in _listed
+            ]
+            list(executor.map(
+                lambda _key: self.option_chain_cache.get_instruments(_key[0], _key[1], option_type),
+                option_chain_keys,
+            ))
+
+        self.logger.info('Warmed up {} option chains of {} tickers. Option chain cache {}.'.format(
+            len(option_chain_keys), len(ticker_list), self.option_chain_cache.stats()))
+
+    def start_session(self):
+        """Reset the daily open positions and subscribe to the data hub for a trading day, if `warm_up` has not."""
+        self.order_manager.reset()
+        # implied volatility data and option positions are refreshed in the background between scans
+        self.hub.subscribe(self)
+
+    def step(self):
+        """Scan once and open a trade for each option type, if any, without waiting for fills."""
+        if self.trading_done():
+            return
+
+        possible_trades = self.scan()
+
+        # open a trade for each option type, if any, and keep scanning while it is working
+        for _option_type, _possible_trades in possible_trades.items():
+            if _possible_trades.shape[0] > 0 and self.order_manager.exposure(_option_type) < self.max_daily_open_positions:
+                self.open_trade(_option_type, _possible_trades.iloc[-1])
+
+    def end_session(self, timeout=900):
+        """Wait up to `timeout` seconds for working orders and unsubscribe from the data hub."""
+        # day orders still working are cancelled at the close
+        if self.order_manager.has_pending():
+            self.logger.info('Waiting for working orders.')
+            self.order_manager.wait(timeout=timeout)
+
+        self.order_manager.stop()
+        self.hub.unsubscribe(self)
+
+    def run(self):
+        """Trade credit spreads while the market is open, then wait for the next market open."""
+        # login to Robinhood, reusing the saved session token
+        robinhood_login()
+
+        market_opens, market_closes = get_next_market_open_hours()
+        self.logger.info('Market opens {} and closes {}.'.format(market_opens, market_closes))
+        current_time = parser.parse(datetime.now(timezone.utc).isoformat())
+
+        self.start_session()
+        # while market is open, execute trading strategy
+        while (current_time >= market_opens) & (current_time < market_closes) & (not self.trading_done()):
+            self.step()
+
+            # delay to prevent overwhelming Robinhood API
+            self.logger.info('Sleep for 300 seconds.')
+            sleep(300)
+
+            # get new current time
+            current_time = parser.parse(datetime.now(timezone.utc).isoformat())
+
+        # the session stays logged in and its token is refreshed in the background
+        self.end_session()
+
+        # pause trading if max daily open positions are reached
+        if self.trading_done():
+            self.logger.info('Max daily open positions reached. Sleep for {}.'.format(timedelta(seconds=23400)))
+            sleep(23400)
+
+        # seconds until next market open
+        wait_time = max(seconds_until_market_open(market_opens), 0)
+
+        # require login at least once per day to avoid error
+        wait_time = wait_time / 4
+        self.logger.info('Market closed. Waiting {}.'.format(timedelta(seconds=wait_time)))
+        sleep(wait_time)
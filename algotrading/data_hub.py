@@ -0,0 +1,120 @@
+import logging
+import threading
+
+from algotrading.chain_cache import OptionChainCache
+from algotrading.instrument_cache import OptionInstrumentCache
+from algotrading.orders import OrderStatusService
+from algotrading.positions import PositionTracker
+from algotrading.prefetch import Prefetcher
+from algotrading.utils import get_implied_volatility_data
+
+
+logger = logging.getLogger(__name__)
+
+
+class DataHub:
+    """Market and account data shared by every strategy in one process.
+
+    The hub owns the implied volatility snapshot, the option positions, the option chain caches
+    and the order status service. Strategies subscribe to it for a trading session; the IV
+    snapshot and option positions are refreshed in the background while anyone is subscribed,
+    so each upstream request is made once per refresh no matter how many strategies read it.
+    The last strategy to unsubscribe stops the refreshes.
+
+    prefetch_interval : float
+        Seconds between background refreshes of the implied volatility data and option positions.
+    max_iv_data_age, max_option_positions_age : float
+        Seconds before the shared implied volatility data or option positions are too stale to
+        use and are fetched synchronously instead.
+    instrument_cache : OptionInstrumentCache
+        Cache used to look up the option type of positions.
+    order_poll_interval : tuple
+        Minimum and maximum seconds between order status polls, see `OrderStatusService`.
+    """
+
+    def __init__(
+        self,
+        prefetch_interval=120,
+        max_iv_data_age=600,
+        max_option_positions_age=300,
+        instrument_cache=None,
+        order_poll_interval=(2, 60),
+    ):
+        self.instrument_cache = instrument_cache if instrument_cache is not None else OptionInstrumentCache()
+        self.position_tracker = PositionTracker(instrument_cache=self.instrument_cache)
+        self.order_status = OrderStatusService(min_interval=order_poll_interval[0], max_interval=order_poll_interval[1])
+        self.prefetcher = Prefetcher(
+            {
+                'iv_data': get_implied_volatility_data,
+                'option_positions': self.position_tracker.refresh,
+            },
+            interval=prefetch_interval,
+            max_age={'iv_data': max_iv_data_age, 'option_positions': max_option_positions_age},
+        )
+        self._option_chain_caches = {}
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def option_chain_cache(self, **kwargs):
+        """Get the shared OptionChainCache for the given `OptionChainCache` arguments, created on first use.
+
+        Strategies asking for the same settings share one cache, and so its quotes and instruments.
+        """
+        key = tuple(sorted(kwargs.items()))
+        with self._lock:
+            if key not in self._option_chain_caches:
+                self._option_chain_caches[key] = OptionChainCache(**kwargs)
+            return self._option_chain_caches[key]
+
+    def subscribe(self, subscriber):
+        """Start background refreshes for `subscriber`, if it is the first one."""
+        with self._lock:
+            first = not self._subscribers
+            self._subscribers.add(subscriber)
+        if first:
+            logger.debug('Starting data hub refreshes.')
+            self.prefetcher.start()
+
+    def unsubscribe(self, subscriber):
+        """Stop background refreshes and order status polls, if `subscriber` is the last one."""
+        with self._lock:
+            self._subscribers.discard(subscriber)
+            last = not self._subscribers
+        if last:
+            logger.debug('Stopping data hub refreshes. Option chain caches {}.'.format(
+                [_cache.stats() for _cache in self._option_chain_caches.values()]))
+            self.prefetcher.stop()
+            self.prefetcher.invalidate()
+            self.order_status.stop()
+
+    def get_iv_data(self):
+        """Latest shared implied volatility snapshot."""
+        return self.prefetcher.get('iv_data')
+
+    def get_recent_open_tickers(self, day_lag):
+        """Tickers with an open position traded within the last `day_lag` days, keyed by option type.
+
+        See `PositionTracker.get_recent_open_tickers`.
+        """
+        self.prefetcher.get('option_positions')
+        return self.position_tracker.get_recent_open_tickers(day_lag)
+
+    def age(self, name):
+        """Seconds since a shared source, 'iv_data' or 'option_positions', was fetched."""
+        return self.prefetcher.age(name)
+
+    def invalidate(self, name=None):
+        """Drop a shared source, or all of them, so the next read fetches it."""
+        self.prefetcher.invalidate(name)
+
+
+_data_hub = None
+
+
+def get_data_hub():
+    """Get the data hub shared by all strategies in this process, with option instruments cached
+    in option_instruments.csv, created on first use."""
+    global _data_hub
+    if _data_hub is None:
+        _data_hub = DataHub(instrument_cache=OptionInstrumentCache(path='option_instruments.csv'))
+    return _data_hub
@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import robin_stocks.robinhood as rs
+
+from algotrading.utils import request_pages
+
+
+logger = logging.getLogger(__name__)
+
+INSTRUMENT_COLUMNS = ['chain_symbol', 'type', 'strike_price', 'expiration_date']
+
+
+class OptionInstrumentCache:
+    """In-memory and on-disk cache of option instrument metadata keyed by option id.
+
+    Option instruments do not change once listed, so each id is fetched from Robinhood once,
+    ever. Missing ids are fetched in batches of `batch_size` ids per request, with batches sent
+    concurrently. Ids that cannot be fetched raise instead of being looked up as NaN.
+
+    path : str
+        Optional csv file to load from and save new instruments to.
+    """
+
+    def __init__(self, path=None, batch_size=40, max_workers=8):
+        self.path = path
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.instruments = pd.DataFrame(columns=INSTRUMENT_COLUMNS, index=pd.Index([], name='id'))
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.instruments)
+
+    def add(self, records):
+        """Add instrument dictionaries returned by robin_stocks, e.g. from `find_tradable_options`."""
+        records = [_record for _record in records if _record and _record.get('id')]
+        if not records:
+            return
+        new_instruments = pd.DataFrame(
+            [[_record.get(_col) for _col in INSTRUMENT_COLUMNS] for _record in records],
+            columns=INSTRUMENT_COLUMNS,
+            index=pd.Index([_record['id'] for _record in records], name='id'),
+        )
+        new_instruments['strike_price'] = pd.to_numeric(new_instruments['strike_price'], errors='coerce')
+        with self._lock:
+            instruments = pd.concat([self.instruments, new_instruments])
+            self.instruments = instruments.loc[~instruments.index.duplicated(keep='last')]
+
+    def _fetch_batch(self, option_ids):
+        records = request_pages(rs.urls.option_instruments_url(), {'ids': ','.join(option_ids)})
+        return None if records is None else [_record for _record in records if _record]
+
+    def fetch(self, option_ids):
+        """Fetch instruments of `option_ids` from Robinhood and add them to the cache.
+
+        Raises RuntimeError if a batch fails, after adding the instruments of the other batches.
+        """
+        option_ids = list(dict.fromkeys(option_ids))
+        if not option_ids:
+            return
+        batches = [option_ids[i:i + self.batch_size] for i in range(0, len(option_ids), self.batch_size)]
+        failed = 0
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(batches))) as executor:
+            for _records in executor.map(self._fetch_batch, batches):
+                if _records is None:
+                    failed += 1
+                else:
+                    self.add(_records)
+
+        if self.path is not None:
+            self.save()
+        if failed:
+            raise RuntimeError('Failed to fetch {} of {} option instrument batches.'.format(failed, len(batches)))
+
+    def lookup(self, option_ids):
+        """Instrument metadata of `option_ids` as a DataFrame indexed by id, fetching missing ids.
+
+        Raises RuntimeError if an id cannot be fetched.
+        """
+        option_ids = pd.Index(option_ids).unique()
+        missing = option_ids.difference(self.instruments.index)
+        self.hits += len(option_ids) - len(missing)
+        self.misses += len(missing)
+        if len(missing):
+            logger.debug('Fetching {} option instruments.'.format(len(missing)))
+            self.fetch(missing.tolist())
+            unresolved = missing.difference(self.instruments.index)
+            if len(unresolved):
+                raise RuntimeError('Option instruments not found: {}.'.format(', '.join(map(str, unresolved))))
+        return self.instruments.reindex(option_ids)
+
+    def stats(self):
+        return {'instruments': len(self), 'hits': self.hits, 'misses': self.misses}
+
+    def save(self, path=None):
+        """Save the cache as a csv file."""
+        path = path or self.path
+        tmp_path = '{}.tmp'.format(path)
+        with self._lock:
+            self.instruments.to_csv(tmp_path)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        """Load the cache from a csv file saved by `save`."""
+        path = path or self.path
+        instruments = pd.read_csv(path, index_col='id', dtype={'chain_symbol': str, 'type': str, 'expiration_date': str})
+        with self._lock:
+            self.instruments = instruments[INSTRUMENT_COLUMNS]
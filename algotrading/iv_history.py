@@ -0,0 +1,232 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from datetime import date
+
+
+# where a symbol's IV history comes from, fixed at its first observation
+SNAPSHOT = 1
+OPTION_CHAIN = 2
+
+
+class IVHistory:
+    """Daily implied volatility history with IV rank and percentile for many symbols.
+
+    Each symbol keeps its last `window` daily IV observations in one row of a ring buffer
+    matrix. Updates on the same date overwrite that day's observation and a new date advances
+    the ring, so one update per symbol is O(window) and only updated symbols have their IV rank
+    and percentile recomputed. Screening all symbols is then a single array comparison.
+
+    IV rank is (iv - min) / (max - min) over the window. IV percentile is the fraction of the
+    other observations in the window below the latest IV. Both are NaN until a symbol has at
+    least two observations.
+
+    A symbol's history has one source, set by its first observation: Barchart's weighted IV from
+    snapshots, or a near the money IV computed from option chains. Observations from the other
+    source are ignored, so one history never mixes the two definitions.
+
+    path : str
+        Optional .npz file to load from and save to.
+    window : int
+        Number of daily observations, 252 for one year of trading days.
+    """
+
+    def __init__(self, path=None, window=252):
+        self.path = path
+        self.window = window
+        self.symbols = []
+        self._rows = {}
+        self.values = np.full((0, window), np.nan, dtype=np.float32)
+        self.head = np.zeros(0, dtype=np.int32)
+        self.last_date = np.zeros(0, dtype='datetime64[D]')
+        self.observations = np.zeros(0, dtype=np.int32)
+        self.source = np.zeros(0, dtype=np.int8)
+        self.iv_rank = np.zeros(0, dtype=np.float32)
+        self.iv_percentile = np.zeros(0, dtype=np.float32)
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def _get_rows(self, symbols):
+        """Rows of `symbols`, adding rows for new symbols."""
+        new_symbols = [_symbol for _symbol in dict.fromkeys(symbols) if _symbol not in self._rows]
+        if new_symbols:
+            for _symbol in new_symbols:
+                self._rows[_symbol] = len(self.symbols)
+                self.symbols.append(_symbol)
+            n = len(new_symbols)
+            self.values = np.vstack([self.values, np.full((n, self.window), np.nan, dtype=np.float32)])
+            self.head = np.append(self.head, np.full(n, -1, dtype=np.int32))
+            self.last_date = np.append(self.last_date, np.full(n, np.datetime64('NaT'), dtype='datetime64[D]'))
+            self.observations = np.append(self.observations, np.zeros(n, dtype=np.int32))
+            self.source = np.append(self.source, np.zeros(n, dtype=np.int8))
+            self.iv_rank = np.append(self.iv_rank, np.full(n, np.nan, dtype=np.float32))
+            self.iv_percentile = np.append(self.iv_percentile, np.full(n, np.nan, dtype=np.float32))
+        return np.array([self._rows[_symbol] for _symbol in symbols], dtype=np.int64)
+
+    def update(self, symbols, ivs, on_date=None, overwrite=True, source=SNAPSHOT):
+        """Record implied volatilities of `symbols` for `on_date` (default today).
+
+        overwrite : bool
+            Replace an observation already recorded for `on_date`. If False, only symbols without
+            an observation on `on_date` are updated.
+        source : int
+            `SNAPSHOT` or `OPTION_CHAIN`. Symbols whose history has another source are skipped.
+        """
+        on_date = np.datetime64(on_date or date.today(), 'D')
+        ivs = np.asarray(ivs, dtype=np.float32)
+        valid = ~np.isnan(ivs)
+        symbols = [_symbol for _symbol, _valid in zip(symbols, valid) if _valid]
+        ivs = ivs[valid]
+        if not symbols:
+            return
+
+        # keep the last value of symbols repeated within one update
+        last = {_symbol: i for i, _symbol in enumerate(symbols)}
+        symbols = list(last)
+        ivs = ivs[list(last.values())]
+        rows = self._get_rows(symbols)
+
+        same_source = (self.source[rows] == 0) | (self.source[rows] == source)
+        rows, ivs = rows[same_source], ivs[same_source]
+        self.source[rows] = source
+
+        same_day = self.last_date[rows] == on_date
+        if not overwrite:
+            rows, ivs, same_day = rows[~same_day], ivs[~same_day], same_day[~same_day]
+
+        new_day = ~same_day
+        self.head[rows[new_day]] = (self.head[rows[new_day]] + 1) % self.window
+        self.observations[rows[new_day]] = np.minimum(self.observations[rows[new_day]] + 1, self.window)
+        self.last_date[rows] = on_date
+        self.values[rows, self.head[rows]] = ivs
+
+        self._update_statistics(rows)
+
+    def _update_statistics(self, rows):
+        """Recompute IV rank and percentile of `rows`."""
+        if rows.shape[0] == 0:
+            return
+        values = self.values[rows]
+        latest = values[np.arange(rows.shape[0]), self.head[rows]]
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            low = np.nanmin(values, axis=1)
+            high = np.nanmax(values, axis=1)
+            rank = np.where(high > low, (latest - low) / (high - low), 0.0)
+            others = np.sum(~np.isnan(values), axis=1) - 1
+            percentile = np.sum(values < latest[:, None], axis=1) / others
+
+        enough = self.observations[rows] >= 2
+        self.iv_rank[rows] = np.where(enough, rank, np.nan)
+        self.iv_percentile[rows] = np.where(enough, percentile, np.nan)
+
+    def update_from_snapshot(self, iv_data, on_date=None):
+        """Record IVs from a `get_implied_volatility_data` snapshot."""
+        self.update(
+            iv_data['symbol'].tolist(),
+            pd.to_numeric(iv_data['optionsWeightedImpliedVolatility'], errors='coerce').to_numpy(),
+            on_date=on_date,
+        )
+
+    @staticmethod
+    def near_the_money_iv(option_chain):
+        """Mean IV of the contracts of an OptionChain closest to 0.5 absolute delta, NaN if there are none."""
+        distance = np.abs(np.abs(np.asarray(option_chain['delta'], dtype=float)) - 0.5)
+        ivs = np.asarray(option_chain['implied_volatility'], dtype=float)
+        valid = ~np.isnan(distance) & ~np.isnan(ivs)
+        if not valid.any():
+            return np.nan
+        distance, ivs = distance[valid], ivs[valid]
+        return float(ivs[distance == distance.min()].mean())
+
+    def update_from_option_chains(self, option_chains, on_date=None):
+        """Record locally computed IVs from the OptionChains of one scan.
+
+        option_chains : dict
+            OptionChains keyed by (symbol, expiration date), e.g. as streamed by `iter_expiration_option_chains`.
+
+        The IV of a symbol is `near_the_money_iv` of its nearest expiration date with IVs, using
+        whichever option types were fetched.
+        """
+        ivs = {}
+        for (_symbol, _), _option_chain in sorted(option_chains.items(), key=lambda _item: _item[0][1]):
+            if _symbol not in ivs and not _option_chain.empty:
+                iv = self.near_the_money_iv(_option_chain)
+                if not np.isnan(iv):
+                    ivs[_symbol] = iv
+        self.update(list(ivs), list(ivs.values()), on_date=on_date, source=OPTION_CHAIN)
+
+    def screen(self, iv_rank_min, iv_percentile_min, min_observations=None, max_age_days=4, on_date=None, source=None):
+        """Symbols with IV rank and percentile above the minimums and enough recent history.
+
+        max_age_days : int
+            Days since the last observation, as of `on_date` (default today), after which a symbol is stale and skipped.
+        source : int
+            Optional `SNAPSHOT` or `OPTION_CHAIN`, to screen only symbols whose history has that source.
+        """
+        min_observations = self.window if min_observations is None else min_observations
+        since = np.datetime64(on_date or date.today(), 'D') - np.timedelta64(max_age_days, 'D')
+        with np.errstate(invalid='ignore'):
+            mask = (
+                (self.iv_rank > iv_rank_min) &
+                (self.iv_percentile > iv_percentile_min) &
+                (self.observations >= min_observations) &
+                (self.last_date >= since)
+            )
+        if source is not None:
+            mask &= self.source == source
+        return [self.symbols[i] for i in np.flatnonzero(mask)]
+
+    def to_frame(self):
+        """Latest IV, IV rank and IV percentile of every symbol."""
+        rows = np.arange(len(self.symbols))
+        latest = self.values[rows, self.head] if len(self.symbols) else np.zeros(0, dtype=np.float32)
+        return pd.DataFrame({
+            'symbol': self.symbols,
+            'date': self.last_date,
+            'implied_volatility': latest,
+            'iv_rank': self.iv_rank,
+            'iv_percentile': self.iv_percentile,
+            'observations': self.observations,
+            'source': self.source,
+        })
+
+    def save(self, path=None):
+        """Save the history as a compressed .npz file."""
+        path = path or self.path
+        tmp_path = '{}.tmp.npz'.format(path)
+        np.savez_compressed(
+            tmp_path,
+            symbols=np.array(self.symbols, dtype=str),
+            values=self.values,
+            head=self.head,
+            last_date=self.last_date,
+            observations=self.observations,
+            source=self.source,
+        )
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        """Load the history from a .npz file saved by `save`."""
+        path = path or self.path
+        with np.load(path) as data:
+            if data['values'].shape[1] != self.window:
+                raise ValueError('IV history in {} has window {}, expected {}.'.format(
+                    path, data['values'].shape[1], self.window))
+            self.symbols = data['symbols'].tolist()
+            self.values = data['values']
+            self.head = data['head']
+            self.last_date = data['last_date']
+            self.observations = data['observations']
+            # histories saved before sources were tracked adopt the next source recorded
+            self.source = data['source'] if 'source' in data else np.zeros(len(self.symbols), dtype=np.int8)
+        self._rows = {_symbol: i for i, _symbol in enumerate(self.symbols)}
+        self.iv_rank = np.full(len(self.symbols), np.nan, dtype=np.float32)
+        self.iv_percentile = np.full(len(self.symbols), np.nan, dtype=np.float32)
+        self._update_statistics(np.arange(len(self.symbols)))
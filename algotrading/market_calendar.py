@@ -0,0 +1,225 @@
+import logging
+import os
+import threading
+
+import pandas as pd
+import robin_stocks.robinhood as rs
+
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta, timezone
+from dateutil import parser, tz
+from dateutil.easter import easter
+
+
+logger = logging.getLogger(__name__)
+
+MARKET_TIMEZONE = tz.gettz('America/New_York')
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """Date of the `n`th `weekday` (0 is Monday) of a month, or the last one if `n` is -1."""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year + month // 12, month % 12 + 1, 1) - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _observed(holiday):
+    """Weekday a fixed date holiday is observed on: Friday for Saturday, Monday for Sunday."""
+    if holiday.weekday() == 5:
+        return holiday - timedelta(days=1)
+    if holiday.weekday() == 6:
+        return holiday + timedelta(days=1)
+    return holiday
+
+
+def xnys_holidays(year):
+    """NYSE full day holidays of a year, as a dictionary of date: name."""
+    holidays = {
+        _nth_weekday(year, 1, 0, 3): "Martin Luther King Jr. Day",
+        _nth_weekday(year, 2, 0, 3): "Washington's Birthday",
+        easter(year) - timedelta(days=2): 'Good Friday',
+        _nth_weekday(year, 5, 0, -1): 'Memorial Day',
+        _observed(date(year, 7, 4)): 'Independence Day',
+        _nth_weekday(year, 9, 0, 1): 'Labor Day',
+        _nth_weekday(year, 11, 3, 4): 'Thanksgiving Day',
+        _observed(date(year, 12, 25)): 'Christmas Day',
+    }
+    # new year's day on a saturday is not observed on the friday before
+    new_years_day = date(year, 1, 1)
+    if new_years_day.weekday() != 5:
+        holidays[_observed(new_years_day)] = "New Year's Day"
+    if year >= 2022:
+        holidays[_observed(date(year, 6, 19))] = 'Juneteenth'
+    return holidays
+
+
+def xnys_early_closes(year):
+    """NYSE 1pm early closes of a year: the day before Independence Day, the day after Thanksgiving
+    and Christmas Eve, when they are trading days."""
+    early_closes = [_nth_weekday(year, 11, 3, 4) + timedelta(days=1)]
+    for _date in [date(year, 7, 3), date(year, 12, 24)]:
+        if _date.weekday() < 4:
+            early_closes.append(_date)
+    return early_closes
+
+
+def xnys_sessions(start, end):
+    """NYSE regular sessions from `start` to `end` dates inclusive, as a DataFrame of date, opens_at and closes_at in UTC."""
+    holidays = {}
+    early_closes = set()
+    for _year in range(start.year, end.year + 1):
+        holidays.update(xnys_holidays(_year))
+        early_closes.update(xnys_early_closes(_year))
+
+    sessions = []
+    for _day in range((end - start).days + 1):
+        _date = start + timedelta(days=_day)
+        if _date.weekday() >= 5 or _date in holidays:
+            continue
+        close = EARLY_CLOSE if _date in early_closes else MARKET_CLOSE
+        sessions.append({
+            'date': _date.isoformat(),
+            'opens_at': datetime.combine(_date, MARKET_OPEN, MARKET_TIMEZONE).astimezone(timezone.utc),
+            'closes_at': datetime.combine(_date, close, MARKET_TIMEZONE).astimezone(timezone.utc),
+        })
+    return pd.DataFrame(sessions, columns=['date', 'opens_at', 'closes_at'])
+
+
+class MarketCalendar:
+    """Local calendar of market sessions answering market hours questions without network calls.
+
+    Sessions for the next `days` days come from the NYSE holiday and early close rules. Once a
+    day they are rebuilt and today's and the next session are checked against Robinhood's market
+    hours, to pick up unscheduled closures. Sessions are kept as sorted UTC timestamps, so each
+    question is a binary search.
+
+    path : str
+        Optional csv file caching the sessions across runs.
+    """
+
+    def __init__(self, path=None, market='XNYS', days=365, verify=True, clock=lambda: datetime.now(timezone.utc)):
+        self.path = path
+        self.market = market
+        self.days = days
+        self.verify = verify
+        self.clock = clock
+        self.refreshed_on = None
+        self._fresh_until = 0
+        self._dates = []
+        self._opens = []
+        self._closes = []
+        self._lock = threading.Lock()
+
+        if path is not None and os.path.exists(path):
+            self.load()
+
+    def _set_sessions(self, sessions):
+        sessions = sessions.sort_values('opens_at')
+        with self._lock:
+            self._dates = sessions['date'].tolist()
+            self._opens = [_time.timestamp() for _time in sessions['opens_at']]
+            self._closes = [_time.timestamp() for _time in sessions['closes_at']]
+
+    def sessions(self):
+        """Sessions as a DataFrame of date, opens_at and closes_at in UTC."""
+        with self._lock:
+            return pd.DataFrame({
+                'date': self._dates,
+                'opens_at': [datetime.fromtimestamp(_time, timezone.utc) for _time in self._opens],
+                'closes_at': [datetime.fromtimestamp(_time, timezone.utc) for _time in self._closes],
+            })
+
+    def refresh(self, now=None):
+        """Rebuild the sessions from today and check the nearest ones against Robinhood."""
+        today = (now or self.clock()).astimezone(MARKET_TIMEZONE).date()
+        sessions = xnys_sessions(today - timedelta(days=7), today + timedelta(days=self.days))
+
+        if self.verify:
+            try:
+                sessions = self._apply_market_hours(sessions, rs.markets.get_market_today_hours(market=self.market))
+                sessions = self._apply_market_hours(sessions, rs.markets.get_market_next_open_hours(market=self.market))
+            except Exception:
+                logger.exception('Failed to check market hours with Robinhood, using the NYSE rules only.')
+
+        self._set_sessions(sessions)
+        self._set_refreshed_on(today)
+        if self.path is not None:
+            self.save()
+
+    def _set_refreshed_on(self, refreshed_on):
+        self.refreshed_on = refreshed_on
+        # sessions are rebuilt after the next midnight in New York
+        self._fresh_until = datetime.combine(refreshed_on + timedelta(days=1), time(0), MARKET_TIMEZONE).timestamp()
+
+    @staticmethod
+    def _apply_market_hours(sessions, market_hours):
+        """Replace the session of a Robinhood market hours dictionary."""
+        if not market_hours or not market_hours.get('date'):
+            return sessions
+        sessions = sessions.loc[sessions['date'] != market_hours['date']]
+        if market_hours.get('is_open'):
+            session = pd.DataFrame([{
+                'date': market_hours['date'],
+                'opens_at': parser.parse(market_hours['opens_at']).astimezone(timezone.utc),
+                'closes_at': parser.parse(market_hours['closes_at']).astimezone(timezone.utc),
+            }])
+            sessions = pd.concat([sessions, session], ignore_index=True)
+        return sessions
+
+    def _ensure_fresh(self, now):
+        if now.timestamp() >= self._fresh_until or not self._opens:
+            self.refresh(now)
+
+    def _now(self, now):
+        now = now or self.clock()
+        self._ensure_fresh(now)
+        return now
+
+    def is_open(self, now=None):
+        """Check if the market is open."""
+        now = self._now(now)
+        timestamp = now.timestamp()
+        i = bisect_right(self._opens, timestamp) - 1
+        return i >= 0 and timestamp < self._closes[i]
+
+    def next_open_hours(self, now=None):
+        """Open and close times of the current session if it has not closed yet, else of the next session."""
+        now = self._now(now)
+        i = bisect_right(self._closes, now.timestamp())
+        if i >= len(self._opens):
+            self.days *= 2
+            self.refresh(now)
+            return self.next_open_hours(now)
+        return (datetime.fromtimestamp(self._opens[i], timezone.utc),
+                datetime.fromtimestamp(self._closes[i], timezone.utc))
+
+    def seconds_until_open(self, now=None):
+        """Seconds until the next session opens, 0 while the market is open."""
+        now = self._now(now)
+        market_opens, _ = self.next_open_hours(now)
+        return max((market_opens - now).total_seconds(), 0)
+
+    def save(self, path=None):
+        """Save the sessions as a csv file."""
+        path = path or self.path
+        tmp_path = '{}.tmp'.format(path)
+        sessions = self.sessions()
+        sessions['refreshed_on'] = self.refreshed_on.isoformat() if self.refreshed_on else None
+        sessions.to_csv(tmp_path, index=False)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        """Load the sessions from a csv file saved by `save`."""
+        path = path or self.path
+        sessions = pd.read_csv(path, dtype={'date': str, 'refreshed_on': str})
+        if sessions.empty:
+            return
+        sessions['opens_at'] = pd.to_datetime(sessions['opens_at'], utc=True).dt.to_pydatetime()
+        sessions['closes_at'] = pd.to_datetime(sessions['closes_at'], utc=True).dt.to_pydatetime()
+        self._set_sessions(sessions)
+        self._set_refreshed_on(date.fromisoformat(sessions['refreshed_on'].iloc[0]))
@@ -0,0 +1,208 @@
+import numpy as np
+import pandas as pd
+
+from pandas.api.types import union_categoricals
+
+
+# column name: dtype of the converted array
+OPTION_CHAIN_DTYPES = {
+    'id': object,
+    'url': object,
+    'symbol': 'category',
+    'expiration_date': 'category',
+    'type': 'category',
+    'strike_price': np.float64,
+    'mark_price': np.float64,
+    'adjusted_mark_price': np.float64,
+    'ask_price': np.float64,
+    'bid_price': np.float64,
+    'last_trade_price': np.float64,
+    'previous_close_price': np.float64,
+    'volume': np.int32,
+    'open_interest': np.int32,
+    'ask_size': np.int32,
+    'bid_size': np.int32,
+    'implied_volatility': np.float32,
+    'delta': np.float32,
+    'gamma': np.float32,
+    'rho': np.float32,
+    'theta': np.float32,
+    'vega': np.float32,
+}
+
+
+def _convert(values, dtype):
+    """Convert a list of raw robin_stocks values to a typed array."""
+    if dtype == 'category':
+        return pd.Categorical([None if _value is None else str(_value) for _value in values])
+    if dtype is object:
+        return np.array(values, dtype=object)
+
+    numeric = pd.to_numeric(pd.Series(values, dtype=object), errors='coerce').to_numpy(dtype=np.float64)
+    if np.issubdtype(dtype, np.integer):
+        numeric = np.nan_to_num(numeric, nan=0)
+    return np.ascontiguousarray(numeric, dtype=dtype)
+
+
+class OptionChain:
+    """Option chain stored as typed, contiguous column arrays.
+
+    Raw robin_stocks option data is all strings. OptionChain converts it once: prices to float64,
+    greeks and implied volatility to float32, volume, open interest and sizes to int32, and
+    symbol, expiration date and option type to categoricals. Missing numeric values are NaN,
+    except for integer columns where they are 0.
+    """
+
+    def __init__(self, columns):
+        lengths = {len(_values) for _values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError('OptionChain columns must all have the same length.')
+        self.columns = columns
+        self._strike_index = None
+
+    @classmethod
+    def from_records(cls, records):
+        """Create an OptionChain from a list of option dictionaries returned by robin_stocks."""
+        records = [_record for _record in (records or []) if _record]
+        columns = {}
+        for _col, _dtype in OPTION_CHAIN_DTYPES.items():
+            if _col == 'symbol':
+                values = [_record.get('chain_symbol', _record.get('symbol')) for _record in records]
+            else:
+                values = [_record.get(_col) for _record in records]
+            columns[_col] = _convert(values, _dtype)
+        return cls(columns)
+
+    @classmethod
+    def concat(cls, option_chains):
+        """Concatenate option chains into one OptionChain."""
+        option_chains = [_chain for _chain in option_chains if len(_chain) > 0]
+        if not option_chains:
+            return cls.from_records([])
+        if len(option_chains) == 1:
+            return option_chains[0]
+
+        columns = {}
+        for _col, _dtype in OPTION_CHAIN_DTYPES.items():
+            values = [_chain.columns[_col] for _chain in option_chains]
+            if _dtype == 'category':
+                columns[_col] = union_categoricals(values)
+            else:
+                columns[_col] = np.concatenate(values)
+        return cls(columns)
+
+    def __len__(self):
+        return len(self.columns['id'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        """Memory used by the column arrays, excluding python string objects."""
+        return sum(_values.nbytes for _values in self.columns.values())
+
+    def codes(self, column):
+        """Integer codes of a categorical column, for fast equality comparisons."""
+        return self.columns[column].codes
+
+    @property
+    def strike_index(self):
+        """Sorted strike index, built once per OptionChain.
+
+        Rows are grouped by (symbol, expiration date, type) and sorted by strike within each group.
+        Returns a dictionary of arrays:
+            - order: row of each sorted position
+            - position: sorted position of each row
+            - group: group number of each sorted position
+            - strike: strike price of each sorted position
+            - strike_rank: rank of each sorted position among the distinct strikes of its group
+        """
+        if self._strike_index is None:
+            strike = self.columns['strike_price']
+            order = np.lexsort((strike, self.codes('type'), self.codes('expiration_date'), self.codes('symbol')))
+            sorted_strike = strike[order]
+
+            new_group = np.zeros(order.shape[0], dtype=bool)
+            new_group[:1] = True
+            for _col in ['symbol', 'expiration_date', 'type']:
+                codes = self.codes(_col)[order]
+                new_group[1:] |= codes[1:] != codes[:-1]
+            new_strike = new_group.copy()
+            new_strike[1:] |= sorted_strike[1:] != sorted_strike[:-1]
+
+            group = np.cumsum(new_group) - 1
+            group_start = np.flatnonzero(new_group)
+            distinct_strikes = np.cumsum(new_strike)
+
+            position = np.empty_like(order)
+            position[order] = np.arange(order.shape[0])
+
+            self._strike_index = {
+                'order': order,
+                'position': position,
+                'group': group,
+                'strike': sorted_strike,
+                'strike_rank': distinct_strikes - distinct_strikes[group_start][group],
+            }
+        return self._strike_index
+
+    def find_legs(self, rows, direction, strikes_away=None, width=None):
+        """Find the leg paired with each of `rows` in the same (symbol, expiration date, type) group.
+
+        direction : int
+            -1 to look for lower strikes, 1 to look for higher strikes.
+        strikes_away : int
+            Find the leg this many distinct strikes away.
+        width : float
+            Find the nearest leg at least this far away in strike price.
+
+        Uses binary search on the sorted strike index for all rows at once. Returns the leg rows and
+        a mask of rows that have a leg; leg rows are -1 where there is none.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if self.empty or rows.shape[0] == 0:
+            return np.full(rows.shape[0], -1), np.zeros(rows.shape[0], dtype=bool)
+
+        index = self.strike_index
+        positions = index['position'][rows]
+
+        # offset each group so one sorted key covers all groups
+        if strikes_away is not None:
+            key = index['group'] * (len(self) + 1) + index['strike_rank']
+            target = key[positions] + direction * strikes_away
+            leg_positions = np.searchsorted(key, target, side='left')
+        else:
+            strike = index['strike'] - index['strike'].min()
+            key = index['group'] * (strike.max() + abs(width) + 1) + strike
+            target = key[positions] + direction * (abs(width) - 1e-9)
+            if direction < 0:
+                leg_positions = np.searchsorted(key, target, side='right') - 1
+                leg_positions = np.where(
+                    leg_positions < 0, -1, np.searchsorted(key, key[np.maximum(leg_positions, 0)], side='left'))
+            else:
+                leg_positions = np.searchsorted(key, target, side='left')
+
+        in_range = (leg_positions >= 0) & (leg_positions < len(self))
+        leg_positions = np.clip(leg_positions, 0, len(self) - 1)
+        valid = in_range & (index['group'][leg_positions] == index['group'][positions])
+        if strikes_away is not None:
+            valid &= key[leg_positions] == target
+
+        return np.where(valid, index['order'][leg_positions], -1), valid
+
+    def take(self, index):
+        """Create a new OptionChain from the rows at `index`."""
+        return OptionChain({_col: _values[index] for _col, _values in self.columns.items()})
+
+    def filter(self, mask):
+        """Create a new OptionChain from the rows where `mask` is True."""
+        return self.take(np.flatnonzero(mask))
+
+    def to_frame(self):
+        """Convert to a DataFrame keeping the typed columns."""
+        return pd.DataFrame(self.columns)
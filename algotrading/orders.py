@@ -0,0 +1,559 @@
+import logging
+import threading
+
+import pandas as pd
+import robin_stocks.robinhood as rs
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+
+
+logger = logging.getLogger(__name__)
+
+FILLED_STATES = {'filled'}
+CANCELLED_STATES = {'cancelled', 'rejected', 'failed', 'expired'}
+
+
+class OrderStatusService:
+    """Poll the status of all recent option orders with one paged request and publish changes.
+
+    Each poll fetches the orders updated since the latest `updated_at` seen (less `overlap`),
+    diffs their states against the last known states and calls every subscriber with each order
+    whose state changed. Polls start every `min_interval` seconds and back off by `backoff` up
+    to `max_interval`; `poll_soon` resets the interval, e.g. after an order is sent.
+
+    lookback : datetime.timedelta
+        How far back the first poll looks for orders.
+    """
+
+    def __init__(
+        self,
+        min_interval=2,
+        max_interval=60,
+        backoff=1.5,
+        overlap=timedelta(seconds=30),
+        lookback=timedelta(days=1),
+        fetch_orders=None,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.overlap = overlap
+        self.lookback = lookback
+        self.fetch_orders = fetch_orders or self._fetch_orders
+        self.orders = {}
+        self.watermark = None
+        self.polls = 0
+        self._interval = min_interval
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    @staticmethod
+    def _fetch_orders(updated_since):
+        data = rs.helper.request_get(
+            rs.urls.option_orders_url(), 'pagination', {'updated_at[gte]': updated_since.isoformat()})
+        return [_data for _data in (data or []) if _data]
+
+    def subscribe(self, callback):
+        """Call `callback(order, previous_state)` for every order state change."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            self._subscribers.remove(callback)
+
+    def get(self, order_id):
+        """Latest known order info of an order id, or None."""
+        with self._lock:
+            return self.orders.get(order_id)
+
+    def poll(self):
+        """Fetch recently updated orders and publish state changes. Returns the changed orders."""
+        with self._lock:
+            since = (self.watermark - self.overlap) if self.watermark is not None else \
+                datetime.now(timezone.utc) - self.lookback
+        orders = self.fetch_orders(since)
+        self.polls += 1
+
+        changes = []
+        with self._lock:
+            for _order in orders:
+                previous = self.orders.get(_order['id'])
+                previous_state = previous.get('state') if previous else None
+                self.orders[_order['id']] = _order
+                if _order.get('state') != previous_state:
+                    changes.append((_order, previous_state))
+                if _order.get('updated_at'):
+                    updated_at = pd.Timestamp(_order['updated_at'])
+                    self.watermark = updated_at if self.watermark is None else max(self.watermark, updated_at)
+            subscribers = list(self._subscribers)
+
+        for _order, _previous_state in changes:
+            for _callback in subscribers:
+                try:
+                    _callback(_order, _previous_state)
+                except Exception:
+                    logger.exception('Order status subscriber failed on order {}.'.format(_order['id']))
+        return [_order for _order, _ in changes]
+
+    def poll_soon(self):
+        """Poll now and reset the poll interval to `min_interval`."""
+        self._interval = self.min_interval
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                changes = self.poll()
+            except Exception:
+                logger.exception('Order status poll failed.')
+                changes = []
+            self._interval = self.min_interval if changes else min(self._interval * self.backoff, self.max_interval)
+            self._wake.wait(self._interval)
+            self._wake.clear()
+
+    def start(self):
+        """Poll in a background thread."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='order-status', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+class OrderMonitor:
+    """Watch many option orders at once and call back when they fill or are cancelled.
+
+    A background thread polls each watched order with adaptive backoff: first `min_interval`
+    seconds after it is watched, then each interval is `backoff` times longer, up to
+    `max_interval`. A change of state, e.g. a partial fill, resets the interval to
+    `min_interval`. Orders due at the same time are polled concurrently.
+
+    get_order : function
+        Function returning the order info dictionary of an order id.
+    status_service : OrderStatusService
+        Optional service to get order states from instead of polling each order.
+    """
+
+    def __init__(
+        self,
+        min_interval=2,
+        max_interval=60,
+        backoff=1.5,
+        max_workers=4,
+        get_order=None,
+        status_service=None,
+        clock=monotonic,
+    ):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.max_workers = max_workers
+        self.get_order = get_order or (lambda order_id: rs.get_option_order_info(order_id=order_id))
+        self.clock = clock
+        self.polls = 0
+        self._orders = {}
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+        self.status_service = status_service
+        if status_service is not None:
+            status_service.subscribe(self._on_status)
+
+    def _on_status(self, order, previous_state):
+        with self._condition:
+            watched = order['id'] in self._orders
+        if watched:
+            self._update(order['id'], order)
+
+    def watch(self, order_id, on_fill=None, on_cancel=None, on_update=None):
+        """Start watching an order.
+
+        on_fill, on_cancel : function
+            Called with the order info once the order is filled, or cancelled, rejected or failed.
+        on_update : function
+            Called with the order info whenever its state changes.
+        """
+        with self._condition:
+            self._orders[order_id] = {
+                'order': None,
+                'state': None,
+                'interval': self.min_interval,
+                'next_poll': self.clock() + self.min_interval,
+                'watched_at': self.clock(),
+                'on_fill': on_fill,
+                'on_cancel': on_cancel,
+                'on_update': on_update,
+                'done': threading.Event(),
+            }
+            self._condition.notify()
+
+        if self.status_service is not None:
+            self.status_service.start()
+            self.status_service.poll_soon()
+            order = self.status_service.get(order_id)
+            if order is not None:
+                self._update(order_id, order)
+            return
+        self._start()
+
+    def wait(self, order_id, timeout=None):
+        """Wait until a watched order is filled or cancelled and its callback has run.
+
+        Returns the last order info, or None if the order is not watched.
+        """
+        with self._condition:
+            entry = self._orders.get(order_id)
+        if entry is None:
+            return None
+        entry['done'].wait(timeout)
+        return entry['order']
+
+    def pending(self):
+        """Ids of watched orders not yet filled or cancelled."""
+        with self._condition:
+            return [_order_id for _order_id, _entry in self._orders.items() if not _entry['done'].is_set()]
+
+    def _start(self):
+        with self._condition:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name='order-monitor', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """Stop polling. Watched orders are kept and polled again after the next `watch`."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                with self._condition:
+                    while not self._stopped:
+                        waiting = [_entry['next_poll'] for _entry in self._orders.values() if not _entry['done'].is_set()]
+                        timeout = None if not waiting else min(waiting) - self.clock()
+                        if timeout is not None and timeout <= 0:
+                            break
+                        self._condition.wait(timeout)
+                    if self._stopped:
+                        return
+                    now = self.clock()
+                    due = [
+                        _order_id for _order_id, _entry in self._orders.items()
+                        if not _entry['done'].is_set() and _entry['next_poll'] <= now
+                    ]
+
+                for _order_id, _order in zip(due, executor.map(self._poll, due)):
+                    self._update(_order_id, _order)
+
+    def _poll(self, order_id):
+        self.polls += 1
+        try:
+            return self.get_order(order_id)
+        except Exception:
+            logger.exception('Failed to get order {}.'.format(order_id))
+            return None
+
+    def _update(self, order_id, order):
+        with self._condition:
+            entry = self._orders[order_id]
+            state = order.get('state') if order else None
+            changed = state is not None and state != entry['state']
+            if order:
+                entry['order'] = order
+            if changed:
+                entry['state'] = state
+                entry['interval'] = self.min_interval
+            else:
+                entry['interval'] = min(entry['interval'] * self.backoff, self.max_interval)
+            entry['next_poll'] = self.clock() + entry['interval']
+
+        if not changed:
+            return
+        logger.debug('Order {} is {} after {:.1f} seconds.'.format(order_id, state, self.clock() - entry['watched_at']))
+
+        callbacks = [entry['on_update']]
+        if state in FILLED_STATES:
+            callbacks.append(entry['on_fill'])
+        elif state in CANCELLED_STATES:
+            callbacks.append(entry['on_cancel'])
+        for _callback in callbacks:
+            if _callback is None:
+                continue
+            try:
+                _callback(order)
+            except Exception:
+                logger.exception('Order {} callback failed.'.format(order_id))
+
+        if state in FILLED_STATES | CANCELLED_STATES:
+            entry['done'].set()
+
+
+class PriceWalk:
+    """Schedule of limit prices stepping from `start_price` toward `natural_price`.
+
+    Prices move in `steps` equal steps, rounded to `tick`, until `max_concession` of the distance
+    between the start and natural price is given up. For a credit spread the start price is the
+    mid price and the natural price is the short leg's bid minus the long leg's ask.
+
+    interval : float
+        Seconds an order works at each price before it is cancelled and replaced.
+    """
+
+    def __init__(self, start_price, natural_price, max_concession=0.5, steps=5, interval=120, tick=0.01):
+        self.start_price = start_price
+        self.natural_price = natural_price
+        self.max_concession = max_concession
+        self.steps = steps
+        self.interval = interval
+        self.tick = tick
+
+    def prices(self):
+        """Limit prices to try in order, without repeats."""
+        floor_price = self.start_price + self.max_concession * (self.natural_price - self.start_price)
+        prices = []
+        for i in range(self.steps + 1):
+            price = self.start_price + (floor_price - self.start_price) * i / max(self.steps, 1)
+            price = max(round(round(price / self.tick) * self.tick, 2), self.tick)
+            if not prices or price != prices[-1]:
+                prices.append(price)
+        return prices
+
+
+class OrderManager:
+    """Send orders and track them in the background, with a consistent view of exposure.
+
+    Orders are grouped by a key, e.g. option type. A trade is pending from when its order is sent
+    until it fills or is cancelled, so `exposure` (pending plus filled trades of a key) can be
+    checked against a position limit while orders are still working, without waiting on fills.
+
+    A trade sent with a `PriceWalk` is repriced on its schedule: each step cancels the working
+    order and, once the cancel is confirmed, sends a replacement at the next price. The trade
+    stays pending throughout, and ends as cancelled if the replacement cannot be sent. Filled
+    trades are recorded in `executions` with their time to fill and price improvement over the
+    natural price.
+
+    monitor : OrderMonitor
+        Monitor polling the order states.
+    cancel_order : function
+        Function cancelling an order id.
+    market_open : function
+        Function returning whether the market is open. Orders are not repriced or replaced while
+        it is closed, so a walk still scheduled after the close does not send new day orders.
+    """
+
+    def __init__(self, monitor=None, cancel_order=None, market_open=None, clock=monotonic):
+        self.monitor = monitor or OrderMonitor()
+        self.cancel_order = cancel_order or (lambda order_id: rs.cancel_option_order(order_id))
+        self.market_open = market_open or (lambda: True)
+        self.clock = clock
+        self.executions = []
+        self._trades = {}
+        self._filled = {}
+        self._done = {}
+        self._lock = threading.Lock()
+
+    def submit(self, key, symbol, send_order, price, walk=None, on_fill=None, on_cancel=None):
+        """Send an order with `send_order` and track it without waiting for it to fill.
+
+        send_order : function
+            Function sending the order at a limit price and returning its receipt.
+        walk : PriceWalk
+            Optional schedule to reprice the order on while it is not filled. Replaces `price`.
+        on_fill, on_cancel : function
+            Called with the order info once the trade is filled or cancelled, after the exposure is updated.
+
+        Returns the receipt of the first order. Exceptions of `send_order` are raised after the
+        trade is dropped.
+        """
+        trade = {
+            'key': key,
+            'symbol': symbol,
+            'send_order': send_order,
+            'prices': walk.prices() if walk is not None else [price],
+            'walk': walk,
+            'step': 0,
+            'order_id': None,
+            'replacing': False,
+            'timer': None,
+            'submitted_at': self.clock(),
+            'on_fill': on_fill,
+            'on_cancel': on_cancel,
+            'done': threading.Event(),
+        }
+        with self._lock:
+            self._trades[id(trade)] = trade
+        try:
+            receipt = self._send(trade)
+        except Exception:
+            # a trade whose order was never sent is not exposure
+            with self._lock:
+                self._trades.pop(id(trade), None)
+            raise
+        with self._lock:
+            if receipt is None or 'id' not in receipt:
+                self._trades.pop(id(trade), None)
+            else:
+                self._done[receipt['id']] = trade['done']
+        return receipt
+
+    def _send(self, trade):
+        price = trade['prices'][trade['step']]
+        receipt = trade['send_order'](price)
+        if not receipt or 'id' not in receipt:
+            logger.error('Order for {} at {} failed: {}.'.format(trade['symbol'], price, receipt))
+            return receipt
+
+        trade['order_id'] = receipt['id']
+        trade['replacing'] = False
+        self.monitor.watch(receipt['id'], on_fill=self._on_fill(trade), on_cancel=self._on_cancel(trade))
+        if trade['walk'] is not None and trade['step'] + 1 < len(trade['prices']):
+            self._schedule_reprice(trade, receipt['id'])
+        return receipt
+
+    def _schedule_reprice(self, trade, order_id):
+        trade['timer'] = threading.Timer(trade['walk'].interval, self._reprice, [trade, order_id])
+        trade['timer'].daemon = True
+        trade['timer'].start()
+
+    def _reprice(self, trade, order_id):
+        """Cancel the working order of a trade; its cancel callback sends the replacement."""
+        with self._lock:
+            if id(trade) not in self._trades or trade['order_id'] != order_id:
+                return
+        if not self.market_open():
+            logger.debug('Market closed, not repricing order {} of {}.'.format(order_id, trade['symbol']))
+            return
+        with self._lock:
+            trade['replacing'] = True
+        logger.debug('Repricing order {} of {}.'.format(order_id, trade['symbol']))
+        try:
+            self.cancel_order(order_id)
+        except Exception:
+            logger.exception('Failed to cancel order {} of {}, retrying in {} seconds.'.format(
+                order_id, trade['symbol'], trade['walk'].interval))
+            trade['replacing'] = False
+            self._schedule_reprice(trade, order_id)
+
+    def _finish(self, trade, filled):
+        with self._lock:
+            self._trades.pop(id(trade), None)
+            if filled:
+                self._filled[trade['key']] = self._filled.get(trade['key'], 0) + 1
+        if trade['timer'] is not None:
+            trade['timer'].cancel()
+
+    def _on_fill(self, trade):
+        def on_fill(order):
+            self._finish(trade, filled=True)
+            start_price = trade['prices'][0]
+            fill_price = float(order.get('price') or trade['prices'][trade['step']])
+            natural_price = trade['walk'].natural_price if trade['walk'] is not None else None
+            execution = {
+                'key': trade['key'],
+                'symbol': trade['symbol'],
+                'order_id': order.get('id'),
+                'start_price': start_price,
+                'fill_price': fill_price,
+                'natural_price': natural_price,
+                'replacements': trade['step'],
+                'time_to_fill': self.clock() - trade['submitted_at'],
+                'concession': round(start_price - fill_price, 4),
+                'price_improvement': None if natural_price is None else round(fill_price - natural_price, 4),
+            }
+            self.executions.append(execution)
+            logger.info('Filled {}.'.format(execution))
+            try:
+                if trade['on_fill'] is not None:
+                    trade['on_fill'](order)
+            finally:
+                # done once the callback has run, e.g. sent the closing order
+                trade['done'].set()
+        return on_fill
+
+    def _on_cancel(self, trade):
+        def on_cancel(order):
+            if trade['replacing'] and trade['step'] + 1 < len(trade['prices']) and self.market_open():
+                trade['step'] += 1
+                try:
+                    receipt = self._send(trade)
+                except Exception:
+                    logger.exception('Failed to send replacement order of {}.'.format(trade['symbol']))
+                    receipt = None
+                if receipt and 'id' in receipt:
+                    return
+            self._finish(trade, filled=False)
+            try:
+                if trade['on_cancel'] is not None:
+                    trade['on_cancel'](order)
+            finally:
+                trade['done'].set()
+        return on_cancel
+
+    def exposure(self, key):
+        """Number of pending and filled trades of `key`."""
+        with self._lock:
+            return self._filled.get(key, 0) + sum(_trade['key'] == key for _trade in self._trades.values())
+
+    def filled(self, key):
+        """Number of filled trades of `key`."""
+        with self._lock:
+            return self._filled.get(key, 0)
+
+    def pending_symbols(self, key):
+        """Symbols with pending trades of `key`."""
+        with self._lock:
+            return {_trade['symbol'] for _trade in self._trades.values() if _trade['key'] == key}
+
+    def has_pending(self):
+        with self._lock:
+            return bool(self._trades)
+
+    def wait(self, timeout=None):
+        """Wait until all pending trades are filled or cancelled, up to `timeout` seconds."""
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._lock:
+            trades = list(self._trades.values())
+        for _trade in trades:
+            remaining = None if deadline is None else max(deadline - self.clock(), 0)
+            if not _trade['done'].wait(remaining):
+                return
+
+    def wait_trade(self, order_id, timeout=None):
+        """Wait until the trade sent with the receipt id `order_id` is filled or cancelled, through
+        any replacement orders, up to `timeout` seconds. Returns True if it is done."""
+        with self._lock:
+            done = self._done.get(order_id)
+        return done is None or done.wait(timeout)
+
+    def reset(self):
+        """Reset filled trade counts, e.g. at the start of a trading day."""
+        with self._lock:
+            self._filled = {}
+            self._done = {_order_id: _done for _order_id, _done in self._done.items() if not _done.is_set()}
+
+    def stop(self):
+        with self._lock:
+            trades = list(self._trades.values())
+        for _trade in trades:
+            if _trade['timer'] is not None:
+                _trade['timer'].cancel()
+        self.monitor.stop()
@@ -0,0 +1,119 @@
+import logging
+import threading
+
+import pandas as pd
+import robin_stocks.robinhood as rs
+
+from datetime import datetime, timedelta, timezone
+
+from algotrading.instrument_cache import OptionInstrumentCache
+
+
+logger = logging.getLogger(__name__)
+
+
+class PositionTracker:
+    """Local state of the account's option positions, updated incrementally.
+
+    The first refresh pages through every option position. Later refreshes only fetch positions
+    updated since the latest `updated_at` seen (the watermark, less `overlap` for clock skew) and
+    merge them by id. Everything is fetched again once `full_refresh_interval` has passed, to
+    pick up anything the incremental fetches missed.
+
+    After each refresh, tickers with an open position that was also traded within the last
+    `day_lag` days are indexed by option type for O(1) lookups.
+
+    instrument_cache : OptionInstrumentCache
+        Cache used to look up the option type of new positions.
+    """
+
+    def __init__(
+        self,
+        day_lag=7,
+        instrument_cache=None,
+        overlap=timedelta(minutes=5),
+        full_refresh_interval=timedelta(days=1),
+        clock=lambda: datetime.now(timezone.utc),
+    ):
+        self.day_lag = day_lag
+        self.instrument_cache = instrument_cache if instrument_cache is not None else OptionInstrumentCache()
+        self.overlap = overlap
+        self.full_refresh_interval = full_refresh_interval
+        self.clock = clock
+        self.positions = {}
+        self.watermark = None
+        self.last_full_refresh = None
+        self.recent_open_tickers = {'put': frozenset(), 'call': frozenset()}
+        self._lock = threading.Lock()
+
+    def _fetch(self, updated_since=None):
+        if updated_since is None:
+            data = rs.get_all_option_positions()
+        else:
+            data = rs.helper.request_get(
+                rs.urls.option_positions_url(None), 'pagination', {'updated_at[gte]': updated_since.isoformat()})
+        # robin_stocks returns [None] when a request fails
+        if data is None or any(_data is None for _data in data):
+            raise RuntimeError('Failed to fetch option positions.')
+        return data
+
+    def refresh(self, full=False):
+        """Fetch new and updated positions and rebuild the recent open tickers index.
+
+        Returns the recent open tickers, a dictionary of frozensets keyed by option type. A failed
+        fetch raises and keeps the previous positions.
+        """
+        with self._lock:
+            now = self.clock()
+            full = full or self.watermark is None or now - self.last_full_refresh >= self.full_refresh_interval
+
+            records = self._fetch() if full else self._fetch(self.watermark - self.overlap)
+            logger.debug('Fetched {} {} option positions.'.format(len(records), 'all' if full else 'updated'))
+
+            # build the new positions before replacing the old ones
+            positions = {} if full else dict(self.positions)
+            records = [_record for _record in records if _record.get('option_id')]
+            if records:
+                option_types = self.instrument_cache.lookup([_record['option_id'] for _record in records])['type']
+                for _record in records:
+                    positions[_record.get('id', _record['option_id'])] = {
+                        'chain_symbol': _record.get('chain_symbol'),
+                        'option_type': option_types.get(_record['option_id']),
+                        'quantity': float(_record.get('quantity') or 0),
+                        'updated_at': pd.Timestamp(_record['updated_at']),
+                    }
+
+            self.positions = positions
+            if full:
+                self.last_full_refresh = now
+            if positions:
+                watermark = max(_position['updated_at'] for _position in positions.values())
+                self.watermark = watermark if self.watermark is None else max(self.watermark, watermark)
+
+            self.recent_open_tickers = self._index(now)
+            return self.recent_open_tickers
+
+    def _index(self, now, day_lag=None):
+        """Tickers with an open position and a position updated within `day_lag` days, keyed by option type."""
+        since = pd.Timestamp(now - timedelta(days=self.day_lag if day_lag is None else day_lag))
+        open_tickers = {'put': set(), 'call': set()}
+        recent_tickers = {'put': set(), 'call': set()}
+        for _position in self.positions.values():
+            if _position['option_type'] not in open_tickers:
+                continue
+            if _position['quantity'] > 0:
+                open_tickers[_position['option_type']].add(_position['chain_symbol'])
+            if _position['updated_at'] >= since:
+                recent_tickers[_position['option_type']].add(_position['chain_symbol'])
+        return {_type: frozenset(open_tickers[_type] & recent_tickers[_type]) for _type in open_tickers}
+
+    def get_recent_open_tickers(self, day_lag=None):
+        """Recent open tickers keyed by option type for another `day_lag`, from the last refresh."""
+        if day_lag is None or day_lag == self.day_lag:
+            return self.recent_open_tickers
+        with self._lock:
+            return self._index(self.clock(), day_lag)
+
+    def has_recent_open_position(self, ticker, option_type):
+        """Check if `ticker` has an open position of `option_type` traded within the last `day_lag` days."""
+        return ticker in self.recent_open_tickers[option_type]
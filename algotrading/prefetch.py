@@ -0,0 +1,120 @@
+import logging
+import threading
+
+from time import monotonic
+
+
+logger = logging.getLogger(__name__)
+
+
+class Prefetcher:
+    """Refresh data sources in a background thread, double buffered.
+
+    Each source is a function without arguments. The background thread calls every source each
+    `interval` seconds and, once a call completes, swaps the result in as the source's front
+    buffer. Readers always get the latest completed result without waiting on the network; a
+    failed refresh keeps the previous result.
+
+    fetchers : dict
+        Functions keyed by source name.
+    interval : float
+        Seconds between background refreshes.
+    max_age : dict
+        Default staleness limit in seconds keyed by source name. Reading an older result, or a
+        source that has never completed, fetches it synchronously instead. Concurrent readers of
+        a missing or stale source wait on one fetch, including a background refresh in flight.
+    """
+
+    def __init__(self, fetchers, interval=120, max_age=None, clock=monotonic):
+        self.fetchers = dict(fetchers)
+        self.interval = interval
+        self.max_age = dict(max_age or {})
+        self.clock = clock
+        self._buffers = {}
+        self._generations = {}
+        self._fetch_locks = {_name: threading.Lock() for _name in self.fetchers}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self, name):
+        """Fetch a source now and publish the result. Returns the result.
+
+        A fetch started before the source was invalidated is returned but not published.
+        """
+        with self._fetch_locks[name]:
+            return self._refresh(name)
+
+    def _refresh(self, name):
+        with self._lock:
+            generation = self._generations.get(name, 0)
+        value = self.fetchers[name]()
+        with self._lock:
+            if self._generations.get(name, 0) == generation:
+                self._buffers[name] = (value, self.clock())
+        return value
+
+    def refresh_all(self):
+        """Fetch all sources, logging and skipping failures."""
+        for _name in self.fetchers:
+            if self._stop.is_set():
+                break
+            try:
+                self.refresh(_name)
+            except Exception:
+                logger.exception('Prefetch of {} failed.'.format(_name))
+
+    def age(self, name):
+        """Seconds since the front buffer of a source was fetched, or None if it never was."""
+        with self._lock:
+            buffer = self._buffers.get(name)
+        return None if buffer is None else self.clock() - buffer[1]
+
+    def _fresh(self, name, max_age):
+        with self._lock:
+            buffer = self._buffers.get(name)
+        if buffer is None or (max_age is not None and self.clock() - buffer[1] > max_age):
+            return None
+        return buffer
+
+    def get(self, name, max_age=None):
+        """Latest completed result of a source, fetched synchronously if missing or too stale."""
+        max_age = self.max_age.get(name) if max_age is None else max_age
+        buffer = self._fresh(name, max_age)
+        if buffer is not None:
+            return buffer[0]
+
+        with self._fetch_locks[name]:
+            # another reader may have fetched it while this one waited
+            buffer = self._fresh(name, max_age)
+            if buffer is not None:
+                return buffer[0]
+            logger.debug('Prefetch buffer of {} missing or stale, fetching synchronously.'.format(name))
+            return self._refresh(name)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh_all()
+            self._stop.wait(self.interval)
+
+    def start(self):
+        """Start refreshing in the background."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='prefetcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the background thread, waiting for an in-flight refresh up to `timeout` seconds."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def invalidate(self, name=None):
+        """Drop the buffered result of a source, or of all sources, so the next read fetches it."""
+        with self._lock:
+            for _name in (self.fetchers if name is None else [name]):
+                self._buffers.pop(_name, None)
+                self._generations[_name] = self._generations.get(_name, 0) + 1
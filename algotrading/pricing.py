@@ -0,0 +1,248 @@
+import numpy as np
+
+from datetime import datetime, timezone
+from dateutil import parser, tz
+
+from algotrading.option_chain import OptionChain
+
+
+# options stop trading at 4pm New York time on the expiration date
+EXPIRATION_TIME = '16:00'
+EXPIRATION_TIMEZONE = tz.gettz('America/New_York')
+SECONDS_PER_YEAR = 365 * 24 * 60 * 60
+
+GREEKS = ['delta', 'gamma', 'rho', 'theta', 'vega']
+
+
+def norm_pdf(x):
+    """Standard normal probability density function."""
+    return np.exp(-0.5 * np.square(x)) / np.sqrt(2 * np.pi)
+
+
+def norm_cdf(x):
+    """Standard normal cumulative distribution function.
+
+    Uses the Abramowitz and Stegun 26.2.17 approximation, absolute error below 7.5e-8.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    t = 1 / (1 + 0.2316419 * np.abs(x))
+    poly = t * (0.319381530 + t * (-0.356563782 + t * (1.781477937 + t * (-1.821255978 + t * 1.330274429))))
+    upper_tail = norm_pdf(x) * poly
+    return np.where(x >= 0, 1 - upper_tail, upper_tail)
+
+
+def _is_call(option_type):
+    option_type = np.asarray(option_type)
+    if option_type.dtype == bool:
+        return option_type
+    return option_type.astype(object) == 'call'
+
+
+def _d1_d2(spot, strike, time_to_expiration, volatility, rate, dividend_yield):
+    sqrt_time = np.sqrt(time_to_expiration)
+    vol_sqrt_time = volatility * sqrt_time
+    with np.errstate(divide='ignore', invalid='ignore'):
+        d1 = (np.log(spot / strike) + (rate - dividend_yield + 0.5 * np.square(volatility)) * time_to_expiration) / vol_sqrt_time
+    return d1, d1 - vol_sqrt_time
+
+
+def black_scholes_price(option_type, spot, strike, time_to_expiration, volatility, rate=0.0, dividend_yield=0.0):
+    """Black-Scholes price of european options.
+
+    All arguments are broadcast against each other. `option_type` is 'call' or 'put' (or True for calls),
+    `time_to_expiration` is in years and `volatility`, `rate` and `dividend_yield` are annualized.
+    """
+    is_call = _is_call(option_type)
+    spot, strike, time_to_expiration, volatility, rate, dividend_yield = np.broadcast_arrays(
+        *[np.asarray(_arg, dtype=np.float64) for _arg in
+          (spot, strike, time_to_expiration, volatility, rate, dividend_yield)])
+
+    d1, d2 = _d1_d2(spot, strike, time_to_expiration, volatility, rate, dividend_yield)
+    discounted_spot = spot * np.exp(-dividend_yield * time_to_expiration)
+    discounted_strike = strike * np.exp(-rate * time_to_expiration)
+
+    call_price = discounted_spot * norm_cdf(d1) - discounted_strike * norm_cdf(d2)
+    put_price = discounted_strike * norm_cdf(-d2) - discounted_spot * norm_cdf(-d1)
+    return np.where(is_call, call_price, put_price)
+
+
+def black_scholes_greeks(option_type, spot, strike, time_to_expiration, volatility, rate=0.0, dividend_yield=0.0):
+    """Black-Scholes greeks of european options.
+
+    Greeks follow Robinhood's conventions: theta is per calendar day, vega is per 1 point of
+    volatility and rho is per 1 point of interest rate. Returns a dictionary of arrays.
+    """
+    is_call = _is_call(option_type)
+    spot, strike, time_to_expiration, volatility, rate, dividend_yield = np.broadcast_arrays(
+        *[np.asarray(_arg, dtype=np.float64) for _arg in
+          (spot, strike, time_to_expiration, volatility, rate, dividend_yield)])
+
+    d1, d2 = _d1_d2(spot, strike, time_to_expiration, volatility, rate, dividend_yield)
+    sqrt_time = np.sqrt(time_to_expiration)
+    dividend_discount = np.exp(-dividend_yield * time_to_expiration)
+    rate_discount = np.exp(-rate * time_to_expiration)
+    pdf_d1 = norm_pdf(d1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        gamma = dividend_discount * pdf_d1 / (spot * volatility * sqrt_time)
+        common_theta = -spot * dividend_discount * pdf_d1 * volatility / (2 * sqrt_time)
+
+    call_delta = dividend_discount * norm_cdf(d1)
+    put_delta = -dividend_discount * norm_cdf(-d1)
+    call_theta = (common_theta - rate * strike * rate_discount * norm_cdf(d2) +
+                  dividend_yield * spot * dividend_discount * norm_cdf(d1))
+    put_theta = (common_theta + rate * strike * rate_discount * norm_cdf(-d2) -
+                 dividend_yield * spot * dividend_discount * norm_cdf(-d1))
+    call_rho = strike * time_to_expiration * rate_discount * norm_cdf(d2)
+    put_rho = -strike * time_to_expiration * rate_discount * norm_cdf(-d2)
+
+    return {
+        'delta': np.where(is_call, call_delta, put_delta),
+        'gamma': gamma,
+        'rho': np.where(is_call, call_rho, put_rho) / 100,
+        'theta': np.where(is_call, call_theta, put_theta) / 365,
+        'vega': spot * dividend_discount * pdf_d1 * sqrt_time / 100,
+    }
+
+
+def implied_volatility(
+    price,
+    option_type,
+    spot,
+    strike,
+    time_to_expiration,
+    rate=0.0,
+    dividend_yield=0.0,
+    tolerance=1e-6,
+    max_iterations=100,
+    volatility_bounds=(1e-4, 10.0),
+):
+    """Implied volatility of european options from their prices.
+
+    Solves all contracts at once with Newton's method, safeguarded by bisection: each contract
+    keeps a bracket of its volatility, and Newton steps that leave the bracket or stall on a tiny
+    vega are replaced by the bracket midpoint. A contract converges when its price error or its
+    bracket width is below `tolerance`. Prices outside the no-arbitrage bounds, or that do not
+    converge within `max_iterations`, give NaN.
+    """
+    is_call = _is_call(option_type)
+    price, spot, strike, time_to_expiration, rate, dividend_yield = np.broadcast_arrays(
+        *[np.asarray(_arg, dtype=np.float64) for _arg in
+          (price, spot, strike, time_to_expiration, rate, dividend_yield)])
+    is_call = np.broadcast_to(is_call, price.shape)
+
+    discounted_spot = spot * np.exp(-dividend_yield * time_to_expiration)
+    discounted_strike = strike * np.exp(-rate * time_to_expiration)
+    lower_bound = np.where(is_call, np.maximum(discounted_spot - discounted_strike, 0),
+                           np.maximum(discounted_strike - discounted_spot, 0))
+    upper_bound = np.where(is_call, discounted_spot, discounted_strike)
+    valid = (price > lower_bound) & (price < upper_bound) & (time_to_expiration > 0)
+
+    low = np.full(price.shape, volatility_bounds[0])
+    high = np.full(price.shape, volatility_bounds[1])
+    volatility = np.full(price.shape, 0.5)
+    converged = ~valid
+
+    for _ in range(max_iterations):
+        active = ~converged
+        if not active.any():
+            break
+
+        model_price = black_scholes_price(
+            is_call[active], spot[active], strike[active],
+            time_to_expiration[active], volatility[active], rate[active], dividend_yield[active])
+        difference = model_price - price[active]
+        vega = black_scholes_greeks(
+            is_call[active], spot[active], strike[active], time_to_expiration[active], volatility[active],
+            rate[active], dividend_yield[active])['vega'] * 100
+
+        # shrink the bracket around the root
+        too_high = difference > 0
+        high[active] = np.where(too_high, volatility[active], high[active])
+        low[active] = np.where(too_high, low[active], volatility[active])
+
+        done = (np.abs(difference) < tolerance) | (high[active] - low[active] < tolerance)
+        converged[np.flatnonzero(active)[done]] = True
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            newton = volatility[active] - difference / vega
+        in_bracket = (newton > low[active]) & (newton < high[active]) & np.isfinite(newton)
+        volatility[active] = np.where(
+            done, volatility[active], np.where(in_bracket, newton, (low[active] + high[active]) / 2))
+
+    return np.where(valid & converged, volatility, np.nan)
+
+
+def time_to_expiration(expiration_dates, valuation_time=None):
+    """Years from `valuation_time` until the close on each expiration date, floored at zero.
+
+    expiration_dates : array-like or pandas.Categorical
+        Expiration dates formatted as YYYY-MM-DD. Categoricals are converted once per category.
+    """
+    if valuation_time is None:
+        valuation_time = datetime.now(timezone.utc)
+
+    if hasattr(expiration_dates, 'categories'):
+        categories = time_to_expiration(np.asarray(expiration_dates.categories, dtype=object), valuation_time)
+        return np.where(expiration_dates.codes >= 0, categories[expiration_dates.codes], np.nan)
+
+    seconds = [
+        (parser.parse('{} {}'.format(_date, EXPIRATION_TIME)).replace(tzinfo=EXPIRATION_TIMEZONE) -
+         valuation_time).total_seconds()
+        for _date in expiration_dates
+    ]
+    return np.maximum(np.array(seconds, dtype=np.float64), 0) / SECONDS_PER_YEAR
+
+
+def missing_greeks(option_chain):
+    """Mask of contracts missing implied volatility or any greek."""
+    missing = np.zeros(len(option_chain), dtype=bool)
+    for _col in GREEKS + ['implied_volatility']:
+        missing |= np.isnan(option_chain[_col])
+    return missing
+
+
+def fill_option_chain_greeks(option_chain, spot_prices, rate=0.0, valuation_time=None, overwrite=False):
+    """Fill missing implied volatility and greeks of an OptionChain from its mark prices.
+
+    spot_prices : dict
+        Latest underlying price keyed by symbol.
+    overwrite : bool
+        Recompute implied volatility and greeks for every contract, not only missing ones.
+
+    Returns a new OptionChain.
+    """
+    if option_chain.empty:
+        return option_chain
+
+    symbols = np.asarray(option_chain['symbol'].categories, dtype=object)
+    category_spots = np.array([float(spot_prices.get(_symbol, np.nan)) for _symbol in symbols], dtype=np.float64)
+    codes = option_chain.codes('symbol')
+    spot = np.where(codes >= 0, category_spots[codes], np.nan)
+
+    option_type = np.asarray(option_chain['type'], dtype=object)
+    years = time_to_expiration(option_chain['expiration_date'], valuation_time)
+
+    recompute = np.ones(len(option_chain), dtype=bool) if overwrite else missing_greeks(option_chain)
+    if not recompute.any():
+        return option_chain
+
+    index = np.flatnonzero(recompute)
+    volatility = option_chain['implied_volatility'].astype(np.float64)
+    solve = index if overwrite else index[np.isnan(volatility[index])]
+    volatility[solve] = implied_volatility(
+        option_chain['mark_price'][solve], option_type[solve], spot[solve], option_chain['strike_price'][solve],
+        years[solve], rate=rate)
+
+    greeks = black_scholes_greeks(
+        option_type[index], spot[index], option_chain['strike_price'][index], years[index], volatility[index], rate=rate)
+
+    columns = dict(option_chain.columns)
+    columns['implied_volatility'] = volatility.astype(np.float32)
+    for _greek in GREEKS:
+        values = option_chain[_greek].copy()
+        fill = index if overwrite else index[np.isnan(values[index])]
+        values[fill] = greeks[_greek][np.searchsorted(index, fill)]
+        columns[_greek] = values
+
+    return OptionChain(columns)
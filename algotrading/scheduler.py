@@ -0,0 +1,242 @@
+import heapq
+import itertools
+import logging
+import threading
+
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """A function run by the `Scheduler` every `interval` seconds.
+
+    Runs are scheduled at a fixed rate from the monotonic clock, so run times do not drift. A
+    run that takes longer than `interval` is an overrun; the runs it missed are skipped. If the
+    function returns a number, the next run is delayed at least that many seconds.
+
+    market_hours : bool
+        Only run while the market is open.
+    on_open, on_close : function
+        Called when the market opens and closes, before the first and after the last run of a session.
+    before_open : float
+        Run once per session, this many seconds before the market opens, instead of every
+        `interval` seconds, see `Scheduler.add_warm_up_job`.
+    """
+
+    def __init__(self, name, func, interval, market_hours=True, on_open=None, on_close=None, before_open=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.market_hours = market_hours
+        self.on_open = on_open
+        self.on_close = on_close
+        self.before_open = before_open
+        self.next_open = None
+        self.runs = 0
+        self.errors = 0
+        self.overruns = 0
+        self.total_jitter = 0.0
+        self.max_jitter = 0.0
+        self.last_duration = None
+        self.max_duration = 0.0
+        self.in_session = False
+
+    def record(self, jitter, duration):
+        self.runs += 1
+        self.total_jitter += jitter
+        self.max_jitter = max(self.max_jitter, jitter)
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        if duration > self.interval:
+            self.overruns += 1
+
+    def stats(self):
+        """Run counts, start jitter and run duration in seconds."""
+        return {
+            'runs': self.runs,
+            'errors': self.errors,
+            'overruns': self.overruns,
+            'mean_jitter': self.total_jitter / self.runs if self.runs else None,
+            'max_jitter': self.max_jitter,
+            'last_duration': self.last_duration,
+            'max_duration': self.max_duration,
+        }
+
+
+class Scheduler:
+    """Run many strategy jobs from one event loop on the monotonic clock.
+
+    Due jobs are started on a thread pool, at most one run per job at a time, so a slow job does
+    not delay the others. Jobs limited to market hours sleep until the next open from the market
+    calendar, and the scheduler calls `on_open` once before the first job of a session (e.g. to
+    login) and `on_close` after the market closes (e.g. to logout).
+
+    calendar : MarketCalendar
+        Market calendar deciding when market hours jobs run.
+    """
+
+    def __init__(self, calendar=None, on_open=None, on_close=None, max_workers=4, clock=monotonic):
+        self.calendar = calendar
+        self.on_open = on_open
+        self.on_close = on_close
+        self.max_workers = max_workers
+        self.clock = clock
+        self.jobs = {}
+        self.in_session = False
+        self._queue = []
+        self._counter = itertools.count()
+        self._running = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+
+    def add_job(self, name, func, interval, market_hours=True, on_open=None, on_close=None, delay=0):
+        """Add a job, first run `delay` seconds from now. Returns the Job."""
+        job = Job(name, func, interval, market_hours=market_hours, on_open=on_open, on_close=on_close)
+        with self._lock:
+            self.jobs[name] = job
+            self._push(self.clock() + delay, job)
+        self._wake.set()
+        return job
+
+    def add_warm_up_job(self, name, func, before_open=900):
+        """Add a job run once per session, `before_open` seconds before the market opens. Returns the Job.
+
+        A warm up taking longer than `before_open` seconds counts as an overrun. Started less than `before_open`
+        seconds before the open, the job runs right away; started while the market is open, it
+        first runs before the next session.
+        """
+        if self.calendar is None:
+            raise ValueError('Warm up jobs need a market calendar.')
+        job = Job(name, func, before_open, market_hours=False, before_open=before_open)
+        with self._lock:
+            self.jobs[name] = job
+            self._push(self._next_warm_up(job), job)
+        self._wake.set()
+        return job
+
+    def _next_warm_up(self, job):
+        """Due time of the next run of a warm up job, before the next session it has not been scheduled for."""
+        now = self.calendar.clock()
+        market_opens, market_closes = self.calendar.next_open_hours(now)
+        if market_opens <= now or market_opens == job.next_open:
+            market_opens, _ = self.calendar.next_open_hours(market_closes)
+        job.next_open = market_opens
+        return self.clock() + (market_opens - now).total_seconds() - job.before_open
+
+    def _push(self, due, job):
+        heapq.heappush(self._queue, (due, next(self._counter), job))
+
+    def _market_open(self):
+        return self.calendar is None or self.calendar.is_open()
+
+    def _seconds_until_open(self):
+        return 0 if self.calendar is None else self.calendar.seconds_until_open()
+
+    def _call(self, name, func):
+        if func is None:
+            return
+        try:
+            func()
+        except Exception:
+            logger.exception('{} failed.'.format(name))
+
+    def _update_session(self, market_open):
+        """Call the session hooks when the market opens or closes."""
+        if market_open and not self.in_session:
+            self.in_session = True
+            logger.info('Market open.')
+            self._call('Scheduler on_open', self.on_open)
+        elif not market_open and self.in_session:
+            for _job in self.jobs.values():
+                if _job.in_session:
+                    _job.in_session = False
+                    self._call('Job {} on_close'.format(_job.name), _job.on_close)
+            self.in_session = False
+            logger.info('Market closed. Job stats {}.'.format(self.stats()))
+            self._call('Scheduler on_close', self.on_close)
+
+    def _run_job(self, job, due):
+        start = self.clock()
+        try:
+            if job.market_hours and not job.in_session:
+                job.in_session = True
+                self._call('Job {} on_open'.format(job.name), job.on_open)
+            delay = job.func()
+        except Exception:
+            logger.exception('Job {} failed.'.format(job.name))
+            job.errors += 1
+            delay = None
+        end = self.clock()
+        job.record(jitter=start - due, duration=end - start)
+        if end - start > job.interval:
+            logger.warning('Job {} overran its {} second interval by {:.1f} seconds.'.format(
+                job.name, job.interval, end - start - job.interval))
+
+        if job.before_open is not None:
+            next_due = self._next_warm_up(job)
+        else:
+            # next run at a fixed rate, skipping runs missed by an overrun
+            next_due = due + job.interval
+            if next_due < end:
+                next_due += job.interval * ((end - next_due) // job.interval + 1)
+        if isinstance(delay, (int, float)) and not isinstance(delay, bool):
+            next_due = max(next_due, end + delay)
+
+        with self._lock:
+            self._running.discard(job.name)
+            if job.name in self.jobs:
+                self._push(next_due, job)
+        self._wake.set()
+
+    def run(self):
+        """Run jobs until `stop` is called."""
+        self._stop.clear()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while not self._stop.is_set():
+                market_open = self._market_open()
+                with self._lock:
+                    running = bool(self._running)
+                if not running:
+                    self._update_session(market_open)
+
+                now = self.clock()
+                with self._lock:
+                    due = []
+                    while self._queue and self._queue[0][0] <= now:
+                        due.append(heapq.heappop(self._queue))
+                    for _due, _, _job in due:
+                        if _job.market_hours and not market_open:
+                            # sleep until the next open
+                            self._push(self.clock() + max(self._seconds_until_open(), 0.01), _job)
+                        else:
+                            self._running.add(_job.name)
+                            executor.submit(self._run_job, _job, _due)
+                    timeout = self._queue[0][0] - self.clock() if self._queue else None
+
+                # wake at the next due job, or at the close to run the session hooks
+                if market_open and self.calendar is not None:
+                    _, market_closes = self.calendar.next_open_hours()
+                    until_close = (market_closes - self.calendar.clock()).total_seconds() + 1
+                    timeout = until_close if timeout is None else min(timeout, until_close)
+                self._wake.wait(None if timeout is None else max(timeout, 0))
+                self._wake.clear()
+
+        self._update_session(False)
+
+    def remove_job(self, name):
+        with self._lock:
+            self.jobs.pop(name, None)
+            self._queue = [_entry for _entry in self._queue if _entry[2].name != name]
+            heapq.heapify(self._queue)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def stats(self):
+        """Job stats keyed by job name."""
+        return {_name: _job.stats() for _name, _job in self.jobs.items()}
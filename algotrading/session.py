@@ -0,0 +1,238 @@
+import json
+import logging
+import os
+import threading
+
+import pyotp
+import robin_stocks.robinhood as rs
+
+from time import time
+
+
+logger = logging.getLogger(__name__)
+
+ROBINHOOD_CLIENT_ID = 'c82SH0WZOsabOXGP2sxqcj34FxkvfnWRZBKlBjFS'
+DEFAULT_TOKEN_PATH = os.path.join(os.path.expanduser('~'), '.tokens', 'algotrading_robinhood.json')
+
+
+class RobinhoodSession:
+    """Keep one Robinhood login alive across runs with a saved OAuth token.
+
+    `login` starts from the token saved at `path` without a network call. The token is refreshed
+    with its refresh token `refresh_margin` seconds before it expires, by a background timer or
+    at the next `login`, and the username, password and TOTP code are only used when there is no
+    token, the refresh fails, or Robinhood answers a request with 401. A request answered with
+    401 is sent again once with the new token; 401s during a login are left to robin_stocks.
+
+    mfa_auth : str
+        TOTP secret to generate MFA codes with. `mfa_code` is used as is otherwise.
+    path : str
+        File the token is saved to, readable by the owner only. None to keep it in memory.
+    expires_in : int
+        Requested token lifetime in seconds.
+    """
+
+    def __init__(
+        self,
+        username=None,
+        password=None,
+        mfa_auth=None,
+        mfa_code=None,
+        path=DEFAULT_TOKEN_PATH,
+        expires_in=86400,
+        refresh_margin=3600,
+        session=None,
+        clock=time,
+    ):
+        self.username = username
+        self.password = password
+        self.mfa_auth = mfa_auth
+        self.mfa_code = mfa_code
+        self.path = path
+        self.expires_in = expires_in
+        self.refresh_margin = refresh_margin
+        self.session = session if session is not None else rs.globals.SESSION
+        self.clock = clock
+        self.token = None
+        self.logins = 0
+        self.refreshes = 0
+        self.reauthentications = 0
+        self._timer = None
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self.session.hooks['response'].append(self._on_response)
+
+    def _authorization(self, token):
+        return '{} {}'.format(token['token_type'], token['access_token'])
+
+    def _token_from_response(self, data):
+        if not data or 'access_token' not in data:
+            return None
+        return {
+            'access_token': data['access_token'],
+            'refresh_token': data.get('refresh_token'),
+            'token_type': data.get('token_type', 'Bearer'),
+            'expires_at': self.clock() + float(data.get('expires_in') or self.expires_in),
+        }
+
+    def authenticate(self):
+        """Login with the username and password. Returns the new token.
+
+        robin_stocks may answer with the token of its own stored session, which keeps its device
+        token, so the token is checked with one request before it is used.
+        """
+        mfa_code = pyotp.TOTP(self.mfa_auth).now() if self.mfa_auth else self.mfa_code
+        # a 401 while robin_stocks checks its stored session must not re-authenticate again
+        self._local.authenticating = True
+        try:
+            token = self._token_from_response(rs.login(
+                username=self.username,
+                password=self.password,
+                expiresIn=self.expires_in,
+                mfa_code=mfa_code,
+            ))
+            if token is None or not self._check(token):
+                raise RuntimeError('Robinhood login failed.')
+        finally:
+            self._local.authenticating = False
+        self.logins += 1
+        logger.info('Robinhood login successful.')
+        return token
+
+    def _check(self, token):
+        """Check a token is accepted by Robinhood."""
+        try:
+            response = self.session.get(
+                rs.urls.positions_url(), params={'nonzero': 'true'},
+                headers={'Authorization': self._authorization(token)}, timeout=16)
+        except Exception:
+            logger.exception('Robinhood token check failed.')
+            return False
+        return response.status_code == 200
+
+    def refresh(self, token=None):
+        """Exchange the refresh token for a new token. Returns the new token, or None if it failed."""
+        token = token or self.token
+        if not token or not token.get('refresh_token'):
+            return None
+        try:
+            response = self.session.post(rs.urls.login_url(), data={
+                'grant_type': 'refresh_token',
+                'refresh_token': token['refresh_token'],
+                'scope': 'internal',
+                'client_id': ROBINHOOD_CLIENT_ID,
+                'expires_in': self.expires_in,
+            }, timeout=16)
+            response.raise_for_status()
+            new_token = self._token_from_response(response.json())
+        except Exception:
+            logger.exception('Robinhood token refresh failed.')
+            return None
+        if new_token is not None:
+            self.refreshes += 1
+            logger.debug('Robinhood token refreshed.')
+        return new_token
+
+    def _set_token(self, token):
+        self.token = token
+        self.session.headers['Authorization'] = self._authorization(token)
+        rs.helper.set_login_state(True)
+        if self.path is not None:
+            self.save()
+        self._schedule_refresh()
+
+    def _needs_refresh(self, token):
+        return self.clock() >= token['expires_at'] - self.refresh_margin
+
+    def login(self):
+        """Start the session from the saved token, refreshing it or logging in only if needed."""
+        with self._lock:
+            token = self.token or self.load()
+            if token is not None and self._needs_refresh(token):
+                token = self.refresh(token)
+            if token is None:
+                token = self.authenticate()
+            self._set_token(token)
+
+    def reauthenticate(self):
+        """Get a new token after Robinhood rejected the current one."""
+        with self._lock:
+            self.reauthentications += 1
+            self._set_token(self.refresh() or self.authenticate())
+
+    def _schedule_refresh(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(self.token['expires_at'] - self.refresh_margin - self.clock(), 0)
+        self._timer = threading.Timer(delay, self._refresh_before_expiry)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _refresh_before_expiry(self):
+        with self._lock:
+            try:
+                self._set_token(self.refresh() or self.authenticate())
+            except Exception:
+                logger.exception('Robinhood session renewal failed, retrying at the next request.')
+
+    def _on_response(self, response, *args, **kwargs):
+        """Re-authenticate and send a request again once if Robinhood answered it with 401."""
+        request = response.request
+        if (response.status_code != 401 or getattr(request, 'reauthenticated', False)
+                or getattr(self._local, 'authenticating', False)
+                or request.url.rstrip('/').endswith('oauth2/token')):
+            return response
+
+        logger.warning('Robinhood answered 401, re-authenticating.')
+        with self._lock:
+            # another request may have re-authenticated already
+            if request.headers.get('Authorization') == self.session.headers.get('Authorization'):
+                self.reauthenticate()
+
+        retry = request.copy()
+        retry.headers['Authorization'] = self.session.headers['Authorization']
+        retry.reauthenticated = True
+        retry_response = self.session.send(retry, **kwargs)
+        retry_response.history.insert(0, response)
+        return retry_response
+
+    def stop(self):
+        """Stop refreshing the token in the background. The session stays logged in."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    def save(self, path=None):
+        """Save the token as a json file only the owner can read."""
+        path = path or self.path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, mode=0o700, exist_ok=True)
+        tmp_path = '{}.tmp'.format(path)
+        with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), 'w') as f:
+            json.dump(self.token, f)
+        os.replace(tmp_path, path)
+
+    def load(self, path=None):
+        """Load a token saved by `save`. Returns the token, or None if there is none."""
+        path = path or self.path
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            with open(path) as f:
+                token = json.load(f)
+        except (OSError, ValueError):
+            logger.warning('Could not read the saved Robinhood token {}.'.format(path))
+            return None
+        if not isinstance(token, dict) or not {'access_token', 'token_type', 'expires_at'} <= set(token):
+            return None
+        return token
+
+    def stats(self):
+        """Login, token refresh and re-authentication counts."""
+        return {
+            'logins': self.logins,
+            'refreshes': self.refreshes,
+            'reauthentications': self.reauthentications,
+            'expires_in': None if self.token is None else self.token['expires_at'] - self.clock(),
+        }
@@ -0,0 +1,324 @@
+"""Local record/replay stand-in for the Robinhood and Barchart HTTP APIs.
+
+Record real responses once with `RecordingAdapter`, then replay them offline with
+`StandinServer` to run and benchmark the strategies deterministically:
+
+.. code:: bash
+    $ python -m algotrading.standin recordings.json --port 8800 --latency 0.05 --error-rate 0.01
+    $ algotrading_standin_url=http://127.0.0.1:8800 python put_call_credit_spread.py
+
+Requests for `https://<host>/<path>` are served by the stand-in at `<standin url>/<host>/<path>`.
+Recordings are a json file of responses keyed by '<METHOD> <host>/<path>?<sorted query>'; each
+key holds a list of {'status', 'body'} responses that are replayed in order, repeating the last
+one, so e.g. an order can go from queued to filled. A key without its query matches any query.
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import threading
+
+from collections import Counter, defaultdict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from requests.adapters import HTTPAdapter
+from time import sleep
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+
+logger = logging.getLogger(__name__)
+
+STANDIN_URL_VARIABLE = 'algotrading_standin_url'
+
+# responses available without a recording
+DEFAULT_RECORDINGS = {
+    'POST api.robinhood.com/oauth2/token/': [{
+        'status': 200,
+        'body': {
+            'access_token': 'standin',
+            'refresh_token': 'standin',
+            'token_type': 'Bearer',
+            'expires_in': 86400,
+            'scope': 'internal',
+        },
+    }],
+    'POST api.robinhood.com/oauth2/revoke_token/': [{'status': 200, 'body': {}}],
+    # robin_stocks checks a stored login with the stock positions
+    'GET api.robinhood.com/positions/': [{'status': 200, 'body': {'results': [], 'next': None}}],
+}
+
+
+def get_standin_url():
+    """Stand-in server url from the environment, or None to use the real APIs."""
+    return os.environ.get(STANDIN_URL_VARIABLE) or None
+
+
+def recording_key(method, url):
+    """Recording key of a request, with the query parameters sorted."""
+    parts = urlsplit(url)
+    key = '{} {}{}'.format(method.upper(), parts.netloc, parts.path)
+    query = sorted(parse_qsl(parts.query, keep_blank_values=True))
+    return '{}?{}'.format(key, urlencode(query)) if query else key
+
+
+def load_recordings(path):
+    """Load recordings from a json file."""
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_recordings(recordings, path):
+    """Save recordings to a json file."""
+    tmp_path = '{}.tmp'.format(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(recordings, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+
+
+class StandinAdapter(HTTPAdapter):
+    """Transport adapter sending every request of a `requests.Session` to the stand-in server."""
+
+    def __init__(self, standin_url, **kwargs):
+        super().__init__(**kwargs)
+        self.standin_url = standin_url.rstrip('/')
+
+    def send(self, request, **kwargs):
+        if not request.url.startswith(self.standin_url):
+            parts = urlsplit(request.url)
+            request.url = '{}/{}{}'.format(
+                self.standin_url, parts.netloc, parts.path + ('?' + parts.query if parts.query else ''))
+        return super().send(request, **kwargs)
+
+
+class RecordingAdapter(HTTPAdapter):
+    """Transport adapter recording the json responses of a `requests.Session` for replay.
+
+    Authorization headers are not recorded, but response bodies are saved as is, so review
+    recordings of account data before sharing them.
+    """
+
+    def __init__(self, recordings=None, **kwargs):
+        super().__init__(**kwargs)
+        self.recordings = recordings if recordings is not None else {}
+        self._lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        response = super().send(request, **kwargs)
+        try:
+            body = response.json()
+        except ValueError:
+            return response
+        with self._lock:
+            self.recordings.setdefault(recording_key(request.method, request.url), []).append(
+                {'status': response.status_code, 'body': body})
+        return response
+
+
+def use_standin(session, standin_url=None):
+    """Send all requests of `session` to the stand-in server. Returns True if a stand-in is used.
+
+    standin_url : str
+        Stand-in server url, defaults to the `algotrading_standin_url` environment variable.
+    """
+    standin_url = standin_url or get_standin_url()
+    if standin_url is None:
+        return False
+    adapter = StandinAdapter(standin_url)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    logger.info('Using stand-in server {}.'.format(standin_url))
+    return True
+
+
+def record(session, recordings=None):
+    """Record the json responses of all requests of `session`. Returns the recordings dictionary."""
+    adapter = RecordingAdapter(recordings)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return adapter.recordings
+
+
+class StandinServer:
+    """Threaded HTTP server replaying recorded responses.
+
+    recordings : dict
+        Responses keyed by recording key, see the module docstring. Merged over `DEFAULT_RECORDINGS`.
+    latency : float
+        Seconds added to every response.
+    latency_jitter : float
+        Maximum random seconds added on top of `latency`.
+    error_rate : float
+        Probability of answering a request with `error_status` instead of its recording.
+    seed : int
+        Random seed of the injected latency and errors, for reproducible runs.
+    """
+
+    def __init__(
+        self,
+        recordings=None,
+        host='127.0.0.1',
+        port=0,
+        latency=0.0,
+        latency_jitter=0.0,
+        error_rate=0.0,
+        error_status=503,
+        seed=None,
+    ):
+        self.recordings = dict(DEFAULT_RECORDINGS)
+        self.recordings.update(recordings or {})
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.errors = Counter()
+        self.missing = Counter()
+        self._replayed = defaultdict(int)
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return 'http://{}:{}'.format(host, port)
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def _respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length:
+                    self.rfile.read(length)
+                status, body, headers = server.respond(self.command, self.path)
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                for _name, _value in headers:
+                    self.send_header(_name, _value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            do_GET = do_POST = do_DELETE = _respond
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        return Handler
+
+    def respond(self, method, path):
+        """Status, json body and extra headers of a request for `path` on the stand-in."""
+        url = '//{}'.format(path.lstrip('/'))
+        key = recording_key(method, url)
+        base_key = key.split('?')[0]
+
+        with self._lock:
+            self.requests[base_key] += 1
+            delay = self.latency + self.random.uniform(0, self.latency_jitter)
+            error = self.random.random() < self.error_rate
+        if delay > 0:
+            sleep(delay)
+
+        # the homepage hands out the Barchart XSRF token
+        headers = []
+        if method == 'GET' and '/' not in base_key.split(' ', 1)[1].rstrip('/'):
+            headers.append(('Set-Cookie', 'XSRF-TOKEN=standin; Path=/'))
+            if base_key not in self.recordings:
+                return 200, {}, headers
+
+        if error:
+            with self._lock:
+                self.errors[base_key] += 1
+            return self.error_status, {'detail': 'Injected error.'}, headers
+
+        key = key if key in self.recordings else base_key
+        if key not in self.recordings:
+            with self._lock:
+                self.missing[key] += 1
+            logger.warning('No recording for {}.'.format(key))
+            return 404, {'detail': 'Not found.'}, headers
+
+        with self._lock:
+            responses = self.recordings[key]
+            response = responses[min(self._replayed[key], len(responses) - 1)]
+            self._replayed[key] += 1
+        return response['status'], response['body'], headers
+
+    def stats(self):
+        """Request, injected error and missing recording counts."""
+        with self._lock:
+            return {
+                'requests': sum(self.requests.values()),
+                'errors': sum(self.errors.values()),
+                'missing': sum(self.missing.values()),
+                'by_path': dict(self.requests),
+            }
+
+    def reset(self):
+        """Replay every recording from its first response again and clear the counts."""
+        with self._lock:
+            self._replayed.clear()
+            self.requests.clear()
+            self.errors.clear()
+            self.missing.clear()
+
+    def start(self):
+        """Serve in a background thread. Returns the server url."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name='standin', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='Replay recorded Robinhood and Barchart responses.')
+    arg_parser.add_argument('recordings', help='json file of recorded responses')
+    arg_parser.add_argument('--host', default='127.0.0.1')
+    arg_parser.add_argument('--port', type=int, default=8800)
+    arg_parser.add_argument('--latency', type=float, default=0.0, help='seconds added to every response')
+    arg_parser.add_argument('--latency-jitter', type=float, default=0.0, help='maximum random extra seconds')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='probability of an injected error')
+    arg_parser.add_argument('--error-status', type=int, default=503)
+    arg_parser.add_argument('--seed', type=int, default=None)
+    args = arg_parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StandinServer(
+        load_recordings(args.recordings),
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    logger.info('Serving {} recordings on {}.'.format(len(server.recordings), server.url))
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logger.info('Stand-in stats {}.'.format(server.stats()))
+        server.httpd.server_close()
+
+
+if __name__ == '__main__':
+    main()
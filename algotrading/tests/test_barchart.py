@@ -0,0 +1,40 @@
+import pytest
+import requests
+
+from algotrading.barchart import BarchartClient
+from algotrading.standin import StandinServer, use_standin
+
+
+QUOTES_KEY = 'GET www.barchart.com/proxies/core-api/v1/quotes/get'
+
+
+def make_client(server):
+    client = BarchartClient()
+    use_standin(client.session, server.url)
+    return client
+
+
+@pytest.mark.parametrize('status', [401, 419])
+def test_token_refreshed_on_rejection(status):
+    recordings = {QUOTES_KEY: [{'status': status, 'body': {}}, {'status': 200, 'body': {'data': []}}]}
+    with StandinServer(recordings) as server:
+        client = make_client(server)
+
+        assert client.get_json('proxies/core-api/v1/quotes/get', params={'list': 'a'}) == {'data': []}
+        assert client.token_refreshes == 2
+        assert server.stats()['by_path'] == {'GET www.barchart.com/': 2, QUOTES_KEY: 2}
+
+        # the refreshed token is reused
+        client.get_json('proxies/core-api/v1/quotes/get')
+        assert client.token_refreshes == 2
+        assert client.latency_stats()['count'] == 5
+
+
+def test_rejected_twice_raises():
+    with StandinServer({QUOTES_KEY: [{'status': 401, 'body': {}}]}) as server:
+        client = make_client(server)
+
+        with pytest.raises(requests.HTTPError):
+            client.get_json('proxies/core-api/v1/quotes/get')
+        # one retry only
+        assert server.stats()['by_path'][QUOTES_KEY] == 2
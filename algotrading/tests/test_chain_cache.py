@@ -0,0 +1,177 @@
+import pytest
+
+from datetime import date, timedelta
+
+import algotrading.chain_cache
+
+from algotrading.chain_cache import OptionChainCache
+
+
+STRIKES = list(range(40, 50))
+
+
+class FakeRobinhood:
+    """Option instruments and market data of put chains, counting requests."""
+
+    def __init__(self):
+        self.instruments = {}
+        self.deltas = {}
+        self.instrument_requests = []
+        self.market_data_requests = []
+
+    def add_chain(self, symbol, expiration_date, deltas):
+        self.instruments[symbol] = []
+        for _strike, _delta in zip(STRIKES, deltas):
+            option_id = '{}-{}'.format(symbol, _strike)
+            self.instruments[symbol].append({
+                'id': option_id, 'chain_symbol': symbol, 'expiration_date': expiration_date,
+                'type': 'put', 'strike_price': str(_strike),
+            })
+            self.deltas[option_id] = _delta
+
+    def get_tradable_options(self, symbol, expiration_date, option_type=None):
+        self.instrument_requests.append(symbol)
+        return self.instruments.get(symbol)
+
+    def get_option_market_data(self, option_ids, batch_size=40):
+        self.market_data_requests.append(list(option_ids))
+        return [{'instrument_id': _id, 'mark_price': '1.00', 'delta': str(self.deltas[_id])} for _id in option_ids]
+
+
+@pytest.fixture
+def robinhood(monkeypatch):
+    robinhood = FakeRobinhood()
+    for _symbol in ['AAA', 'BBB', 'CCC']:
+        robinhood.add_chain(_symbol, '2024-03-15', [-0.05 * (i + 1) for i in range(len(STRIKES))])
+    monkeypatch.setattr(algotrading.chain_cache, 'get_tradable_options', robinhood.get_tradable_options)
+    monkeypatch.setattr(algotrading.chain_cache, 'get_option_market_data', robinhood.get_option_market_data)
+    return robinhood
+
+
+def make_cache(**kwargs):
+    clock = [0.0]
+    today = [date(2024, 3, 1)]
+    cache = OptionChainCache(clock=lambda: clock[0], today=lambda: today[0], **kwargs)
+    return cache, clock, today
+
+
+def test_quotes_refreshed_after_ttl(robinhood):
+    cache, clock, today = make_cache(quote_ttl=60)
+
+    option_chain = cache.get('AAA', '2024-03-15', 'put')
+    assert len(option_chain) == len(STRIKES)
+    assert cache.get('AAA', '2024-03-15', 'put') is option_chain
+    assert len(robinhood.market_data_requests) == 1
+
+    clock[0] = 61
+    assert cache.get('AAA', '2024-03-15', 'put') is not option_chain
+    assert len(robinhood.market_data_requests) == 2
+    assert robinhood.instrument_requests == ['AAA']
+
+    # instruments are fetched again the next day
+    today[0] += timedelta(days=1)
+    cache.get('AAA', '2024-03-15', 'put')
+    assert robinhood.instrument_requests == ['AAA', 'AAA']
+    assert cache.stats()['quote_hits'] == 1 and cache.stats()['quote_misses'] == 3
+
+
+def test_least_recently_used_chain_evicted(robinhood):
+    cache, clock, today = make_cache(max_chains=2)
+
+    for _symbol in ['AAA', 'BBB', 'AAA', 'CCC']:
+        cache.get(_symbol, '2024-03-15', 'put')
+    assert cache.stats()['chains'] == 2 and cache.stats()['evictions'] == 1
+
+    cache.get('AAA', '2024-03-15', 'put')
+    cache.get('BBB', '2024-03-15', 'put')
+    assert robinhood.instrument_requests == ['AAA', 'BBB', 'CCC', 'BBB']
+
+    cache.invalidate('CCC')
+    cache.get('CCC', '2024-03-15', 'put')
+    assert robinhood.instrument_requests[-1] == 'CCC'
+
+
+def test_failed_instrument_fetch_not_cached(robinhood):
+    cache, clock, today = make_cache()
+    instruments = robinhood.instruments.pop('AAA')
+
+    assert cache.get('AAA', '2024-03-15', 'put').empty
+    assert cache.stats()['failures'] == 1 and cache.stats()['chains'] == 0
+
+    # the next scan fetches again
+    robinhood.instruments['AAA'] = instruments
+    assert len(cache.get('AAA', '2024-03-15', 'put')) == len(STRIKES)
+    assert robinhood.instrument_requests == ['AAA', 'AAA']
+
+
+def test_empty_chain_refetched_after_empty_ttl(robinhood):
+    cache, clock, today = make_cache(quote_ttl=0, empty_ttl=300)
+    robinhood.instruments['AAA'] = []
+
+    assert cache.get('AAA', '2024-03-15', 'put').empty
+    clock[0] = 299
+    assert cache.get('AAA', '2024-03-15', 'put').empty
+    assert robinhood.instrument_requests == ['AAA']
+
+    clock[0] = 300
+    cache.get('AAA', '2024-03-15', 'put')
+    assert robinhood.instrument_requests == ['AAA', 'AAA']
+
+
+def test_band_refresh(robinhood):
+    cache, clock, today = make_cache(quote_ttl=60, target_delta=0.3, delta_tolerance=0.025, band_neighbors=1)
+
+    assert len(cache.get('AAA', '2024-03-15', 'put')) == len(STRIKES)
+
+    # only the contract at the target delta and its neighbors are refreshed
+    clock[0] = 61
+    option_chain = cache.get('AAA', '2024-03-15', 'put')
+    assert option_chain['strike_price'].tolist() == [44, 45, 46]
+    assert robinhood.market_data_requests[-1] == ['AAA-44', 'AAA-45', 'AAA-46']
+    assert cache.stats()['band_refreshes'] == 1
+
+
+def test_band_fallback_when_underlying_moves(robinhood):
+    cache, clock, today = make_cache(quote_ttl=60, target_delta=0.3, delta_tolerance=0.025, band_neighbors=1)
+    cache.get('AAA', '2024-03-15', 'put')
+
+    # the band no longer brackets the target delta, so the whole chain is refetched
+    for i, _strike in enumerate(STRIKES):
+        robinhood.deltas['AAA-{}'.format(_strike)] = -0.05 * (i + 4)
+    clock[0] = 61
+    option_chain = cache.get('AAA', '2024-03-15', 'put')
+    assert len(option_chain) == len(STRIKES)
+    assert len(robinhood.market_data_requests[-1]) == len(STRIKES)
+    assert cache.stats()['band_fallbacks'] == 1 and cache.stats()['band_refreshes'] == 0
+
+    # the recomputed band is refreshed next
+    clock[0] = 122
+    assert cache.get('AAA', '2024-03-15', 'put')['strike_price'].tolist() == [41, 42, 43]
+    assert cache.stats()['band_refreshes'] == 1
+
+
+def test_band_at_the_chain_edge(robinhood):
+    cache, clock, today = make_cache(quote_ttl=60, target_delta=0.05, delta_tolerance=0.01, band_neighbors=1)
+    cache.get('AAA', '2024-03-15', 'put')
+
+    # the lowest strike of the chain is in the band, so a missing lower neighbor is not a shift
+    clock[0] = 61
+    assert cache.get('AAA', '2024-03-15', 'put')['strike_price'].tolist() == [40, 41]
+    assert cache.stats()['band_fallbacks'] == 0
+
+
+def test_expiration_dates_cached_unless_empty(monkeypatch):
+    responses = [[], ['2024-03-15'], ['2024-03-22']]
+    requests = []
+    monkeypatch.setattr(
+        algotrading.chain_cache, 'get_option_expiration_dates', lambda symbol: requests.append(symbol) or responses.pop(0))
+    cache, clock, today = make_cache()
+
+    # an empty result from a failed request is fetched again
+    assert cache.get_expiration_dates('AAA') == []
+    assert cache.get_expiration_dates('AAA') == ['2024-03-15']
+    assert cache.get_expiration_dates('AAA') == ['2024-03-15']
+    assert requests == ['AAA', 'AAA']
+
+    today[0] += timedelta(days=1)
+    assert cache.get_expiration_dates('AAA') == ['2024-03-22']
@@ -0,0 +1,117 @@
+import numpy as np
+import pandas as pd
+import robin_stocks.robinhood as rs
+
+import algotrading.chain_cache
+
+from datetime import date, timedelta
+
+from algotrading.credit_spreads import CREDIT_SPREAD_COLUMNS, CreditSpreadScanner, TopCandidates
+from algotrading.data_hub import DataHub
+from algotrading.iv_history import OPTION_CHAIN
+from algotrading.option_chain import OptionChain
+from algotrading.pricing import missing_greeks
+from algotrading.utils import find_weekday_dates
+
+
+def make_candidates(volumes, strike_widths=None, percent_returns=None):
+    candidates = pd.DataFrame(data=np.nan, index=range(len(volumes)), columns=CREDIT_SPREAD_COLUMNS)
+    candidates['symbol'] = ['S{}'.format(i) for i in range(len(volumes))]
+    candidates['avg_trade_volume'] = volumes
+    candidates['trade_strike_width'] = strike_widths if strike_widths is not None else 1.0
+    candidates['trade_expected_percent_return'] = percent_returns if percent_returns is not None else 0.5
+    return candidates
+
+
+def test_top_candidates_keeps_best_k():
+    top_candidates = TopCandidates(k=2)
+    assert top_candidates.best() is None
+    assert top_candidates.top().empty
+
+    top_candidates.push(make_candidates([10, 30, np.nan]))
+    top_candidates.push(make_candidates([20, 40, 5]))
+    assert len(top_candidates) == 2
+    assert top_candidates.top()['avg_trade_volume'].tolist() == [30, 40]
+    assert top_candidates.best()['avg_trade_volume'] == 40
+
+
+def test_top_candidates_filters():
+    top_candidates = TopCandidates(k=3, max_strike_width=1, min_percent_return=0.3)
+    top_candidates.push(make_candidates([10, 20, 30], strike_widths=[1, 2, 1], percent_returns=[0.5, 0.5, 0.3]))
+    assert top_candidates.top()['symbol'].tolist() == ['S0']
+
+
+def test_fill_greeks_with_unknown_symbol(monkeypatch):
+    quotes = [
+        {'symbol': 'AAA', 'last_trade_price': '50.0000', 'last_extended_hours_trade_price': None},
+        {'symbol': 'CCC', 'last_trade_price': '150.0000', 'last_extended_hours_trade_price': None},
+    ]
+    requests = []
+    monkeypatch.setattr(rs.stocks, 'get_quotes', lambda symbols: requests.append(symbols) or quotes)
+    scanner = CreditSpreadScanner(option_types=('put',), hub=DataHub())
+
+    expiration_date = find_weekday_dates((30, 45), 4)[0]
+    option_chain = OptionChain.from_records([
+        {'id': 'aaa-put', 'chain_symbol': 'AAA', 'expiration_date': expiration_date, 'type': 'put',
+         'strike_price': '45.0000', 'mark_price': '1.0000'},
+    ])
+
+    spot_prices = {}
+    filled = scanner.fill_greeks('AAA', option_chain, spot_prices, ['AAA', 'BAD', 'CCC'])
+
+    # Robinhood leaves out the unknown symbol, which must not shift the other prices
+    assert requests == [['AAA', 'BAD', 'CCC']]
+    assert spot_prices['AAA'] == 50.0 and spot_prices['CCC'] == 150.0
+    assert np.isnan(spot_prices['BAD'])
+    assert not missing_greeks(filled).any()
+    assert filled['delta'][0] < 0
+
+
+def test_get_ticker_lists(tmp_path):
+    scanner = CreditSpreadScanner(
+        option_types=('put', 'call'), total_option_volume_min=1000, iv_history_path=str(tmp_path / 'iv_history.npz'),
+        min_iv_history=3, hub=DataHub())
+    # option chain IV histories of symbols outside the most active lists, and of a listed one with low volume
+    for i in range(3):
+        scanner.iv_history.update(
+            ['OUT', 'LOW'], [0.1 * (i + 1)] * 2, on_date=date.today() - timedelta(days=3 - i), source=OPTION_CHAIN)
+    # a snapshot history is screened by Barchart's own IV rank only
+    for i in range(3):
+        scanner.iv_history.update(['QUIET'], [0.1 * (i + 1)], on_date=date.today() - timedelta(days=3 - i))
+
+    iv_data = pd.DataFrame({
+        'symbol': ['XYZ', 'ABC', 'LOW', 'QUIET'],
+        'optionsImpliedVolatilityRank1y': [0.8, 0.8, 0.8, 0.8],
+        'optionsImpliedVolatilityPercentile1y': [0.9, 0.9, 0.9, 0.9],
+        'optionsTotalVolume': [5000, 5000, 10, 10],
+    })
+    ticker_lists = scanner.get_ticker_lists(iv_data, {'put': {'ABC'}, 'call': set()})
+    assert ticker_lists == {'put': ['XYZ', 'OUT'], 'call': ['XYZ', 'ABC', 'OUT']}
+
+
+def test_warm_up_primes_option_chain_cache(monkeypatch):
+    expiration_dates = find_weekday_dates((30, 45), 4)
+    instrument_requests = []
+    monkeypatch.setattr(algotrading.chain_cache, 'get_option_expiration_dates', lambda symbol: ['2000-01-07'] + expiration_dates)
+    monkeypatch.setattr(
+        algotrading.chain_cache, 'get_tradable_options',
+        lambda symbol, expiration_date, option_type=None: instrument_requests.append((symbol, expiration_date, option_type)) or [])
+
+    hub = DataHub()
+    hub.prefetcher.fetchers = {
+        'iv_data': lambda: pd.DataFrame({
+            'symbol': ['XYZ', 'LOW'],
+            'optionsImpliedVolatilityRank1y': [0.8, 0.2],
+            'optionsImpliedVolatilityPercentile1y': [0.9, 0.1],
+            'optionsTotalVolume': [100000, 100000],
+        }),
+        'option_positions': lambda: None,
+    }
+    scanner = CreditSpreadScanner(option_types=('put',), hub=hub)
+    scanner.warm_up()
+    hub.unsubscribe(scanner)
+
+    # instruments of every listed expiration date in range, with the option chain keys of a scan
+    assert sorted(instrument_requests) == [('XYZ', _date, 'put') for _date in expiration_dates]
+    stats = scanner.option_chain_cache.stats()
+    assert stats['instrument_misses'] == len(expiration_dates) and stats['quote_misses'] == 0
@@ -0,0 +1,61 @@
+import threading
+
+from algotrading.data_hub import DataHub
+
+
+def make_hub():
+    """Data hub with counting fetchers, refreshed every 10 ms while anyone is subscribed."""
+    hub = DataHub(prefetch_interval=0.01)
+    fetches = {'iv_data': 0, 'option_positions': 0}
+    fetched = threading.Event()
+
+    def fetcher(name):
+        def fetch():
+            fetches[name] += 1
+            fetched.set()
+            return fetches[name]
+        return fetch
+
+    hub.prefetcher.fetchers = {_name: fetcher(_name) for _name in fetches}
+    return hub, fetches, fetched
+
+
+def test_refreshes_while_subscribed():
+    hub, fetches, fetched = make_hub()
+
+    hub.subscribe('a')
+    hub.subscribe('b')
+    assert fetched.wait(5)
+    assert hub.get_iv_data() >= 1
+
+    # refreshes run until the last subscriber leaves
+    hub.unsubscribe('a')
+    assert hub.prefetcher._thread is not None
+    hub.unsubscribe('b')
+    assert hub.prefetcher._thread is None
+    assert hub.age('iv_data') is None and hub.age('option_positions') is None
+
+    # reads after the session fetch again
+    iv_fetches = fetches['iv_data']
+    assert hub.get_iv_data() == iv_fetches + 1
+
+
+def test_unsubscribe_stops_order_status_polls():
+    hub, fetches, fetched = make_hub()
+    hub.order_status.fetch_orders = lambda updated_since: []
+
+    hub.subscribe('a')
+    hub.order_status.start()
+    assert hub.order_status._thread is not None
+    hub.unsubscribe('a')
+    assert hub.order_status._thread is None
+
+    # unknown subscribers are ignored
+    hub.unsubscribe('b')
+
+
+def test_option_chain_caches_shared_by_settings():
+    hub = DataHub()
+    cache = hub.option_chain_cache(quote_ttl=60, max_chains=10)
+    assert hub.option_chain_cache(max_chains=10, quote_ttl=60) is cache
+    assert hub.option_chain_cache(quote_ttl=30, max_chains=10) is not cache
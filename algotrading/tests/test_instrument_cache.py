@@ -0,0 +1,79 @@
+import pytest
+
+import algotrading.instrument_cache
+
+from algotrading.instrument_cache import OptionInstrumentCache
+
+
+class FakeInstruments:
+    """Option instruments by id, counting batch requests. Batches with a failing id fail."""
+
+    def __init__(self):
+        self.instruments = {}
+        self.failing = set()
+        self.requests = []
+
+    def add(self, option_id, option_type='put'):
+        self.instruments[option_id] = {
+            'id': option_id, 'chain_symbol': 'XYZ', 'type': option_type, 'strike_price': '25.0000',
+            'expiration_date': '2024-03-15',
+        }
+
+    def request_pages(self, url, payload=None):
+        option_ids = payload['ids'].split(',')
+        self.requests.append(option_ids)
+        if self.failing.intersection(option_ids):
+            return None
+        return [self.instruments[_id] for _id in option_ids if _id in self.instruments]
+
+
+@pytest.fixture
+def robinhood(monkeypatch):
+    robinhood = FakeInstruments()
+    monkeypatch.setattr(algotrading.instrument_cache, 'request_pages', robinhood.request_pages)
+    return robinhood
+
+
+def test_lookup_fetches_missing_once(robinhood, tmp_path):
+    for i in range(5):
+        robinhood.add('id-{}'.format(i), 'put' if i % 2 else 'call')
+    cache = OptionInstrumentCache(path=str(tmp_path / 'instruments.csv'), batch_size=2)
+
+    instruments = cache.lookup(['id-1', 'id-0', 'id-1', 'id-4'])
+    assert instruments.index.tolist() == ['id-1', 'id-0', 'id-4']
+    assert instruments['type'].tolist() == ['put', 'call', 'call']
+    assert sorted(map(sorted, robinhood.requests)) == [['id-0', 'id-1'], ['id-4']]
+
+    cache.lookup(['id-0', 'id-3'])
+    assert robinhood.requests[-1] == ['id-3']
+    assert cache.stats() == {'instruments': 4, 'hits': 1, 'misses': 4}
+
+    # instruments are kept across runs
+    loaded = OptionInstrumentCache(path=cache.path)
+    assert loaded.lookup(['id-3'])['strike_price'].tolist() == [25.0]
+    assert len(robinhood.requests) == 3
+
+
+def test_failed_batch_raises(robinhood):
+    for i in range(4):
+        robinhood.add('id-{}'.format(i))
+    robinhood.failing.add('id-3')
+    cache = OptionInstrumentCache(batch_size=2)
+
+    with pytest.raises(RuntimeError):
+        cache.lookup(['id-0', 'id-1', 'id-2', 'id-3'])
+    # the other batch is kept, and the failed one is fetched again
+    assert sorted(cache.instruments.index) == ['id-0', 'id-1']
+
+    robinhood.failing.clear()
+    assert cache.lookup(['id-0', 'id-3'])['type'].tolist() == ['put', 'put']
+    assert robinhood.requests[-1] == ['id-3']
+
+
+def test_unknown_id_raises(robinhood):
+    robinhood.add('id-0')
+    cache = OptionInstrumentCache()
+
+    with pytest.raises(RuntimeError, match='id-9'):
+        cache.lookup(['id-0', 'id-9'])
+    assert cache.lookup(['id-0'])['type'].tolist() == ['put']
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from datetime import date, timedelta
+
+from algotrading.iv_history import OPTION_CHAIN, SNAPSHOT, IVHistory
+from algotrading.option_chain import OptionChain
+
+
+START = date(2024, 1, 1)
+
+
+def test_rank_and_percentile():
+    iv_history = IVHistory(window=5)
+    for i, _iv in enumerate([0.2, 0.4, 0.3, 0.1, 0.35, 0.25]):
+        iv_history.update(['XYZ'], [_iv], on_date=START + timedelta(days=i))
+
+    # the first observation fell out of the window
+    assert iv_history.observations[0] == 5
+    assert iv_history.iv_rank[0] == pytest.approx((0.25 - 0.1) / (0.4 - 0.1))
+    assert iv_history.iv_percentile[0] == pytest.approx(1 / 4)
+
+    # same day updates overwrite the latest observation
+    iv_history.update(['XYZ'], [0.4], on_date=START + timedelta(days=5))
+    assert iv_history.observations[0] == 5
+    assert iv_history.iv_rank[0] == 1
+
+
+def test_screen_skips_stale_symbols():
+    iv_history = IVHistory(window=3)
+    for i in range(3):
+        iv_history.update(['XYZ', 'OLD'], [0.1 * (i + 1)] * 2, on_date=START + timedelta(days=i))
+    for i in range(3, 10):
+        iv_history.update(['XYZ'], [0.3 + 0.01 * i], on_date=START + timedelta(days=i))
+
+    assert iv_history.screen(0.5, 0.5, min_observations=3, on_date=START + timedelta(days=10)) == ['XYZ']
+    assert iv_history.screen(0.5, 0.5, min_observations=3, max_age_days=10, on_date=START + timedelta(days=10)) == ['XYZ', 'OLD']
+    assert iv_history.screen(0.5, 0.5, on_date=START + timedelta(days=20)) == []
+
+
+def test_one_source_per_symbol(tmp_path):
+    iv_history = IVHistory(path=str(tmp_path / 'iv_history.npz'), window=3)
+    iv_history.update(['XYZ'], [0.3], on_date=START)
+    option_chains = {
+        ('XYZ', '2024-02-16'): OptionChain.from_records([{'id': 'a', 'delta': '-0.5', 'implied_volatility': '0.9'}]),
+        ('ABC', '2024-02-16'): OptionChain.from_records([
+            {'id': 'b', 'delta': '0.45', 'implied_volatility': '0.5'},
+            {'id': 'c', 'delta': '-0.55', 'implied_volatility': '0.6'},
+            {'id': 'd', 'delta': '-0.2', 'implied_volatility': '0.8'},
+        ]),
+        ('ABC', '2024-01-19'): OptionChain.from_records([{'id': 'e', 'delta': '0.5', 'implied_volatility': '0.4'}]),
+    }
+    iv_history.update_from_option_chains(option_chains, on_date=START + timedelta(days=1))
+
+    frame = iv_history.to_frame().set_index('symbol')
+    # snapshot IVs are not mixed with option chain IVs, and the nearest expiration date is used
+    assert frame.loc['XYZ', 'source'] == SNAPSHOT and frame.loc['XYZ', 'observations'] == 1
+    assert frame.loc['ABC', 'source'] == OPTION_CHAIN and frame.loc['ABC', 'implied_volatility'] == np.float32(0.4)
+    assert IVHistory.near_the_money_iv(option_chains[('ABC', '2024-02-16')]) == pytest.approx(0.55)
+
+    iv_history.save()
+    loaded = IVHistory(path=iv_history.path, window=3)
+    assert loaded.symbols == ['XYZ', 'ABC']
+    assert loaded.source.tolist() == [SNAPSHOT, OPTION_CHAIN]
+
+
+def test_screen_by_source():
+    iv_history = IVHistory(window=3)
+    for i in range(3):
+        iv_history.update(['XYZ'], [0.1 * (i + 1)], on_date=START + timedelta(days=i))
+        iv_history.update(['ABC'], [0.1 * (i + 1)], on_date=START + timedelta(days=i), source=OPTION_CHAIN)
+
+    on_date = START + timedelta(days=3)
+    assert iv_history.screen(0.5, 0.5, on_date=on_date) == ['XYZ', 'ABC']
+    assert iv_history.screen(0.5, 0.5, on_date=on_date, source=OPTION_CHAIN) == ['ABC']
+    assert iv_history.screen(0.5, 0.5, on_date=on_date, source=SNAPSHOT) == ['XYZ']
@@ -0,0 +1,94 @@
+import robin_stocks.robinhood as rs
+
+from datetime import date, datetime, timezone
+
+from algotrading.market_calendar import MarketCalendar, xnys_early_closes, xnys_holidays, xnys_sessions
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def test_xnys_holidays():
+    holidays = xnys_holidays(2024)
+    assert sorted(holidays) == [
+        date(2024, 1, 1), date(2024, 1, 15), date(2024, 2, 19), date(2024, 3, 29), date(2024, 5, 27),
+        date(2024, 6, 19), date(2024, 7, 4), date(2024, 9, 2), date(2024, 11, 28), date(2024, 12, 25),
+    ]
+    assert holidays[date(2024, 3, 29)] == 'Good Friday'
+
+
+def test_xnys_observed_holidays():
+    # independence day and christmas on a weekend, no juneteenth before 2022
+    holidays = xnys_holidays(2021)
+    assert holidays[date(2021, 7, 5)] == 'Independence Day'
+    assert holidays[date(2021, 12, 24)] == 'Christmas Day'
+    assert 'Juneteenth' not in holidays.values()
+
+    # new year's day on a saturday is not observed, on a sunday it is
+    holidays = xnys_holidays(2022)
+    assert "New Year's Day" not in holidays.values()
+    assert holidays[date(2022, 6, 20)] == 'Juneteenth'
+    assert xnys_holidays(2023)[date(2023, 1, 2)] == "New Year's Day"
+
+
+def test_xnys_early_closes():
+    assert sorted(xnys_early_closes(2024)) == [date(2024, 7, 3), date(2024, 11, 29), date(2024, 12, 24)]
+    # july 3rd is a holiday on a friday, christmas eve is a holiday or on a weekend
+    assert sorted(xnys_early_closes(2020)) == [date(2020, 11, 27), date(2020, 12, 24)]
+    assert xnys_early_closes(2021) == [date(2021, 11, 26)]
+    assert xnys_early_closes(2022) == [date(2022, 11, 25)]
+
+
+def test_xnys_sessions():
+    sessions = xnys_sessions(date(2024, 3, 8), date(2024, 3, 11))
+    assert sessions['date'].tolist() == ['2024-03-08', '2024-03-11']
+    # daylight saving time starts in between
+    assert sessions['opens_at'].tolist() == [utc(2024, 3, 8, 14, 30), utc(2024, 3, 11, 13, 30)]
+
+    sessions = xnys_sessions(date(2024, 12, 23), date(2024, 12, 27)).set_index('date')
+    assert '2024-12-25' not in sessions.index
+    assert sessions.loc['2024-12-24', 'closes_at'] == utc(2024, 12, 24, 18)
+    assert sessions.loc['2024-12-26', 'closes_at'] == utc(2024, 12, 26, 21)
+
+
+def test_market_calendar_hours():
+    calendar = MarketCalendar(verify=False, clock=lambda: utc(2024, 7, 3, 14))
+
+    assert calendar.is_open()
+    assert calendar.is_open(now=utc(2024, 7, 3, 16, 59))
+    assert not calendar.is_open(now=utc(2024, 7, 3, 17, 1))
+    assert not calendar.is_open(now=utc(2024, 7, 4, 15))
+    assert calendar.next_open_hours(now=utc(2024, 7, 3, 18)) == (utc(2024, 7, 5, 13, 30), utc(2024, 7, 5, 20))
+    assert calendar.seconds_until_open(now=utc(2024, 7, 3, 15)) == 0
+    assert calendar.seconds_until_open(now=utc(2024, 7, 5, 13)) == 1800
+
+    # good friday, then a weekend
+    calendar = MarketCalendar(verify=False, clock=lambda: utc(2024, 3, 28, 21))
+    assert not calendar.is_open(now=utc(2024, 3, 29, 15))
+    assert calendar.next_open_hours(now=utc(2024, 3, 28, 21)) == (utc(2024, 4, 1, 13, 30), utc(2024, 4, 1, 20))
+
+
+def test_market_calendar_unscheduled_closure(monkeypatch, tmp_path):
+    monkeypatch.setattr(rs.markets, 'get_market_today_hours', lambda market: {'date': '2024-03-27', 'is_open': False})
+    monkeypatch.setattr(rs.markets, 'get_market_next_open_hours', lambda market: {
+        'date': '2024-03-28', 'is_open': True,
+        'opens_at': '2024-03-28T13:30:00Z', 'closes_at': '2024-03-28T17:00:00Z',
+    })
+    path = str(tmp_path / 'market_calendar.csv')
+    calendar = MarketCalendar(path=path, days=30, clock=lambda: utc(2024, 3, 27, 14))
+
+    assert not calendar.is_open()
+    assert calendar.next_open_hours() == (utc(2024, 3, 28, 13, 30), utc(2024, 3, 28, 17))
+    assert calendar.refreshed_on == date(2024, 3, 27)
+
+    # loaded from the cache without checking Robinhood again
+    monkeypatch.setattr(rs.markets, 'get_market_today_hours', lambda market: 1 / 0)
+    cached = MarketCalendar(path=path, days=30, clock=lambda: utc(2024, 3, 27, 15))
+    assert cached.refreshed_on == date(2024, 3, 27)
+    assert cached.next_open_hours() == (utc(2024, 3, 28, 13, 30), utc(2024, 3, 28, 17))
+
+    # a failed check falls back to the NYSE rules
+    assert cached.is_open(now=utc(2024, 3, 28, 14))
+    assert cached.is_open(now=utc(2024, 3, 28, 18))
+    assert cached.refreshed_on == date(2024, 3, 28)
@@ -0,0 +1,108 @@
+import numpy as np
+
+from algotrading.option_chain import OptionChain
+
+
+def make_records(symbol, expiration_date, option_type, strikes):
+    return [
+        {'id': '{}-{}-{}-{}'.format(symbol, expiration_date, option_type, _strike), 'chain_symbol': symbol,
+         'expiration_date': expiration_date, 'type': option_type, 'strike_price': str(_strike)}
+        for _strike in strikes
+    ]
+
+
+def make_option_chain():
+    # unsorted, with a duplicate strike and two groups sharing strikes
+    records = (make_records('XYZ', '2024-03-15', 'put', [30, 25, 27.5, 22.5, 20]) +
+               make_records('XYZ', '2024-03-15', 'call', [25, 30]) +
+               make_records('ABC', '2024-03-15', 'put', [25, 26, 24]) +
+               make_records('XYZ', '2024-03-15', 'put', [25]))
+    return OptionChain.from_records(records)
+
+
+def row(option_chain, symbol, option_type, strike, start=0):
+    return next(
+        i for i in range(start, len(option_chain))
+        if option_chain['symbol'][i] == symbol and option_chain['type'][i] == option_type and
+        option_chain['strike_price'][i] == strike
+    )
+
+
+def strikes(option_chain, rows):
+    return [option_chain['strike_price'][_row] if _row >= 0 else None for _row in rows]
+
+
+def test_from_records_types():
+    option_chain = OptionChain.from_records([
+        {'id': 'a', 'chain_symbol': 'XYZ', 'type': 'put', 'strike_price': '25.0000', 'volume': None, 'delta': ''},
+        None,
+    ])
+    assert len(option_chain) == 1
+    assert option_chain['strike_price'].dtype == np.float64
+    assert option_chain['delta'].dtype == np.float32
+    assert option_chain['volume'][0] == 0
+    assert np.isnan(option_chain['delta'][0])
+    assert option_chain['symbol'][0] == 'XYZ'
+
+
+def test_concat_and_filter():
+    option_chain = OptionChain.concat([
+        OptionChain.from_records(make_records('XYZ', '2024-03-15', 'put', [20, 25])),
+        OptionChain.from_records([]),
+        OptionChain.from_records(make_records('ABC', '2024-03-22', 'call', [30])),
+    ])
+    assert len(option_chain) == 3
+    assert option_chain['symbol'].tolist() == ['XYZ', 'XYZ', 'ABC']
+    assert option_chain['expiration_date'].tolist() == ['2024-03-15', '2024-03-15', '2024-03-22']
+
+    puts = option_chain.filter(np.asarray(option_chain['type'] == 'put'))
+    assert puts['strike_price'].tolist() == [20, 25]
+    assert option_chain.take([2])['id'].tolist() == ['ABC-2024-03-22-call-30']
+    assert OptionChain.concat([]).empty
+
+
+def test_find_legs_strikes_away():
+    option_chain = make_option_chain()
+    rows = [row(option_chain, 'XYZ', 'put', _strike) for _strike in [27.5, 25, 20, 30]]
+
+    legs, valid = option_chain.find_legs(rows, -1, strikes_away=1)
+    assert strikes(option_chain, legs) == [25, 22.5, None, 27.5]
+    assert valid.tolist() == [True, True, False, True]
+
+    legs, valid = option_chain.find_legs(rows, 1, strikes_away=2)
+    assert strikes(option_chain, legs) == [None, 30, 25, None]
+    assert valid.tolist() == [False, True, True, False]
+
+
+def test_find_legs_stays_in_group():
+    option_chain = make_option_chain()
+    rows = [row(option_chain, 'XYZ', 'call', 25), row(option_chain, 'ABC', 'put', 24), row(option_chain, 'ABC', 'put', 26)]
+
+    legs, valid = option_chain.find_legs(rows, -1, strikes_away=1)
+    assert valid.tolist() == [False, False, True]
+    assert option_chain['symbol'][legs[2]] == 'ABC' and option_chain['strike_price'][legs[2]] == 25
+
+    legs, valid = option_chain.find_legs(rows, 1, strikes_away=1)
+    assert strikes(option_chain, legs) == [30, 25, None]
+    assert option_chain['type'][legs[0]] == 'call'
+
+
+def test_find_legs_width():
+    option_chain = make_option_chain()
+    rows = [row(option_chain, 'XYZ', 'put', _strike) for _strike in [30, 27.5, 22.5]]
+
+    # nearest strike at least the width away
+    legs, valid = option_chain.find_legs(rows, -1, width=4)
+    assert strikes(option_chain, legs) == [25, 22.5, None]
+    assert valid.tolist() == [True, True, False]
+
+    legs, valid = option_chain.find_legs(rows, -1, width=2.5)
+    assert strikes(option_chain, legs) == [27.5, 25, 20]
+
+    legs, valid = option_chain.find_legs(rows, 1, width=5)
+    assert strikes(option_chain, legs) == [None, None, 27.5]
+
+
+def test_find_legs_empty():
+    legs, valid = OptionChain.from_records([]).find_legs([], -1, strikes_away=1)
+    assert legs.shape == (0,) and valid.shape == (0,)
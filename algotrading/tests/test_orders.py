@@ -0,0 +1,266 @@
+import itertools
+import threading
+
+import pytest
+
+from algotrading.orders import OrderManager, OrderMonitor, OrderStatusService, PriceWalk
+
+
+class FakeBroker:
+    """Orders filled as soon as they are polled at or below `fill_price`, else left working."""
+
+    def __init__(self, fill_price=None, failed_cancels=0):
+        self.fill_price = fill_price
+        self.failed_cancels = failed_cancels
+        self.orders = {}
+        self.cancels = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def send_order(self, price):
+        with self._lock:
+            order_id = 'order-{}'.format(next(self._ids))
+            self.orders[order_id] = {'id': order_id, 'price': price, 'state': 'queued'}
+        return {'id': order_id}
+
+    def get_order(self, order_id):
+        with self._lock:
+            order = self.orders[order_id]
+            if order['state'] == 'queued' and self.fill_price is not None and order['price'] <= self.fill_price:
+                order['state'] = 'filled'
+            return dict(order)
+
+    def cancel_order(self, order_id):
+        with self._lock:
+            self.cancels.append(order_id)
+            if len(self.cancels) <= self.failed_cancels:
+                raise ConnectionError('Cancel failed.')
+            if self.orders[order_id]['state'] == 'queued':
+                self.orders[order_id]['state'] = 'cancelled'
+
+
+def make_manager(broker, market_open=None):
+    monitor = OrderMonitor(min_interval=0.01, max_interval=0.02, get_order=broker.get_order)
+    return OrderManager(monitor=monitor, cancel_order=broker.cancel_order, market_open=market_open)
+
+
+def test_order_monitor_callbacks():
+    broker = FakeBroker(fill_price=1.0)
+    monitor = OrderMonitor(min_interval=0.01, max_interval=0.02, get_order=broker.get_order)
+    fills, cancels, updates = [], [], []
+
+    filled = broker.send_order(0.9)['id']
+    cancelled = broker.send_order(1.1)['id']
+    monitor.watch(filled, on_fill=fills.append, on_cancel=cancels.append, on_update=updates.append)
+    monitor.watch(cancelled, on_fill=fills.append, on_cancel=cancels.append, on_update=updates.append)
+
+    assert monitor.wait(filled, timeout=5)['state'] == 'filled'
+    assert [_order['id'] for _order in fills] == [filled]
+    assert monitor.pending() == [cancelled]
+
+    broker.cancel_order(cancelled)
+    assert monitor.wait(cancelled, timeout=5)['state'] == 'cancelled'
+    assert [_order['id'] for _order in cancels] == [cancelled]
+    assert [_order['state'] for _order in updates if _order['id'] == cancelled] == ['queued', 'cancelled']
+    assert monitor.pending() == [] and monitor.wait('unknown') is None
+    monitor.stop()
+
+
+def test_order_monitor_backs_off_until_state_changes():
+    clock = [0.0]
+    # long intervals keep the background thread from polling, the test updates the order instead
+    monitor = OrderMonitor(min_interval=100, max_interval=300, backoff=2, get_order=lambda order_id: None,
+                           clock=lambda: clock[0])
+    monitor.watch('a')
+    intervals = []
+    for _order in [{'id': 'a', 'state': 'queued'}, None, {'id': 'a', 'state': 'queued'}, None,
+                   {'id': 'a', 'state': 'partially_filled'}]:
+        monitor._update('a', _order)
+        intervals.append(monitor._orders['a']['interval'])
+
+    assert intervals == [100, 200, 300, 300, 100]
+    assert monitor._orders['a']['order']['state'] == 'partially_filled'
+    assert monitor.pending() == ['a']
+    monitor.stop()
+
+
+def test_order_manager_cancelled_trade():
+    broker = FakeBroker()
+    manager = make_manager(broker)
+    cancels = []
+
+    receipt = manager.submit('put', 'XYZ', broker.send_order, 1.0, on_cancel=cancels.append)
+    assert not manager.wait_trade(receipt['id'], timeout=0.1)
+    assert manager.exposure('put') == 1
+
+    broker.orders[receipt['id']]['state'] = 'cancelled'
+    assert manager.wait_trade(receipt['id'], timeout=5)
+    assert [_order['state'] for _order in cancels] == ['cancelled']
+    assert manager.exposure('put') == 0 and manager.filled('put') == 0
+    assert manager.executions == []
+
+    # unknown and pruned trades are done
+    manager.reset()
+    assert manager.wait_trade(receipt['id'], timeout=0)
+    manager.stop()
+
+
+def test_order_manager_failed_send():
+    manager = make_manager(FakeBroker())
+    assert manager.submit('put', 'XYZ', lambda price: {'detail': 'Rejected.'}, 1.0) == {'detail': 'Rejected.'}
+    assert manager.exposure('put') == 0
+
+
+def test_order_manager_send_raises():
+    def send_order(price):
+        raise ConnectionError('Send failed.')
+
+    manager = make_manager(FakeBroker())
+    with pytest.raises(ConnectionError):
+        manager.submit('put', 'XYZ', send_order, 1.0)
+    assert manager.exposure('put') == 0
+    assert manager.pending_symbols('put') == set()
+    assert not manager.has_pending()
+
+
+def test_price_walk():
+    assert PriceWalk(1.0, 0.6, max_concession=0.5, steps=4).prices() == [1.0, 0.95, 0.9, 0.85, 0.8]
+    # prices rounding to the same tick are tried once
+    assert PriceWalk(0.1, 0.08, max_concession=0.5, steps=5).prices() == [0.1, 0.09]
+    assert PriceWalk(0.5, 0.3, max_concession=0).prices() == [0.5]
+    # never below one tick
+    assert PriceWalk(0.02, -0.1, max_concession=1, steps=2).prices() == [0.02, 0.01]
+
+
+def test_order_manager_reprices_until_filled():
+    broker = FakeBroker(fill_price=0.9)
+    manager = make_manager(broker)
+    fills = []
+
+    receipt = manager.submit('put', 'XYZ', broker.send_order, None, walk=PriceWalk(1.0, 0.8, steps=2, interval=0.05),
+                             on_fill=fills.append)
+    assert manager.exposure('put') == 1
+    assert manager.pending_symbols('put') == {'XYZ'}
+
+    # done through the replacement orders, once the fill callback has run
+    assert manager.wait_trade(receipt['id'], timeout=5)
+    assert [_order['id'] for _order in fills] == ['order-2']
+    assert broker.cancels == ['order-0', 'order-1']
+    assert [_order['state'] for _order in broker.orders.values()] == ['cancelled', 'cancelled', 'filled']
+
+    execution, = manager.executions
+    assert execution['replacements'] == 2
+    assert execution['fill_price'] == 0.9
+    assert execution['concession'] == pytest.approx(0.1)
+    assert execution['price_improvement'] == pytest.approx(0.1)
+    assert manager.exposure('put') == 1 and manager.filled('put') == 1
+    assert not manager.has_pending()
+    manager.stop()
+
+
+def test_order_manager_retries_failed_cancel():
+    broker = FakeBroker(fill_price=0.95, failed_cancels=1)
+    manager = make_manager(broker)
+
+    receipt = manager.submit('call', 'XYZ', broker.send_order, None, walk=PriceWalk(1.0, 0.8, steps=2, interval=0.05))
+    assert manager.wait_trade(receipt['id'], timeout=5)
+    assert broker.cancels == ['order-0', 'order-0']
+    assert manager.executions[0]['order_id'] == 'order-1'
+    assert manager.filled('call') == 1
+    manager.stop()
+
+
+def test_order_manager_replacement_send_raises():
+    broker = FakeBroker()
+    sends = []
+
+    def send_order(price):
+        sends.append(price)
+        if len(sends) > 1:
+            raise ConnectionError('Send failed.')
+        return broker.send_order(price)
+
+    manager = make_manager(broker)
+    cancels = []
+    receipt = manager.submit('put', 'XYZ', send_order, None, walk=PriceWalk(1.0, 0.8, steps=2, interval=0.05),
+                             on_cancel=cancels.append)
+
+    # the trade ends as cancelled instead of staying pending
+    assert manager.wait_trade(receipt['id'], timeout=5)
+    assert sends == [1.0, 0.95]
+    assert [_order['id'] for _order in cancels] == [receipt['id']]
+    assert manager.exposure('put') == 0 and not manager.has_pending()
+    manager.stop()
+
+
+def test_order_manager_stops_repricing_when_market_closed():
+    broker = FakeBroker()
+    market_open = [False]
+    manager = make_manager(broker, market_open=lambda: market_open[0])
+
+    receipt = manager.submit('put', 'XYZ', broker.send_order, None, walk=PriceWalk(1.0, 0.8, steps=2, interval=0.02))
+    assert not manager.wait_trade(receipt['id'], timeout=0.2)
+    assert broker.cancels == [] and manager.exposure('put') == 1
+
+    # the day order expires at the close
+    broker.orders[receipt['id']]['state'] = 'expired'
+    assert manager.wait_trade(receipt['id'], timeout=5)
+    assert list(broker.orders) == [receipt['id']]
+    assert manager.exposure('put') == 0
+    manager.stop()
+
+
+def test_order_manager_no_replacement_after_close():
+    broker = FakeBroker()
+    manager = make_manager(broker)
+
+    def cancel_order(order_id):
+        # the market closes between the cancel and its confirmation
+        manager.market_open = lambda: False
+        broker.cancel_order(order_id)
+
+    manager.cancel_order = cancel_order
+    receipt = manager.submit('put', 'XYZ', broker.send_order, None, walk=PriceWalk(1.0, 0.8, steps=2, interval=0.05))
+    assert manager.wait_trade(receipt['id'], timeout=5)
+    assert list(broker.orders) == [receipt['id']]
+    assert manager.exposure('put') == 0
+    manager.stop()
+
+
+def test_order_status_service_publishes_changes():
+    responses = iter([
+        [{'id': 'a', 'state': 'queued', 'updated_at': '2024-03-01T15:00:00Z'}],
+        [{'id': 'a', 'state': 'queued', 'updated_at': '2024-03-01T15:00:00Z'},
+         {'id': 'b', 'state': 'filled', 'updated_at': '2024-03-01T15:01:00Z'}],
+        [{'id': 'a', 'state': 'filled', 'updated_at': '2024-03-01T15:02:00Z'}],
+    ])
+    since = []
+    service = OrderStatusService(fetch_orders=lambda updated_since: since.append(updated_since) or next(responses))
+    changes = []
+    service.subscribe(lambda order, previous_state: changes.append((order['id'], previous_state, order['state'])))
+
+    for _ in range(3):
+        service.poll()
+    assert changes == [('a', None, 'queued'), ('b', None, 'filled'), ('a', 'queued', 'filled')]
+    assert since[2].isoformat() == '2024-03-01T15:00:30+00:00'
+    assert service.get('a')['state'] == 'filled'
+
+
+def test_order_monitor_uses_status_service():
+    orders = [[{'id': 'a', 'state': 'queued', 'updated_at': '2024-03-01T15:00:00Z'}]]
+    service = OrderStatusService(fetch_orders=lambda updated_since: orders[-1])
+    polls = []
+    monitor = OrderMonitor(get_order=polls.append, status_service=service)
+    fills = []
+
+    service.poll()
+    # an order already known to the service is updated on watch
+    monitor.watch('a', on_fill=fills.append)
+    assert monitor._orders['a']['state'] == 'queued'
+
+    orders.append([{'id': 'a', 'state': 'filled', 'updated_at': '2024-03-01T15:01:00Z'}])
+    service.poll()
+    assert monitor.wait('a', timeout=5)['state'] == 'filled'
+    assert [_order['id'] for _order in fills] == ['a']
+    assert polls == []
+    service.stop()
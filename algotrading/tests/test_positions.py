@@ -0,0 +1,124 @@
+import pytest
+import robin_stocks.robinhood as rs
+
+from datetime import datetime, timedelta, timezone
+
+import algotrading.instrument_cache
+
+from algotrading.instrument_cache import OptionInstrumentCache
+from algotrading.positions import PositionTracker
+
+
+NOW = datetime(2024, 3, 1, 15, tzinfo=timezone.utc)
+
+
+def position(name, chain_symbol, quantity, updated_at):
+    return {
+        'id': 'position-{}'.format(name),
+        'option_id': 'option-{}'.format(name),
+        'chain_symbol': chain_symbol,
+        'quantity': '{:.4f}'.format(quantity),
+        'updated_at': updated_at.isoformat(),
+    }
+
+
+@pytest.fixture
+def tracker():
+    instrument_cache = OptionInstrumentCache()
+    instrument_cache.add([
+        {'id': 'option-{}'.format(_name), 'chain_symbol': _symbol, 'type': _type, 'strike_price': '25', 'expiration_date': '2024-03-15'}
+        for _name, _symbol, _type in [('a', 'XYZ', 'put'), ('b', 'ABC', 'call'), ('c', 'OLD', 'put'), ('d', 'NEW', 'call')]
+    ])
+    clock = [NOW]
+    tracker = PositionTracker(day_lag=7, instrument_cache=instrument_cache, clock=lambda: clock[0])
+    tracker.now = clock
+    return tracker
+
+
+@pytest.fixture
+def fetches(monkeypatch):
+    """Responses of the full and incremental position fetches, and the payloads they were called with."""
+    fetches = {'full': [], 'updated': [], 'payloads': []}
+    monkeypatch.setattr(rs, 'get_all_option_positions', lambda: fetches['full'].pop(0))
+
+    def request_get(url, data_type='regular', payload=None):
+        assert url == rs.urls.option_positions_url(None) and data_type == 'pagination'
+        fetches['payloads'].append(payload)
+        return fetches['updated'].pop(0)
+
+    monkeypatch.setattr(rs.helper, 'request_get', request_get)
+    return fetches
+
+
+def test_full_then_incremental_refresh(tracker, fetches):
+    fetches['full'].append([
+        position('a', 'XYZ', 1, NOW - timedelta(days=1)),
+        position('b', 'ABC', 1, NOW - timedelta(days=10)),
+        position('c', 'OLD', 0, NOW - timedelta(days=2)),
+    ])
+    assert tracker.refresh() == {'put': frozenset({'XYZ'}), 'call': frozenset()}
+    assert tracker.watermark == NOW - timedelta(days=1)
+    assert tracker.last_full_refresh == NOW
+    assert tracker.get_recent_open_tickers(30) == {'put': frozenset({'XYZ'}), 'call': frozenset({'ABC'})}
+
+    # only positions updated since the watermark, less the overlap, are fetched and merged
+    tracker.now[0] = NOW + timedelta(hours=1)
+    fetches['updated'].append([
+        position('a', 'XYZ', 0, NOW + timedelta(minutes=30)),
+        position('d', 'NEW', 2, NOW + timedelta(minutes=40)),
+    ])
+    assert tracker.refresh() == {'put': frozenset(), 'call': frozenset({'NEW'})}
+    assert fetches['payloads'] == [{'updated_at[gte]': (NOW - timedelta(days=1, minutes=5)).isoformat()}]
+    assert sorted(tracker.positions) == ['position-a', 'position-b', 'position-c', 'position-d']
+    assert tracker.positions['position-a']['quantity'] == 0
+    assert tracker.watermark == NOW + timedelta(minutes=40)
+    assert tracker.has_recent_open_position('NEW', 'call')
+    assert not tracker.has_recent_open_position('NEW', 'put')
+
+
+def test_full_refresh_after_interval(tracker, fetches):
+    fetches['full'] += [
+        [position('a', 'XYZ', 1, NOW), position('c', 'OLD', 1, NOW)],
+        [position('a', 'XYZ', 1, NOW)],
+    ]
+    tracker.refresh()
+
+    # a full refresh drops positions the incremental fetches missed
+    tracker.now[0] = NOW + timedelta(days=1)
+    assert tracker.refresh() == {'put': frozenset({'XYZ'}), 'call': frozenset()}
+    assert list(tracker.positions) == ['position-a']
+    assert tracker.last_full_refresh == NOW + timedelta(days=1)
+    assert fetches['payloads'] == []
+
+
+def test_failed_refresh_keeps_positions(tracker, fetches):
+    fetches['full'] += [[position('a', 'XYZ', 1, NOW)], [None]]
+    fetches['updated'] += [[None], None]
+    tracker.refresh()
+    positions, watermark = dict(tracker.positions), tracker.watermark
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            tracker.refresh()
+    with pytest.raises(RuntimeError):
+        tracker.refresh(full=True)
+
+    assert tracker.positions == positions
+    assert tracker.watermark == watermark
+    assert tracker.last_full_refresh == NOW
+    assert tracker.recent_open_tickers['put'] == frozenset({'XYZ'})
+
+
+def test_failed_instrument_lookup_keeps_positions(tracker, fetches, monkeypatch):
+    fetches['full'].append([position('a', 'XYZ', 1, NOW)])
+    fetches['updated'].append([position('e', 'NEW', 1, NOW + timedelta(minutes=10))])
+    monkeypatch.setattr(algotrading.instrument_cache, 'request_pages', lambda url, payload=None: None)
+    tracker.refresh()
+
+    # a position of unknown option type is not stored without its type
+    tracker.now[0] = NOW + timedelta(hours=1)
+    with pytest.raises(RuntimeError):
+        tracker.refresh()
+    assert list(tracker.positions) == ['position-a']
+    assert tracker.watermark == NOW
+    assert tracker.recent_open_tickers['put'] == frozenset({'XYZ'})
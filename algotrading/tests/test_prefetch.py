@@ -0,0 +1,84 @@
+import pytest
+
+from algotrading.prefetch import Prefetcher
+
+
+class Source:
+    """Numbered results, counting calls."""
+
+    def __init__(self):
+        self.calls = 0
+        self.fail = False
+        self.during_fetch = None
+
+    def __call__(self):
+        self.calls += 1
+        if self.during_fetch is not None:
+            self.during_fetch()
+        if self.fail:
+            raise RuntimeError('fetch failed')
+        return self.calls
+
+
+def make_prefetcher(**kwargs):
+    clock = [0.0]
+    source = Source()
+    prefetcher = Prefetcher({'data': source}, clock=lambda: clock[0], **kwargs)
+    return prefetcher, source, clock
+
+
+def test_stale_result_fetched_synchronously():
+    prefetcher, source, clock = make_prefetcher(max_age={'data': 60})
+    assert prefetcher.age('data') is None
+
+    assert prefetcher.get('data') == 1
+    clock[0] = 60
+    assert prefetcher.get('data') == 1
+    assert prefetcher.age('data') == 60
+
+    clock[0] = 61
+    assert prefetcher.get('data') == 2
+    assert prefetcher.age('data') == 0
+
+    # a stricter limit for one read
+    clock[0] = 71
+    assert prefetcher.get('data', max_age=5) == 3
+    assert source.calls == 3
+
+
+def test_failed_refresh_keeps_previous_result():
+    prefetcher, source, clock = make_prefetcher()
+    prefetcher.refresh_all()
+
+    source.fail = True
+    clock[0] = 10
+    prefetcher.refresh_all()
+    assert prefetcher.get('data') == 1
+    assert prefetcher.age('data') == 10
+
+    # a synchronous fetch raises
+    prefetcher.invalidate()
+    with pytest.raises(RuntimeError):
+        prefetcher.get('data')
+
+
+def test_invalidate():
+    prefetcher, source, clock = make_prefetcher()
+    assert prefetcher.get('data') == 1
+
+    prefetcher.invalidate('data')
+    assert prefetcher.age('data') is None
+    assert prefetcher.get('data') == 2
+
+
+def test_fetch_in_flight_during_invalidate_not_published():
+    prefetcher, source, clock = make_prefetcher()
+    source.during_fetch = prefetcher.invalidate
+
+    # the result is returned to its caller but not kept
+    assert prefetcher.refresh('data') == 1
+    assert prefetcher.age('data') is None
+
+    source.during_fetch = None
+    assert prefetcher.get('data') == 2
+    assert prefetcher.get('data') == 2
@@ -0,0 +1,88 @@
+import numpy as np
+
+from datetime import datetime, timezone
+
+from algotrading.option_chain import OptionChain
+from algotrading.pricing import (black_scholes_greeks, black_scholes_price, fill_option_chain_greeks, implied_volatility,
+                                 missing_greeks, norm_cdf, time_to_expiration)
+
+
+OPTION_TYPES = np.array(['call', 'put', 'call', 'put', 'call', 'put'], dtype=object)
+STRIKES = np.array([90., 90., 100., 100., 115., 115.])
+
+
+def test_norm_cdf():
+    assert np.allclose(norm_cdf([-1.959963985, 0, 1.959963985]), [0.025, 0.5, 0.975], atol=1e-7)
+
+
+def test_black_scholes_put_call_parity():
+    calls = black_scholes_price('call', 100, STRIKES, 0.25, 0.3, rate=0.05, dividend_yield=0.01)
+    puts = black_scholes_price('put', 100, STRIKES, 0.25, 0.3, rate=0.05, dividend_yield=0.01)
+    assert np.allclose(calls - puts, 100 * np.exp(-0.01 * 0.25) - STRIKES * np.exp(-0.05 * 0.25), atol=1e-6)
+
+
+def test_implied_volatility_round_trip():
+    volatility = np.array([0.15, 0.2, 0.35, 0.5, 0.8, 1.5])
+    prices = black_scholes_price(OPTION_TYPES, 100, STRIKES, 30 / 365, volatility, rate=0.03)
+    solved = implied_volatility(prices, OPTION_TYPES, 100, STRIKES, 30 / 365, rate=0.03)
+    assert np.allclose(solved, volatility, atol=1e-4)
+
+
+def test_implied_volatility_outside_bounds_is_nan():
+    # below intrinsic value, above the spot price, and expired
+    solved = implied_volatility([9.0, 101.0, 1.0], ['call', 'call', 'put'], 100, [90, 90, 100], [0.1, 0.1, 0.0])
+    assert np.isnan(solved).all()
+
+
+def test_black_scholes_greeks_match_finite_differences():
+    args = dict(option_type=OPTION_TYPES, strike=STRIKES, rate=0.03)
+    # steps large enough for the approximation error of norm_cdf to stay below the tolerance
+    spot, years, volatility, step = 100.0, 45 / 365, 0.3, 1e-2
+    greeks = black_scholes_greeks(spot=spot, time_to_expiration=years, volatility=volatility, **args)
+
+    def price(spot=spot, years=years, volatility=volatility, rate=0.03):
+        return black_scholes_price(OPTION_TYPES, spot, STRIKES, years, volatility, rate=rate)
+
+    delta = (price(spot=spot + step) - price(spot=spot - step)) / (2 * step)
+    gamma = (price(spot=spot + 0.5) - 2 * price() + price(spot=spot - 0.5)) / 0.5 ** 2
+    vega = (price(volatility=volatility + step) - price(volatility=volatility - step)) / (2 * step) / 100
+    rho = (price(rate=0.03 + step) - price(rate=0.03 - step)) / (2 * step) / 100
+    theta = -(price(years=years + step) - price(years=years - step)) / (2 * step) / 365
+
+    assert np.allclose(greeks['delta'], delta, atol=1e-4)
+    assert np.allclose(greeks['gamma'], gamma, atol=1e-4)
+    assert np.allclose(greeks['vega'], vega, atol=1e-4)
+    assert np.allclose(greeks['rho'], rho, atol=1e-4)
+    assert np.allclose(greeks['theta'], theta, atol=1e-4)
+    assert (greeks['delta'][OPTION_TYPES == 'call'] > 0).all() and (greeks['delta'][OPTION_TYPES == 'put'] < 0).all()
+
+
+def test_time_to_expiration_closes_at_4pm_new_york():
+    valuation_time = datetime(2024, 3, 14, 20, tzinfo=timezone.utc)
+    years = time_to_expiration(['2024-03-15', '2024-03-14', '2024-03-01'], valuation_time)
+    assert np.allclose(years * 365, [1, 0, 0])
+
+
+def test_fill_option_chain_greeks_fills_missing_only():
+    valuation_time = datetime(2024, 3, 1, 15, tzinfo=timezone.utc)
+    years = time_to_expiration(['2024-03-29'], valuation_time)[0]
+    mark_price = float(black_scholes_price('put', 50, 45, years, 0.4))
+    greeks = black_scholes_greeks('put', 50, 45, years, 0.4)
+    records = [
+        {'id': 'a', 'chain_symbol': 'XYZ', 'expiration_date': '2024-03-29', 'type': 'put', 'strike_price': '45',
+         'mark_price': str(mark_price)},
+        {'id': 'b', 'chain_symbol': 'XYZ', 'expiration_date': '2024-03-29', 'type': 'put', 'strike_price': '50',
+         'mark_price': '2.5', 'implied_volatility': '0.3', 'delta': '-0.45', 'gamma': '0.05', 'rho': '-0.02',
+         'theta': '-0.03', 'vega': '0.05'},
+    ]
+    option_chain = OptionChain.from_records(records)
+    assert missing_greeks(option_chain).tolist() == [True, False]
+
+    filled = fill_option_chain_greeks(option_chain, {'XYZ': 50}, valuation_time=valuation_time)
+    assert not missing_greeks(filled).any()
+    assert np.isclose(filled['implied_volatility'][0], 0.4, atol=1e-4)
+    assert np.isclose(filled['delta'][0], greeks['delta'], atol=1e-4)
+    assert filled['delta'][1] == np.float32(-0.45)
+
+    # without a spot price the greeks stay missing
+    assert missing_greeks(fill_option_chain_greeks(option_chain, {}, valuation_time=valuation_time))[0]
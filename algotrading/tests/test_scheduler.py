@@ -0,0 +1,158 @@
+import heapq
+import pytest
+import threading
+
+from datetime import datetime, timedelta, timezone
+
+from algotrading.market_calendar import MarketCalendar
+from algotrading.scheduler import Scheduler
+
+
+def utc(*args):
+    return datetime(*args, tzinfo=timezone.utc)
+
+
+def make_scheduler(start=utc(2024, 3, 5, 15), **kwargs):
+    """Scheduler and XNYS calendar sharing a fake clock, advanced with `now[0]`."""
+    now = [start]
+    calendar = MarketCalendar(verify=False, clock=lambda: now[0])
+    scheduler = Scheduler(calendar=calendar, clock=lambda: now[0].timestamp(), **kwargs)
+    return scheduler, now
+
+
+def run_next(scheduler):
+    """Run the next due job on the calling thread. Returns its due time."""
+    due, _, job = heapq.heappop(scheduler._queue)
+    scheduler._run_job(job, due)
+    return due
+
+
+def test_fixed_rate():
+    scheduler, now = make_scheduler()
+    start = now[0].timestamp()
+
+    def func(duration=3):
+        now[0] += timedelta(seconds=duration)
+
+    job = scheduler.add_job('job', func, interval=10)
+    assert run_next(scheduler) == start
+    # the next run is due one interval after the last was due, not after it ended
+    assert scheduler._queue[0][0] == start + 10
+
+    now[0] = datetime.fromtimestamp(start + 11, timezone.utc)
+    run_next(scheduler)
+    assert scheduler._queue[0][0] == start + 20
+    assert job.stats()['runs'] == 2 and job.stats()['max_jitter'] == 1 and job.stats()['overruns'] == 0
+
+
+def test_overrun_skips_missed_runs():
+    scheduler, now = make_scheduler()
+    start = now[0].timestamp()
+    durations = [25, 1]
+
+    def func():
+        now[0] += timedelta(seconds=durations.pop(0))
+        # a returned number delays the next run
+        return 30 if not durations else None
+
+    job = scheduler.add_job('job', func, interval=10)
+    run_next(scheduler)
+    assert scheduler._queue[0][0] == start + 30
+    assert job.stats()['overruns'] == 1
+
+    now[0] = datetime.fromtimestamp(start + 30, timezone.utc)
+    run_next(scheduler)
+    assert scheduler._queue[0][0] == start + 61
+    assert job.stats()['overruns'] == 1 and job.stats()['errors'] == 0
+
+
+def test_failed_run_is_rescheduled():
+    scheduler, now = make_scheduler()
+    start = now[0].timestamp()
+
+    job = scheduler.add_job('job', lambda: 1 / 0, interval=10)
+    run_next(scheduler)
+    assert job.stats()['errors'] == 1
+    assert scheduler._queue[0][0] == start + 10
+
+
+def test_session_hooks():
+    calls = []
+    scheduler, now = make_scheduler(on_open=lambda: calls.append('open'), on_close=lambda: calls.append('close'))
+    job = scheduler.add_job(
+        'job', lambda: calls.append('run'), interval=10,
+        on_open=lambda: calls.append('job open'), on_close=lambda: calls.append('job close'))
+
+    scheduler._update_session(scheduler._market_open())
+    run_next(scheduler)
+    run_next(scheduler)
+    scheduler._update_session(scheduler._market_open())
+    assert calls == ['open', 'job open', 'run', 'run']
+
+    # after the close, once
+    now[0] = utc(2024, 3, 5, 21)
+    for _ in range(2):
+        scheduler._update_session(scheduler._market_open())
+    assert calls[4:] == ['job close', 'close']
+    assert not scheduler.in_session and not job.in_session
+    assert scheduler._seconds_until_open() == 17.5 * 3600
+
+
+def test_run_and_stop():
+    scheduler = Scheduler(max_workers=2)
+    runs = threading.Event()
+    counts = []
+
+    def func():
+        counts.append(1)
+        if len(counts) >= 3:
+            runs.set()
+
+    scheduler.add_job('job', func, interval=0.01, market_hours=False)
+    thread = threading.Thread(target=scheduler.run, daemon=True)
+    thread.start()
+    assert runs.wait(5)
+    scheduler.stop()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert scheduler.stats()['job']['runs'] >= 3
+
+
+def test_warm_up_before_each_session():
+    scheduler, now = make_scheduler()
+    durations = [60, 1800]
+
+    def warm_up():
+        now[0] += timedelta(seconds=durations.pop(0))
+
+    job = scheduler.add_warm_up_job('warm_up', warm_up, before_open=900)
+
+    # added while the market is open, the first run is before the next session
+    assert scheduler._queue[0][0] == utc(2024, 3, 6, 14, 15).timestamp()
+
+    # done before the open, the next run is before the following session
+    now[0] = utc(2024, 3, 6, 14, 15)
+    run_next(scheduler)
+    assert scheduler._queue[0][0] == utc(2024, 3, 7, 14, 15).timestamp()
+    assert job.stats()['runs'] == 1 and job.stats()['overruns'] == 0
+
+    # overrunning into the session
+    now[0] = utc(2024, 3, 7, 14, 15)
+    run_next(scheduler)
+    assert scheduler._queue[0][0] == utc(2024, 3, 8, 14, 15).timestamp()
+    assert job.stats()['overruns'] == 1
+
+
+def test_warm_up_added_close_to_the_open_runs_now():
+    scheduler, now = make_scheduler(start=utc(2024, 3, 8, 14, 25))
+    scheduler.add_warm_up_job('warm_up', lambda: None, before_open=900)
+    assert scheduler._queue[0][0] == utc(2024, 3, 8, 14, 15).timestamp()
+
+    # the next session is on monday
+    run_next(scheduler)
+    assert scheduler._queue[0][0] == utc(2024, 3, 11, 13, 15).timestamp()
+
+
+def test_warm_up_needs_a_calendar():
+    with pytest.raises(ValueError):
+        Scheduler().add_warm_up_job('warm_up', lambda: None)
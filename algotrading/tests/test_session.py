@@ -0,0 +1,54 @@
+import pytest
+import requests
+import robin_stocks.robinhood as rs
+
+from algotrading.session import RobinhoodSession
+from algotrading.standin import StandinServer, use_standin
+
+
+UNAUTHORIZED = {'status': 401, 'body': {'detail': 'Invalid token.'}}
+POSITIONS = {'status': 200, 'body': {'results': [], 'next': None}}
+STALE_TOKEN = {'access_token': 'stale', 'refresh_token': None, 'token_type': 'Bearer', 'expires_at': 4102444800}
+
+
+def make_session(server, monkeypatch):
+    """RobinhoodSession on the stand-in, logging in like robin_stocks with a stale stored session."""
+    monkeypatch.setattr(rs.helper, 'LOGGED_IN', False)
+    session = requests.Session()
+    use_standin(session, server.url)
+    robinhood_session = RobinhoodSession(username='user', password='password', path=None, session=session)
+    robinhood_session._set_token(STALE_TOKEN)
+
+    def login(**kwargs):
+        # robin_stocks checks its stored session and answers with it without a new login
+        session.get(rs.urls.positions_url(), headers={'Authorization': 'Bearer stale'})
+        return {'access_token': 'standin', 'token_type': 'Bearer', 'detail': 'logged in using authentication in robinhood.pickle'}
+
+    monkeypatch.setattr(rs, 'login', login)
+    return robinhood_session
+
+
+def test_reauthenticates_once_on_401(monkeypatch):
+    with StandinServer({'GET api.robinhood.com/positions/': [UNAUTHORIZED, UNAUTHORIZED, POSITIONS]}) as server:
+        robinhood_session = make_session(server, monkeypatch)
+        response = robinhood_session.session.get(rs.urls.positions_url())
+        robinhood_session.stop()
+
+        assert response.status_code == 200
+        assert [_response.status_code for _response in response.history] == [401]
+        # the request, the stored session check of the login, the token check and the retry
+        assert server.stats()['by_path']['GET api.robinhood.com/positions/'] == 4
+        assert robinhood_session.stats()['logins'] == 1
+        assert robinhood_session.stats()['reauthentications'] == 1
+        assert robinhood_session.session.headers['Authorization'] == 'Bearer standin'
+
+
+def test_rejected_login_does_not_loop(monkeypatch):
+    with StandinServer({'GET api.robinhood.com/positions/': [UNAUTHORIZED]}) as server:
+        robinhood_session = make_session(server, monkeypatch)
+        with pytest.raises(RuntimeError):
+            robinhood_session.session.get(rs.urls.positions_url())
+        robinhood_session.stop()
+
+        assert server.stats()['by_path']['GET api.robinhood.com/positions/'] == 3
+        assert robinhood_session.stats()['logins'] == 0
@@ -0,0 +1,135 @@
+import numpy as np
+import pytest
+import robin_stocks.robinhood as rs
+
+from collections import OrderedDict
+
+from algotrading.barchart import BarchartClient
+from algotrading.credit_spreads import CreditSpreadScanner
+from algotrading.data_hub import DataHub
+from algotrading.pricing import black_scholes_greeks, black_scholes_price, time_to_expiration
+from algotrading.standin import StandinServer, use_standin
+from algotrading.utils import find_weekday_dates, get_implied_volatility_data
+
+
+SPOT = 50.0
+VOLATILITY = 0.4
+STRIKES = np.arange(40, 50.5, 0.5)
+
+
+def iv_quote(symbol, rank, percentile, volume):
+    raw = {
+        'symbol': symbol,
+        'symbolName': symbol,
+        'lastPrice': SPOT,
+        'optionsTotalVolume': volume,
+        'optionsWeightedImpliedVolatility': VOLATILITY,
+        'optionsImpliedVolatilityRank1y': rank,
+        'optionsImpliedVolatilityPercentile1y': percentile,
+    }
+    return {'raw': raw, 'tradeTime': '03/01/24'}
+
+
+def make_recordings(expiration_date):
+    """Recordings of one put option chain of XYZ, with ABC held and LOW screened out."""
+    years = time_to_expiration([expiration_date])[0]
+    prices = black_scholes_price('put', SPOT, STRIKES, years, VOLATILITY)
+    greeks = black_scholes_greeks('put', SPOT, STRIKES, years, VOLATILITY)
+
+    instruments = []
+    market_data = []
+    for i, _strike in enumerate(STRIKES):
+        option_id = 'xyz-put-{}'.format(_strike)
+        instruments.append({
+            'id': option_id,
+            'url': rs.urls.option_instruments_url(option_id),
+            'chain_symbol': 'XYZ',
+            'expiration_date': expiration_date,
+            'type': 'put',
+            'strike_price': '{:.4f}'.format(_strike),
+            'state': 'active',
+        })
+        data = {
+            'instrument': rs.urls.option_instruments_url(option_id),
+            'instrument_id': option_id,
+            'mark_price': '{:.4f}'.format(prices[i]),
+            'ask_price': '{:.2f}'.format(prices[i] + 0.02),
+            'bid_price': '{:.2f}'.format(max(prices[i] - 0.02, 0)),
+            'volume': 100 + i,
+            'open_interest': 1000,
+            'implied_volatility': str(VOLATILITY),
+        }
+        data.update({_greek: str(greeks[_greek][i]) for _greek in greeks})
+        market_data.append(data)
+    # the farthest strike has no greeks, so the scan fetches the spot price to compute them
+    for _col in ['implied_volatility', 'delta', 'gamma', 'rho', 'theta', 'vega']:
+        market_data[0][_col] = None
+
+    return {
+        'GET www.barchart.com/proxies/core-api/v1/quotes/get': [{'status': 200, 'body': {'data': [
+            iv_quote('XYZ', 0.8, 0.9, 100000),
+            iv_quote('ABC', 0.8, 0.9, 100000),
+            iv_quote('LOW', 0.2, 0.1, 100000),
+        ]}}],
+        'GET api.robinhood.com/options/positions/': [{'status': 200, 'body': {'next': None, 'results': [{
+            'id': 'position-abc', 'option_id': 'option-abc', 'chain_symbol': 'ABC', 'quantity': '1.0000',
+            'updated_at': '2100-01-01T00:00:00Z',
+        }]}}],
+        'GET api.robinhood.com/options/instruments/?ids=option-abc': [{'status': 200, 'body': {'next': None, 'results': [{
+            'id': 'option-abc', 'chain_symbol': 'ABC', 'type': 'put', 'strike_price': '20.0000', 'expiration_date': expiration_date,
+        }]}}],
+        'GET api.robinhood.com/instruments/?symbol=XYZ': [{'status': 200, 'body': {
+            'next': None, 'results': [{'symbol': 'XYZ', 'tradable_chain_id': 'chain-xyz'}]}}],
+        'GET api.robinhood.com/options/chains/chain-xyz/': [{'status': 200, 'body': {
+            'id': 'chain-xyz', 'expiration_dates': ['2000-01-07', expiration_date]}}],
+        'GET api.robinhood.com/options/instruments/': [{'status': 200, 'body': {'next': None, 'results': instruments}}],
+        'GET api.robinhood.com/marketdata/options/': [{'status': 200, 'body': {'results': market_data}}],
+        'GET api.robinhood.com/quotes/': [{'status': 200, 'body': {'results': [{
+            'symbol': 'XYZ', 'last_trade_price': '{:.4f}'.format(SPOT), 'last_extended_hours_trade_price': None}]}}],
+    }
+
+
+@pytest.fixture
+def standin(monkeypatch):
+    """Stand-in server robin_stocks is sent to for the test, with one listed expiration date in range."""
+    expiration_date = find_weekday_dates(days_until_expiration_range=(30, 45), weekday_num=4)[0]
+    with StandinServer(make_recordings(expiration_date)) as server:
+        monkeypatch.setattr(rs.globals.SESSION, 'adapters', OrderedDict(rs.globals.SESSION.adapters))
+        monkeypatch.setattr(rs.helper, 'LOGGED_IN', True)
+        use_standin(rs.globals.SESSION, server.url)
+        yield server
+
+
+def test_scan(standin, tmp_path):
+    client = BarchartClient()
+    use_standin(client.session, standin.url)
+    hub = DataHub()
+    hub.prefetcher.fetchers['iv_data'] = lambda: get_implied_volatility_data(client)
+    scanner = CreditSpreadScanner(
+        option_types=('put',),
+        min_percent_return=0.1,
+        hub=hub,
+        trade_logging_file_paths={'put': str(tmp_path / 'put_credit_spread.csv')},
+    )
+
+    candidates = scanner.scan()['put']
+    # only XYZ's listed expiration date is requested, ABC is held and LOW has a low IV rank
+    assert standin.stats()['missing'] == 0
+    assert standin.stats()['errors'] == 0
+    assert candidates['symbol'].tolist() == ['XYZ']
+
+    candidate = candidates.iloc[0]
+    assert abs(candidate['short_delta'] + scanner.target_delta) <= scanner.delta_tolerance
+    assert candidate['long_strike_price'] == candidate['short_strike_price'] - 0.5
+    assert candidate['trade_limit_price'] == pytest.approx(candidate['short_mark_price'] - candidate['long_mark_price'])
+    assert candidate['trade_expected_percent_return'] > scanner.min_percent_return
+
+    # one spot price request for the missing greeks
+    by_path = standin.stats()['by_path']
+    assert by_path['GET api.robinhood.com/quotes/'] == 1
+    assert by_path['GET api.robinhood.com/marketdata/options/'] == 1
+
+    # the next scan reads cached quotes and only fetches the spot price again
+    assert scanner.scan()['put']['symbol'].tolist() == ['XYZ']
+    by_path['GET api.robinhood.com/quotes/'] += 1
+    assert standin.stats()['by_path'] == by_path
@@ -0,0 +1,77 @@
+import pytest
+import robin_stocks.robinhood as rs
+
+from datetime import datetime
+
+from algotrading.utils import find_weekday_dates, get_latest_prices, get_tradable_options, request_pages
+
+
+@pytest.fixture
+def pages(monkeypatch):
+    """Responses of `rs.helper.request_get` keyed by url, None for a failed request, and the requested urls."""
+    pages = {'responses': {}, 'requests': []}
+
+    def request_get(url, data_type='regular', payload=None):
+        assert data_type == 'regular'
+        pages['requests'].append((url, payload))
+        return pages['responses'][url]
+
+    monkeypatch.setattr(rs.helper, 'request_get', request_get)
+    return pages
+
+
+def test_request_pages(pages):
+    pages['responses'].update({
+        'https://api.robinhood.com/a/': {'results': [1, 2], 'next': 'https://api.robinhood.com/a/?cursor=2'},
+        'https://api.robinhood.com/a/?cursor=2': {'results': [3], 'next': None},
+    })
+    assert request_pages('https://api.robinhood.com/a/', {'b': 'c'}) == [1, 2, 3]
+    assert pages['requests'][0] == ('https://api.robinhood.com/a/', {'b': 'c'})
+
+    # a failed page fails the whole request instead of returning the pages loaded so far
+    pages['responses']['https://api.robinhood.com/a/?cursor=2'] = None
+    assert request_pages('https://api.robinhood.com/a/') is None
+
+
+def test_get_tradable_options(pages):
+    instruments = [{'id': 'a', 'expiration_date': '2024-03-15', 'type': 'put'}]
+    pages['responses'].update({
+        rs.urls.instruments_url(): {'results': [{'symbol': 'XYZ', 'tradable_chain_id': 'chain-xyz'}], 'next': None},
+        rs.urls.option_instruments_url(): {'results': instruments, 'next': None},
+    })
+    assert get_tradable_options('xyz', '2024-03-15', 'put') == instruments
+    assert pages['requests'][-1][1] == {
+        'chain_id': 'chain-xyz', 'chain_symbol': 'XYZ', 'expiration_dates': '2024-03-15', 'state': 'active', 'type': 'put'}
+
+    pages['responses'][rs.urls.option_instruments_url()] = None
+    assert get_tradable_options('XYZ', '2024-03-15') is None
+
+    # a symbol without options is an empty result, not a failure
+    pages['responses'][rs.urls.instruments_url()] = {'results': [{'symbol': 'XYZ', 'tradable_chain_id': None}], 'next': None}
+    assert get_tradable_options('XYZ', '2024-03-15') == []
+    pages['responses'][rs.urls.instruments_url()] = None
+    assert get_tradable_options('XYZ', '2024-03-15') is None
+
+
+def test_get_latest_prices_keyed_by_symbol(monkeypatch):
+    quotes = [
+        {'symbol': 'AAA', 'last_trade_price': '10.0000', 'last_extended_hours_trade_price': None},
+        {'symbol': 'CCC', 'last_trade_price': '30.0000', 'last_extended_hours_trade_price': '31.0000'},
+    ]
+    requests = []
+    monkeypatch.setattr(rs.stocks, 'get_quotes', lambda symbols: requests.append(symbols) or quotes)
+
+    # the unknown symbol has no quote and does not shift the others
+    assert get_latest_prices(['AAA', 'BAD', 'ccc']) == {'AAA': 10.0, 'ccc': 31.0}
+    assert requests == [['AAA', 'BAD', 'ccc']]
+    assert get_latest_prices([]) == {}
+
+    for _failed in [None, [None]]:
+        monkeypatch.setattr(rs.stocks, 'get_quotes', lambda symbols: _failed)
+        assert get_latest_prices(['AAA']) == {}
+
+
+def test_find_weekday_dates_fridays():
+    fridays = find_weekday_dates((0, 21), 4)
+    assert len(fridays) == 3
+    assert all(datetime.strptime(_date, '%Y-%m-%d').weekday() == 4 for _date in fridays)
@@ -1,7 +1,7 @@
 import logging
 import os
-import pyotp
-import requests
+
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 import numpy as np
 import pandas as pd
@@ -9,7 +9,27 @@ import robin_stocks.robinhood as rs
 
 from datetime import datetime, timedelta, timezone
 from dateutil import parser
-from urllib.parse import unquote
+
+from algotrading.barchart import BarchartClient
+from algotrading.market_calendar import MarketCalendar
+from algotrading.option_chain import OptionChain
+from algotrading.session import DEFAULT_TOKEN_PATH, RobinhoodSession
+from algotrading.standin import use_standin
+
+
+_robinhood_session = None
+
+
+def get_robinhood_session():
+    """Get the shared Robinhood session manager, created on first use.
+
+    The token is kept in memory only while the stand-in server is used.
+    """
+    global _robinhood_session
+    if _robinhood_session is None:
+        standin = use_standin(rs.globals.SESSION)
+        _robinhood_session = RobinhoodSession(path=None if standin else DEFAULT_TOKEN_PATH)
+    return _robinhood_session
 
 
 def robinhood_login(
@@ -18,18 +38,39 @@ def robinhood_login(
     robin_mfa_auth=os.environ.get('robinhood_mfa_auth'),
     robin_mfa_code=None,
 ):
-    """Login to Robinhood."""
+    """Login to Robinhood, or to the stand-in server if `algotrading_standin_url` is set.
+
+    The saved session token is reused and refreshed before it expires; the credentials are only
+    used when there is no valid token, see `RobinhoodSession`.
+    """
+    session = get_robinhood_session()
+    session.username = robin_user
+    session.password = robin_pass
+    session.mfa_auth = robin_mfa_auth
+    session.mfa_code = robin_mfa_code
+    session.login()
+
+
+def find_weekday_dates(days_until_expiration_range, weekday_num):
+    """Find all dates on a weekday within a range of days from today, formatted as YYYY-MM-DD.
+
+    weekday_num : int
+        Integer value corresponding to weekday as returned by `datetime.weekday`, from Monday: 0 to Sunday: 6,
+        e.g. 4 for Friday.
+    """
+    now = datetime.now()
+
+    start = now + timedelta(days_until_expiration_range[0])
+    end = now + timedelta(days_until_expiration_range[1])
 
-    if robin_mfa_auth:
-        robin_mfa_code = pyotp.TOTP(robin_mfa_auth).now()
+    dates_generated = [start + timedelta(days=x) for x in range(0, (end - start).days)]
+
+    weekday_dates = []
+    for _date in dates_generated:
+        if _date.weekday() == weekday_num:
+            weekday_dates.append(_date.strftime("%Y-%m-%d"))
 
-    rs.login(
-        username=robin_user,
-        password=robin_pass,
-        expiresIn=86400,
-        mfa_code=robin_mfa_code,
-        by_sms=True,
-    )
+    return weekday_dates
 
 
 def find_nearest_weekday_date(days_until_expiration_range, weekday_num):
@@ -45,29 +86,30 @@ def find_nearest_weekday_date(days_until_expiration_range, weekday_num):
             - Saturday: 6
             - Sunday: 7
     """
-    now = datetime.now()
+    nearest_weekday_expiration = min(find_weekday_dates(days_until_expiration_range, weekday_num))
 
-    start = now + timedelta(days_until_expiration_range[0])
-    end = now + timedelta(days_until_expiration_range[1])
+    return nearest_weekday_expiration
 
-    dates_generated = [start + timedelta(days=x) for x in range(0, (end - start).days)]
 
-    weekday_dates = []
-    for _date in dates_generated:
-        if _date.weekday() == weekday_num:
-            weekday_dates.append(_date)
+_barchart_client = None
 
-    nearest_weekday_expiration = min(weekday_dates).strftime("%Y-%m-%d")
 
-    return nearest_weekday_expiration
+def get_barchart_client():
+    """Get the shared Barchart client, created on first use."""
+    global _barchart_client
+    if _barchart_client is None:
+        _barchart_client = BarchartClient()
+        use_standin(_barchart_client.session)
+    return _barchart_client
 
 
-def get_implied_volatility_data():
-    headers = {
-        "User-Agent": "Mozilla/5.0 (X11; Ubuntu; Linux x86_64; rv:86.0) Gecko/20100101 Firefox/86.0"
-    }
+def get_implied_volatility_data(client=None):
+    """Get implied volatility data of the most active option symbols from Barchart.
 
-    url = ("https://www.barchart.com/proxies/core-api/v1/quotes/get")
+    client : BarchartClient
+        Optional client, defaults to a shared client that reuses its session and XSRF token.
+    """
+    client = client or get_barchart_client()
 
     payload = {
         'fields': ("symbol,symbolName,"
@@ -81,15 +123,7 @@ def get_implied_volatility_data():
         'raw': '1',
     }
 
-    with requests.Session() as s:
-        # get all cookies
-        s.get(
-            "https://www.barchart.com",
-            headers=headers,
-        )
-        # use one cookie as HTTP header
-        headers["X-XSRF-TOKEN"] = unquote(s.cookies["XSRF-TOKEN"])
-        data = s.get(url, params=payload, headers=headers).json()
+    data = client.get_json('proxies/core-api/v1/quotes/get', params=payload)
 
     output = pd.DataFrame(pd.DataFrame(data['data'])['raw'].tolist())
     output['tradeTime'] = pd.DataFrame(data['data'])['tradeTime']
@@ -108,51 +142,180 @@ def get_implied_volatility_data():
     return output
 
 
-def get_recent_open_option_tickers(option_type, day_lag):
-    open_option_positions = pd.DataFrame(rs.get_open_option_positions())
+def get_latest_prices(ticker_list):
+    """Get latest stock prices for many tickers in one request, as a dictionary keyed by ticker.
 
-    open_option_positions['option_type'] = 'Unknown'
+    Prices include extended hours trades, like `rs.stocks.get_latest_price`. Quotes are matched to
+    tickers by their symbol, since Robinhood leaves out unknown symbols; tickers without a quote,
+    or all of them if the request failed, are missing from the dictionary.
+    """
+    if not ticker_list:
+        return {}
+    quotes = rs.stocks.get_quotes(list(ticker_list))
 
-    for i, row in open_option_positions.iterrows():
-        row['option_type'] = rs.options.get_option_instrument_data_by_id(row['option_id'])['type']
+    prices = {}
+    for _quote in (quotes or []):
+        if not _quote or not _quote.get('symbol'):
+            continue
+        price = _quote.get('last_extended_hours_trade_price') or _quote.get('last_trade_price')
+        if price is not None:
+            prices[_quote['symbol']] = float(price)
 
-    open_option_positions = open_option_positions.loc[open_option_positions.option_type == option_type]
+    return {_ticker: prices[_ticker.upper().strip()] for _ticker in ticker_list if _ticker.upper().strip() in prices}
 
-    all_option_positions = pd.DataFrame(rs.get_all_option_positions())
 
-    recent_option_positions = all_option_positions.loc[
-        pd.to_datetime(all_option_positions.updated_at) >=
-        pd.to_datetime(datetime.now(tz=timezone.utc) - timedelta(days=day_lag))].copy()
+def get_option_market_data(option_ids, batch_size=40):
+    """Get option market data (quotes and greeks) for many option instruments in batched requests.
 
-    recent_option_positions['option_type'] = 'Unknown'
+    Returns a list of market data dictionaries, each with an `instrument_id` key.
+    """
+    instrument_urls = [rs.urls.option_instruments_url(_option_id) for _option_id in option_ids]
+
+    market_data = []
+    for i in range(0, len(instrument_urls), batch_size):
+        data = rs.helper.request_get(
+            rs.urls.marketdata_options_url(),
+            'results',
+            {'instruments': ','.join(instrument_urls[i:i + batch_size])},
+        )
+        market_data.extend([_data for _data in (data or []) if _data])
+
+    for _data in market_data:
+        if 'instrument_id' not in _data:
+            _data['instrument_id'] = _data['instrument'].rstrip('/').split('/')[-1]
+
+    return market_data
+
+
+def request_pages(url, payload=None):
+    """Get the results of every page of a paginated Robinhood endpoint.
+
+    Returns None if any page fails, where robin_stocks returns `[None]` or the pages loaded so
+    far, so a failed request is not mistaken for an empty result.
+    """
+    data = rs.helper.request_get(url, 'regular', payload)
+    results = []
+    while data is not None:
+        results.extend(data.get('results') or [])
+        if not data.get('next'):
+            return results
+        data = rs.helper.request_get(data['next'])
+    return None
 
-    for i, row in recent_option_positions.iterrows():
-        row['option_type'] = rs.options.get_option_instrument_data_by_id(row['option_id'])['type']
 
-    recent_option_positions = recent_option_positions.loc[recent_option_positions.option_type == option_type]
+def get_tradable_options(symbol, expiration_date, option_type=None):
+    """Get the active option instruments of a symbol and expiration date, like `rs.options.find_tradable_options`.
 
-    recent_open_tickers = list(
-        set(open_option_positions['chain_symbol']) & set(recent_option_positions['chain_symbol']))
+    Returns None if a request failed, and an empty list if the symbol has no options.
+    """
+    stock_instruments = request_pages(rs.urls.instruments_url(), {'symbol': symbol.upper().strip()})
+    if stock_instruments is None:
+        return None
+    if not stock_instruments or not stock_instruments[0].get('tradable_chain_id'):
+        return []
 
-    return recent_open_tickers
+    payload = {
+        'chain_id': stock_instruments[0]['tradable_chain_id'],
+        'chain_symbol': symbol.upper().strip(),
+        'expiration_dates': expiration_date,
+        'state': 'active',
+    }
+    if option_type:
+        payload['type'] = option_type
+    return request_pages(rs.urls.option_instruments_url(), payload)
+
+
+def get_option_chain(ticker, expiration_date, option_type, cache=None):
+    """Get option chain for a single ticker and expiration date as an OptionChain.
+
+    cache : OptionChainCache
+        Optional cache to serve the option chain from.
+    """
+    if cache is not None:
+        return cache.get(ticker, expiration_date, option_type)
+
+    try:
+        option_chain = OptionChain.from_records(
+            rs.options.find_options_by_expiration(
+                inputSymbols=ticker,
+                expirationDate=expiration_date,
+                optionType=option_type,)
+        )
+    except TypeError:
+        option_chain = OptionChain.from_records([])
+
+    return option_chain
+
+
+def get_option_expiration_dates(ticker, cache=None):
+    """Get listed option expiration dates of a ticker.
+
+    cache : OptionChainCache
+        Optional cache to serve the expiration dates from.
+    """
+    if cache is not None:
+        return cache.get_expiration_dates(ticker)
+
+    try:
+        expiration_dates = rs.options.get_chains(ticker, info='expiration_dates')
+    except TypeError:
+        expiration_dates = None
+
+    return expiration_dates or []
+
+
+def iter_expiration_option_chains(ticker_list, expiration_dates, option_type, max_workers=8, cache=None):
+    """Fetch option chains for many tickers and expiration dates concurrently, yielding them as they arrive.
+
+    Listed expiration dates of every ticker are fetched first so only listed (ticker, expiration date)
+    pairs are requested. Both stages share one thread pool of `max_workers` threads.
+
+    Yields tuples of ((ticker, expiration date), OptionChain) in completion order.
+    """
+    ticker_list = list(dict.fromkeys(ticker_list))
+    if not ticker_list or not expiration_dates:
+        return
+
+    with ThreadPoolExecutor(max_workers=max(min(max_workers, len(ticker_list) * len(expiration_dates)), 1)) as executor:
+        listed_expiration_dates = executor.map(
+            lambda _ticker: set(get_option_expiration_dates(_ticker, cache=cache)),
+            ticker_list,
+        )
+        futures = {
+            executor.submit(get_option_chain, _ticker, _expiration_date, option_type, cache=cache): (_ticker, _expiration_date)
+            for _ticker, _listed in zip(ticker_list, listed_expiration_dates)
+            for _expiration_date in expiration_dates if _expiration_date in _listed
+        }
+        for _future in as_completed(futures):
+            yield futures[_future], _future.result()
+
+
+_market_calendar = None
+
+
+def get_market_calendar():
+    """Get the shared market calendar, cached in market_calendar.csv and created on first use."""
+    global _market_calendar
+    if _market_calendar is None:
+        _market_calendar = MarketCalendar(path='market_calendar.csv')
+    return _market_calendar
 
 
 def get_next_market_open_hours(market='XNYS'):
     """Get next market open hours. Default market is NYSE for US market hours."""
-    today_market_open_dict = rs.markets.get_market_today_hours(market=market)
-    current_time = parser.parse(datetime.now(timezone.utc).isoformat())
-    if today_market_open_dict['is_open'] and current_time < parser.parse(today_market_open_dict['closes_at']):
-        market_opens = parser.parse(today_market_open_dict['opens_at'])
-        market_closes = parser.parse(today_market_open_dict['closes_at'])
-    else:
-        next_market_open_dict = rs.markets.get_market_next_open_hours(market=market)
-        market_opens = parser.parse(next_market_open_dict['opens_at'])
-        market_closes = parser.parse(next_market_open_dict['closes_at'])
-    return market_opens, market_closes
-
-
-def seconds_until_market_open(market_opens):
-    """Get seconds until market opens."""
+    if market != 'XNYS':
+        raise ValueError('Only XNYS market hours are supported, got {}'.format(market))
+    return get_market_calendar().next_open_hours()
+
+
+def seconds_until_market_open(market_opens=None):
+    """Get seconds until market opens.
+
+    market_opens : datetime.datetime
+        Market open time, defaults to the next market open from the market calendar.
+    """
+    if market_opens is None:
+        return np.floor(get_market_calendar().seconds_until_open())
     current_time = parser.parse(datetime.now(timezone.utc).isoformat())
     return np.floor((market_opens - current_time).total_seconds())
 